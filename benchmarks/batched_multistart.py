@@ -0,0 +1,44 @@
+import time
+
+import torch
+
+from methods.methods import Method, OptimizationOptions
+from methods.run_optimization import run_optimization, run_batched_optimization
+from problems.problems import load_problem, ProblemType
+
+
+# wall time of K sequential runs with the analytic derivatives against one batched run from the same K random
+# starting points.
+STARTS = 100
+
+CASES = [
+    (ProblemType.Genhumps_5, Method.LBFGSW),
+    (ProblemType.Genhumps_5, Method.ModifiedNewtonW),
+    (ProblemType.Rosenbrock_2, Method.GradientDescentW),
+    (ProblemType.P5_quartic_1, Method.ModifiedNewton),
+]
+
+
+def go():
+    options = OptimizationOptions()
+    print(f'{"problem":>20}{"method":>20}{"sequential":>14}{"batched":>14}{"speedup":>10}')
+    for problem_type, method in CASES:
+        problem = load_problem(problem_type)
+        generator = torch.Generator().manual_seed(STARTS)
+        x0s = problem.x0 + torch.randn(STARTS, problem.x0.shape[0], generator=generator, dtype=torch.double)
+
+        start = time.perf_counter()
+        for i in range(STARTS):
+            run_optimization(method, problem._replace(x0=x0s[i]), options)
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_batched_optimization(method, problem, x0s, options)
+        batched_time = time.perf_counter() - start
+
+        print(f'{problem_type:>20}{method:>20}{sequential_time:>13.3f}s{batched_time:>13.3f}s'
+              f'{sequential_time / batched_time:>9.1f}x')
+
+
+if __name__ == '__main__':
+    go()
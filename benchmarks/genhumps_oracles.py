@@ -0,0 +1,40 @@
+import timeit
+
+import torch
+
+from problems.genhumps import genhumps_function, genhumps_gradient, genhumps_hessian, genhumps_sparse_hessian
+
+
+# per-call latency of the Genhumps oracles. the dense hessian is n x n so it is only timed for small n; the CSR
+# hessian at every n.
+DIMENSIONS = [5, 100, 10**3, 10**5]
+MAX_HESSIAN_DIMENSION = 10**3
+
+
+def time_per_call(f, x: torch.Tensor) -> float:
+    timer = timeit.Timer(lambda: f(x))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=5, number=number))
+    return best / number
+
+
+def go():
+    print(f'{"n":>10} {"function":>14} {"gradient":>14} {"hessian":>14} {"CSR hessian":>14}')
+    for n in DIMENSIONS:
+        x = torch.full([n], 506.2, dtype=torch.double)
+        x[0] = -506.2
+
+        function_time = time_per_call(genhumps_function, x)
+        gradient_time = time_per_call(genhumps_gradient, x)
+        if n <= MAX_HESSIAN_DIMENSION:
+            hessian_text = f'{time_per_call(genhumps_hessian, x) * 1e6:>12.1f}us'
+        else:
+            hessian_text = f'{"-":>14}'
+        sparse_hessian_time = time_per_call(genhumps_sparse_hessian, x)
+
+        print(f'{n:>10} {function_time * 1e6:>12.1f}us {gradient_time * 1e6:>12.1f}us {hessian_text} '
+              f'{sparse_hessian_time * 1e6:>12.1f}us')
+
+
+if __name__ == '__main__':
+    go()
@@ -0,0 +1,33 @@
+import sys
+
+from methods.methods import Method, OptimizationOptions
+from methods.run_optimization import run_optimization
+from problems.problems import load_problem, ProblemType, problem_data_available
+
+
+# oracle evaluations of every method with the bisecting line searches against the interpolating ones. an evaluation
+# is one call of f, the gradient or the fused value and gradient.
+def evaluations(method: Method, problem_type: ProblemType, interpolating: bool) -> tuple[int, str]:
+    options = OptimizationOptions(collect_statistics=True, interpolating_line_search=interpolating)
+    results = run_optimization(method, load_problem(problem_type), options)
+    statistics = results.statistics
+    count = statistics.function_evaluations + statistics.gradient_evaluations + \
+        statistics.value_and_gradient_evaluations
+    return count, f"{results.final_gradient_norm:.1e}"
+
+
+def go():
+    print(f'{"problem":>20}{"method":>29}{"bisecting":>11}{"|g|":>9}{"interpolating":>15}{"|g|":>9}')
+    for problem_type in ProblemType:
+        if not problem_data_available(problem_type):
+            print(f"skipped. problem={problem_type}. its data files are missing", file=sys.stderr)
+            continue
+        for method in Method:
+            count, gradient_norm = evaluations(method, problem_type, False)
+            interpolating_count, interpolating_gradient_norm = evaluations(method, problem_type, True)
+            print(f'{problem_type:>20}{method:>29}{count:>11}{gradient_norm:>9}'
+                  f'{interpolating_count:>15}{interpolating_gradient_norm:>9}')
+
+
+if __name__ == '__main__':
+    go()
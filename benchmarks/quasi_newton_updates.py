@@ -0,0 +1,45 @@
+import time
+
+import torch
+
+from methods.bfgs_optimization import bfgs_update, dfp_update, bfgs_ldl_update, \
+    inverse_hessian_search_direction, ldl_factor_search_direction
+from methods.methods import OptimizationOptions
+
+
+# per-iteration time of the quasi-newton search direction plus the matrix update against the dimension n.
+DIMENSIONS = [100, 300, 1000, 3000]
+ITERATIONS = 20
+
+UPDATES = [
+    ("bfgs", bfgs_update, inverse_hessian_search_direction),
+    ("dfp", dfp_update, inverse_hessian_search_direction),
+    ("bfgs ldl", bfgs_ldl_update, ldl_factor_search_direction),
+]
+
+
+def time_per_iteration(update, search_direction, n: int) -> float:
+    options = OptimizationOptions()
+    generator = torch.Generator().manual_seed(n)
+    # curvature pairs from a fixed diagonal SPD hessian so that y^T s > 0.
+    hessian_diagonal = 1 + torch.rand(n, generator=generator, dtype=torch.double)
+    steps = [torch.randn(n, generator=generator, dtype=torch.double) for _ in range(ITERATIONS)]
+    gradk = torch.randn(n, generator=generator, dtype=torch.double)
+
+    hk = torch.eye(n, dtype=torch.double)
+    start = time.perf_counter()
+    for sk in steps:
+        search_direction(hk, gradk)
+        hk = update(options, hk, sk, hessian_diagonal * sk)
+    return (time.perf_counter() - start) / ITERATIONS
+
+
+def go():
+    print(f'{"n":>10}' + "".join(f'{name:>16}' for name, _, _ in UPDATES))
+    for n in DIMENSIONS:
+        times = [time_per_iteration(update, search_direction, n) for _, update, search_direction in UPDATES]
+        print(f'{n:>10}' + "".join(f'{t * 1e3:>14.3f}ms' for t in times))
+
+
+if __name__ == '__main__':
+    go()
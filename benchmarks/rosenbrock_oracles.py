@@ -0,0 +1,37 @@
+import timeit
+
+import torch
+
+from problems.rosenbrock import rosenbrock_function, rosenbrock_gradient, rosenbrock_hessian
+
+
+# per-call latency of the Rosenbrock oracles. the dense hessian is n x n so it is only timed for small n.
+DIMENSIONS = [100, 10**4, 10**6]
+MAX_HESSIAN_DIMENSION = 10**4
+
+
+def time_per_call(f, x: torch.Tensor) -> float:
+    timer = timeit.Timer(lambda: f(x))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=5, number=number))
+    return best / number
+
+
+def go():
+    print(f'{"n":>10} {"function":>14} {"gradient":>14} {"hessian":>14}')
+    for n in DIMENSIONS:
+        x = torch.full([n], 1, dtype=torch.double)
+        x[0] = -1.2
+
+        function_time = time_per_call(rosenbrock_function, x)
+        gradient_time = time_per_call(rosenbrock_gradient, x)
+        if n <= MAX_HESSIAN_DIMENSION:
+            hessian_text = f'{time_per_call(rosenbrock_hessian, x) * 1e6:>12.1f}us'
+        else:
+            hessian_text = f'{"-":>14}'
+
+        print(f'{n:>10} {function_time * 1e6:>12.1f}us {gradient_time * 1e6:>12.1f}us {hessian_text}')
+
+
+if __name__ == '__main__':
+    go()
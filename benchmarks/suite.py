@@ -0,0 +1,174 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import NamedTuple, Optional
+
+import torch
+
+from methods.methods import Method, OptimizationOptions
+from methods.run_optimization import run_optimization
+from problems.problems import load_problem, ProblemType, problem_data_available
+
+
+# run time of every method on every problem: warmup runs, then repeated runs timed with perf_counter_ns and summarized
+# by median and interquartile range. results can be saved as a JSON baseline and later runs compared against it.
+#
+#     python -m benchmarks.suite --save generated/benchmark-baseline.json
+#     python -m benchmarks.suite --compare generated/benchmark-baseline.json --threshold 1.1
+
+
+class BenchmarkSummary(NamedTuple):
+    median_ns: float
+    q1_ns: float
+    q3_ns: float
+    repeats: int
+    steps: int
+
+
+class BenchmarkComparison(NamedTuple):
+    key: str
+    baseline: BenchmarkSummary
+    current: BenchmarkSummary
+    ratio: float
+    regressed: bool
+
+
+def benchmark_key(problem_type: ProblemType, method: Method) -> str:
+    return f"{problem_type}/{method}"
+
+
+def summarize(samples_ns: list[int], steps: int) -> BenchmarkSummary:
+    if len(samples_ns) < 2:
+        return BenchmarkSummary(samples_ns[0], samples_ns[0], samples_ns[0], len(samples_ns), steps)
+    q1, median, q3 = statistics.quantiles(samples_ns, n=4, method="inclusive")
+    return BenchmarkSummary(median, q1, q3, len(samples_ns), steps)
+
+
+def time_run(method: Method, problem_type: ProblemType, options: OptimizationOptions,
+             warmup: int, repeats: int) -> BenchmarkSummary:
+    problem = load_problem(problem_type)
+    for _ in range(warmup):
+        run_optimization(method, problem, options)
+
+    samples_ns = []
+    steps = 0
+    # no garbage collection pauses inside the timed runs, as in timeit.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start_ns = time.perf_counter_ns()
+            results = run_optimization(method, problem, options)
+            samples_ns.append(time.perf_counter_ns() - start_ns)
+            steps = results.trace.total_steps
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return summarize(samples_ns, steps)
+
+
+def compare(baseline: dict[str, BenchmarkSummary], current: dict[str, BenchmarkSummary],
+            threshold: float) -> list[BenchmarkComparison]:
+    # a regression is a median slowdown above threshold whose interquartile ranges don't overlap, so that one noisy
+    # run doesn't fail the comparison. a changed step count is reported as a regression too: the timings are then
+    # not comparable.
+    comparisons = []
+    for key, current_summary in current.items():
+        baseline_summary = baseline.get(key)
+        if baseline_summary is None:
+            continue
+        ratio = current_summary.median_ns / baseline_summary.median_ns
+        slower = ratio > threshold and current_summary.q1_ns > baseline_summary.q3_ns
+        regressed = slower or current_summary.steps != baseline_summary.steps
+        comparisons.append(BenchmarkComparison(key, baseline_summary, current_summary, ratio, regressed))
+    return comparisons
+
+
+def save_results(path: str, results: dict[str, BenchmarkSummary], metadata: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as json_file:
+        json.dump({"metadata": metadata, "results": {key: summary._asdict() for key, summary in results.items()}},
+                  json_file, indent=2)
+
+
+def load_results(path: str) -> dict[str, BenchmarkSummary]:
+    with open(path) as json_file:
+        saved = json.load(json_file)
+    return {key: BenchmarkSummary(**summary) for key, summary in saved["results"].items()}
+
+
+def format_ns(ns: float) -> str:
+    if ns >= 1e9:
+        return f"{ns / 1e9:.3f}s"
+    if ns >= 1e6:
+        return f"{ns / 1e6:.3f}ms"
+    return f"{ns / 1e3:.1f}us"
+
+
+def go(problem_types: list[ProblemType], methods: list[Method], warmup: int, repeats: int, threads: int,
+       save_path: Optional[str], compare_path: Optional[str], threshold: float) -> int:
+    # pinned, so that the timings don't depend on the machine's core count or on load from other processes.
+    torch.set_num_threads(threads)
+    options = OptimizationOptions()
+
+    missing = [problem_type for problem_type in problem_types if not problem_data_available(problem_type)]
+    for problem_type in missing:
+        print(f"skipped. problem={problem_type}. its data files are missing", file=sys.stderr)
+
+    results = {}
+    print(f'{"problem":>20}{"method":>18}{"median":>12}{"iqr":>12}{"steps":>7}')
+    for problem_type in [problem_type for problem_type in problem_types if problem_type not in missing]:
+        for method in methods:
+            summary = time_run(method, problem_type, options, warmup, repeats)
+            results[benchmark_key(problem_type, method)] = summary
+            print(f'{problem_type:>20}{method:>18}{format_ns(summary.median_ns):>12}'
+                  f'{format_ns(summary.q3_ns - summary.q1_ns):>12}{summary.steps:>7}')
+
+    if save_path is not None:
+        metadata = {"torch": torch.__version__, "python": platform.python_version(), "machine": platform.machine(),
+                    "threads": threads, "warmup": warmup, "repeats": repeats}
+        save_results(save_path, results, metadata)
+        print(f"saved. path={save_path}")
+
+    if compare_path is None:
+        return 0
+
+    comparisons = compare(load_results(compare_path), results, threshold)
+    print(f'{"benchmark":>40}{"baseline":>12}{"current":>12}{"ratio":>8}')
+    for comparison in comparisons:
+        flag = "  REGRESSED" if comparison.regressed else ""
+        print(f'{comparison.key:>40}{format_ns(comparison.baseline.median_ns):>12}'
+              f'{format_ns(comparison.current.median_ns):>12}{comparison.ratio:>7.2f}x{flag}')
+    regressions = sum(comparison.regressed for comparison in comparisons)
+    print(f"compared={len(comparisons)}. regressed={regressions}. threshold={threshold}")
+    return 1 if regressions > 0 else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="benchmark every method on every problem")
+    parser.add_argument("--problems", nargs="*", type=ProblemType,
+                        default=[problem_type for problem_type in ProblemType if problem_data_available(problem_type)])
+    parser.add_argument("--methods", nargs="*", type=Method, default=list(Method))
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=15)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--save", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", help="compare against this JSON baseline. exits with 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=1.1, help="median slowdown ratio that is a regression")
+    args = parser.parse_args()
+
+    if args.repeats < 1 or args.warmup < 0 or args.threads < 1:
+        parser.error("repeats and threads must be positive and warmup not negative")
+    return go(args.problems, args.methods, args.warmup, args.repeats, args.threads, args.save, args.compare,
+              args.threshold)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
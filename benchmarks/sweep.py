@@ -0,0 +1,366 @@
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from enum import StrEnum, auto
+from typing import NamedTuple, Optional, Any
+
+import torch
+
+from methods.methods import Method, OptimizationOptions, OptimizationStep, OptimizationTerminationReason, \
+    step_callback_noop
+from methods.run_optimization import run_optimization
+from problems.problems import load_problem, ProblemType
+
+
+# hyperparameter sweeps over OptimizationOptions fields, across problems and methods. every configuration of the
+# search space runs on every (problem, method) pair in a process pool. completed trials are memoized in a JSON cache
+# keyed by a hash of the problem, the method and the options, so growing a sweep only runs the new points.
+#
+#     results = run_sweep([ProblemType.Genhumps_5], [Method.ModifiedNewtonW],
+#                         {"wolfe_line_search_c1": [1e-4, 1e-3], "wolfe_line_search_c2": SweepRange(0.1, 0.9)},
+#                         SweepOptions(strategy=SweepStrategy.random, samples=20,
+#                                      cache_path="generated/sweep-cache.json"))
+
+
+class SweepStrategy(StrEnum):
+    # every combination of the listed values.
+    grid = auto()
+    # `samples` configurations drawn independently from the value lists and ranges.
+    random = auto()
+    # `samples` random configurations on a small iteration budget. the best 1/halving_eta of them move on to a
+    # budget halving_eta times larger, until the budget reaches max_iterations.
+    successive_halving = auto()
+
+
+class SweepRange(NamedTuple):
+    # uniform over [low, high], or log-uniform. random and successive halving only.
+    low: float
+    high: float
+    log: bool = False
+
+
+class SweepOptions(NamedTuple):
+    strategy: SweepStrategy = SweepStrategy.grid
+    samples: int = 16
+    seed: int = 0
+    halving_eta: int = 3
+    halving_min_iterations: int = 10
+    # abort a trial once it has taken more than abort_ratio times the iterations of the best converged trial on the
+    # same problem and method: it can no longer beat it. None runs every trial to the end.
+    abort_ratio: Optional[float] = 2.0
+    # None is one worker per core. 1 runs the trials in this process.
+    max_workers: Optional[int] = None
+    cache_path: Optional[str] = None
+
+
+class SweepTrial(NamedTuple):
+    problem_type: ProblemType
+    method: Method
+    # (field, value) pairs applied to the base options, sorted by field. successive halving appends its budget,
+    # max_iterations.
+    overrides: tuple[tuple[str, Any], ...]
+
+
+class SweepOutcome(NamedTuple):
+    # None for an aborted trial.
+    termination_reason: Optional[OptimizationTerminationReason]
+    final_function_value: float
+    final_gradient_norm: float
+    # iterations taken, up to the abort for an aborted trial.
+    iterations: int
+    # function, gradient and fused function and gradient evaluations. 0 for an aborted trial.
+    evaluations: int
+    run_seconds: float
+    # per step, from x0 on.
+    gradient_norms: list[float]
+    # the iteration limit an aborted trial ran under.
+    abort_limit: Optional[int] = None
+
+    @property
+    def aborted(self) -> bool:
+        return self.termination_reason is None
+
+    @property
+    def converged(self) -> bool:
+        return self.termination_reason == OptimizationTerminationReason.reached_stationary_point
+
+
+class SweepResult(NamedTuple):
+    trial: SweepTrial
+    outcome: SweepOutcome
+    cached: bool
+
+
+# options that don't change the outcome of a trial, or that the sweep sets itself.
+_UNHASHED_FIELDS = {"step_callback", "collect_statistics", "trace_mode", "trace_capacity", "trace_timestamps",
+                    "trace_x_path", "checkpoint_path", "checkpoint_interval"}
+
+
+def trial_options(trial: SweepTrial, base_options: OptimizationOptions) -> OptimizationOptions:
+    # no checkpoints: the trials run in parallel and would share the base options' file.
+    return base_options._replace(**dict(trial.overrides), step_callback=step_callback_noop, collect_statistics=True,
+                                 checkpoint_path=None)
+
+
+def trial_key(trial: SweepTrial, options: OptimizationOptions) -> str:
+    # all the fields, not just the overrides, so that a changed default invalidates the cached trials.
+    fields = {field: value for field, value in options._asdict().items() if field not in _UNHASHED_FIELDS}
+    payload = json.dumps({"problem": trial.problem_type, "method": trial.method, "options": fields}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SweepCache:
+    # outcomes by trial key, in a JSON file. save() writes then renames, like the .npy caches of load_csv.
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._outcomes: dict[str, SweepOutcome] = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as json_file:
+                for key, outcome in json.load(json_file).items():
+                    reason = outcome["termination_reason"]
+                    outcome["termination_reason"] = None if reason is None else OptimizationTerminationReason(reason)
+                    self._outcomes[key] = SweepOutcome(**outcome)
+
+    def __len__(self) -> int:
+        return len(self._outcomes)
+
+    def get(self, key: str, abort_limit: Optional[int]) -> Optional[SweepOutcome]:
+        # an aborted outcome stands in only for a run that would be aborted at the same point or earlier.
+        outcome = self._outcomes.get(key)
+        if outcome is not None and outcome.aborted and (abort_limit is None or abort_limit > outcome.abort_limit):
+            return None
+        return outcome
+
+    def put(self, key: str, outcome: SweepOutcome):
+        self._outcomes[key] = outcome
+
+    def save(self):
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w") as json_file:
+            json.dump({key: outcome._asdict() for key, outcome in self._outcomes.items()}, json_file)
+        os.replace(temporary_path, self.path)
+
+
+class _TrialAborted(Exception):
+    pass
+
+
+class _StepMonitor:
+    # the trial's step_callback: keeps the gradient norms and aborts the run past the iteration limit.
+    def __init__(self, abort_limit: Optional[int]):
+        self.abort_limit = abort_limit
+        self.gradient_norms: list[float] = []
+        self.last_step: Optional[OptimizationStep] = None
+
+    def __call__(self, k: int, step: OptimizationStep):
+        self.gradient_norms.append(step.after_gradient_norm)
+        self.last_step = step
+        # a run that converges at the limit is not aborted.
+        if self.abort_limit is not None and k > self.abort_limit:
+            raise _TrialAborted()
+
+
+def _init_worker(threads_per_worker: int):
+    torch.set_num_threads(threads_per_worker)
+
+
+def _run_trial(problem_type: ProblemType, method: Method, options: OptimizationOptions,
+               abort_limit: Optional[int]) -> SweepOutcome:
+    monitor = _StepMonitor(abort_limit)
+    start = time.perf_counter()
+    try:
+        results = run_optimization(method, load_problem(problem_type), options._replace(step_callback=monitor))
+    except _TrialAborted:
+        last_step = monitor.last_step
+        return SweepOutcome(None, last_step.after_function_value, last_step.after_gradient_norm,
+                            len(monitor.gradient_norms) - 1, 0, time.perf_counter() - start, monitor.gradient_norms,
+                            abort_limit)
+    statistics = results.statistics
+    evaluations = statistics.function_evaluations + statistics.gradient_evaluations + \
+        statistics.value_and_gradient_evaluations
+    return SweepOutcome(results.termination_reason, results.final_function_value, results.final_gradient_norm,
+                        results.trace.total_steps - 1, evaluations, time.perf_counter() - start,
+                        monitor.gradient_norms)
+
+
+def _check_space(space: dict[str, Any], strategy: SweepStrategy):
+    for field, values in space.items():
+        if field not in OptimizationOptions._fields or field in _UNHASHED_FIELDS:
+            raise ValueError(f"not a sweepable option: {field}")
+        if isinstance(values, SweepRange):
+            if strategy == SweepStrategy.grid:
+                raise ValueError(f"grid sweeps need a list of values: {field}")
+            if values.low > values.high or (values.log and values.low <= 0):
+                raise ValueError(f"invalid range: {field}={values}")
+        elif len(values) == 0:
+            raise ValueError(f"no values: {field}")
+    if strategy == SweepStrategy.successive_halving and "max_iterations" in space:
+        raise ValueError("successive halving sets max_iterations itself")
+
+
+def grid_configurations(space: dict[str, list]) -> list[tuple[tuple[str, Any], ...]]:
+    fields = sorted(space)
+    return [tuple(zip(fields, values)) for values in itertools.product(*(space[field] for field in fields))]
+
+
+def random_configurations(space: dict[str, Any], samples: int, seed: int) -> list[tuple[tuple[str, Any], ...]]:
+    generator = random.Random(seed)
+
+    def draw(values) -> Any:
+        if not isinstance(values, SweepRange):
+            return generator.choice(values)
+        if values.log:
+            return math.exp(generator.uniform(math.log(values.low), math.log(values.high)))
+        return generator.uniform(values.low, values.high)
+
+    fields = sorted(space)
+    return [tuple((field, draw(space[field])) for field in fields) for _ in range(samples)]
+
+
+def _outcome_rank_key(outcome: SweepOutcome) -> tuple:
+    # converged trials by evaluations, then the others by gradient norm. aborted trials are dominated.
+    if outcome.converged:
+        return 0, outcome.evaluations
+    if not outcome.aborted:
+        return 1, outcome.final_gradient_norm
+    return 2, 0
+
+
+def rank_configurations(results: list[SweepResult]) -> list[tuple[tuple[str, Any], ...]]:
+    # best first, by the sum of a configuration's ranks over the (problem, method) pairs.
+    by_pair = collections.defaultdict(list)
+    for result in results:
+        by_pair[(result.trial.problem_type, result.trial.method)].append(result)
+    rank_sums = collections.Counter()
+    for pair_results in by_pair.values():
+        for rank, result in enumerate(sorted(pair_results, key=lambda r: _outcome_rank_key(r.outcome))):
+            rank_sums[result.trial.overrides] += rank
+    configurations = list(dict.fromkeys(result.trial.overrides for result in results))
+    return sorted(configurations, key=lambda configuration: rank_sums[configuration])
+
+
+class _TrialRunner:
+    # runs trials through the cache and, unless max_workers is 1, a spawn process pool. at most two trials per
+    # worker are in flight, so that the abort limits of later trials see the trials completed so far.
+    def __init__(self, sweep_options: SweepOptions, base_options: OptimizationOptions, cache: SweepCache):
+        self.sweep_options = sweep_options
+        self.base_options = base_options
+        self.cache = cache
+        # fewest iterations to converge, by (problem, method).
+        self.best_iterations: dict[tuple[ProblemType, Method], int] = {}
+
+    def abort_limit(self, trial: SweepTrial) -> Optional[int]:
+        best = self.best_iterations.get((trial.problem_type, trial.method))
+        if self.sweep_options.abort_ratio is None or best is None:
+            return None
+        return max(1, math.ceil(self.sweep_options.abort_ratio * best))
+
+    def completed(self, trial: SweepTrial, outcome: SweepOutcome):
+        if outcome.converged:
+            pair = (trial.problem_type, trial.method)
+            self.best_iterations[pair] = min(self.best_iterations.get(pair, outcome.iterations), outcome.iterations)
+
+    def run(self, trials: list[SweepTrial]) -> list[SweepResult]:
+        results: list[Optional[SweepResult]] = [None] * len(trials)
+        pending = collections.deque()
+        for i, trial in enumerate(trials):
+            options = trial_options(trial, self.base_options)
+            key = trial_key(trial, options)
+            outcome = self.cache.get(key, self.abort_limit(trial))
+            if outcome is None:
+                pending.append((i, trial, options, key))
+            else:
+                results[i] = SweepResult(trial, outcome, True)
+                self.completed(trial, outcome)
+
+        max_workers = self.sweep_options.max_workers or os.cpu_count() or 1
+        if max_workers == 1:
+            while pending:
+                i, trial, options, key = pending.popleft()
+                outcome = _run_trial(trial.problem_type, trial.method, options, self.abort_limit(trial))
+                results[i] = self._store(trial, key, outcome)
+            return results
+
+        threads_per_worker = max(1, (os.cpu_count() or 1) // max_workers)
+        # spawn instead of fork, as in generate_html_benchmarks.
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                    mp_context=multiprocessing.get_context("spawn"),
+                                                    initializer=_init_worker,
+                                                    initargs=(threads_per_worker,)) as executor:
+            in_flight = {}
+            while pending or in_flight:
+                while pending and len(in_flight) < 2 * max_workers:
+                    i, trial, options, key = pending.popleft()
+                    future = executor.submit(_run_trial, trial.problem_type, trial.method, options,
+                                             self.abort_limit(trial))
+                    in_flight[future] = (i, trial, key)
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    i, trial, key = in_flight.pop(future)
+                    results[i] = self._store(trial, key, future.result())
+        return results
+
+    def _store(self, trial: SweepTrial, key: str, outcome: SweepOutcome) -> SweepResult:
+        self.cache.put(key, outcome)
+        self.completed(trial, outcome)
+        return SweepResult(trial, outcome, False)
+
+
+def run_sweep(problem_types: list[ProblemType], methods: list[Method], space: dict[str, Any],
+              sweep_options: SweepOptions = SweepOptions(),
+              base_options: OptimizationOptions = OptimizationOptions()) -> list[SweepResult]:
+    # results in configuration, problem, method order. successive halving returns the trials of every rung; the
+    # overrides of its rungs include max_iterations.
+    _check_space(space, sweep_options.strategy)
+    if sweep_options.samples < 1 or sweep_options.halving_eta < 2 or sweep_options.halving_min_iterations < 1:
+        raise ValueError("samples and halving_min_iterations must be positive and halving_eta at least 2")
+
+    cache = SweepCache(sweep_options.cache_path)
+    runner = _TrialRunner(sweep_options, base_options, cache)
+
+    def trials(configurations: list[tuple[tuple[str, Any], ...]]) -> list[SweepTrial]:
+        return [SweepTrial(problem_type, method, configuration)
+                for configuration in configurations for problem_type in problem_types for method in methods]
+
+    try:
+        match sweep_options.strategy:
+            case SweepStrategy.grid:
+                return runner.run(trials(grid_configurations(space)))
+            case SweepStrategy.random:
+                return runner.run(trials(random_configurations(space, sweep_options.samples, sweep_options.seed)))
+            case SweepStrategy.successive_halving:
+                return _successive_halving(runner, trials, space, sweep_options, base_options.max_iterations)
+            case _:
+                raise NotImplementedError(f"unknown sweep strategy: {sweep_options.strategy}")
+    finally:
+        cache.save()
+
+
+def _successive_halving(runner: _TrialRunner, trials, space: dict[str, Any], sweep_options: SweepOptions,
+                        max_iterations: int) -> list[SweepResult]:
+    configurations = random_configurations(space, sweep_options.samples, sweep_options.seed)
+    budget = min(sweep_options.halving_min_iterations, max_iterations)
+    results = []
+    while True:
+        rung = [configuration + (("max_iterations", budget),) for configuration in configurations]
+        rung_results = runner.run(trials(rung))
+        results.extend(rung_results)
+        if budget == max_iterations or len(configurations) == 1:
+            return results
+
+        # the rung's configurations back without the budget, best first.
+        ranked = [configuration[:-1] for configuration in rank_configurations(rung_results)]
+        configurations = ranked[:math.ceil(len(ranked) / sweep_options.halving_eta)]
+        budget = min(budget * sweep_options.halving_eta, max_iterations)
@@ -0,0 +1,43 @@
+import os
+
+from benchmarks import suite
+from benchmarks.suite import summarize, compare, save_results, load_results, BenchmarkSummary, benchmark_key
+from methods.methods import Method
+from problems.problems import ProblemType
+
+
+def test_summarize():
+    summary = summarize([5, 1, 4, 2, 3], 10)
+    assert summary == BenchmarkSummary(3, 2, 4, 5, 10)
+    assert summarize([7], 1) == BenchmarkSummary(7, 7, 7, 1, 1)
+
+
+def test_compare_needs_a_clear_slowdown():
+    baseline = {"a": BenchmarkSummary(100, 90, 110, 5, 10), "b": BenchmarkSummary(100, 90, 110, 5, 10),
+                "c": BenchmarkSummary(100, 90, 110, 5, 10), "d": BenchmarkSummary(100, 90, 110, 5, 10)}
+    current = {"a": BenchmarkSummary(150, 140, 160, 5, 10),
+               # over the threshold but within the baseline's noise.
+               "b": BenchmarkSummary(120, 105, 140, 5, 10),
+               "c": BenchmarkSummary(80, 70, 90, 5, 10),
+               "d": BenchmarkSummary(100, 90, 110, 5, 11),
+               "new": BenchmarkSummary(100, 90, 110, 5, 10)}
+
+    regressed = {comparison.key: comparison.regressed for comparison in compare(baseline, current, 1.1)}
+    assert regressed == {"a": True, "b": False, "c": False, "d": True}
+
+
+def test_baseline_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "baseline", "results.json")
+    results = {"rosenbrock_2/bfgs": BenchmarkSummary(1.5e5, 1.4e5, 1.7e5, 15, 34)}
+    save_results(path, results, {"threads": 1})
+    assert load_results(path) == results
+
+
+def test_problems_without_data_are_skipped(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(suite, "problem_data_available", lambda problem_type: problem_type != ProblemType.P1_quad_10_10)
+    path = os.path.join(tmp_path, "baseline.json")
+    assert suite.go([ProblemType.P1_quad_10_10, ProblemType.Rosenbrock_2], [Method.LBFGSW], 0, 1, 1, path, None,
+                    1.1) == 0
+
+    assert list(load_results(path)) == [benchmark_key(ProblemType.Rosenbrock_2, Method.LBFGSW)]
+    assert "problem=p1_quad_10_10" in capsys.readouterr().err
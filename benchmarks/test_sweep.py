@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from benchmarks.sweep import run_sweep, SweepOptions, SweepStrategy, SweepRange, SweepCache, grid_configurations, \
+    random_configurations, rank_configurations, trial_options, SweepTrial, _StepMonitor, _TrialAborted
+from methods.methods import Method, OptimizationOptions, OptimizationStep
+from problems.problems import ProblemType
+
+
+def test_grid_configurations():
+    configurations = grid_configurations({"wolfe_line_search_c2": [0.5, 0.9], "wolfe_line_search_c1": [1e-4]})
+    assert configurations == [(("wolfe_line_search_c1", 1e-4), ("wolfe_line_search_c2", 0.5)),
+                              (("wolfe_line_search_c1", 1e-4), ("wolfe_line_search_c2", 0.9))]
+
+
+def test_random_configurations():
+    space = {"wolfe_line_search_c1": SweepRange(1e-5, 1e-2, log=True), "l_bfgs_memory": [3, 5, 10]}
+    configurations = random_configurations(space, 50, seed=1)
+    assert configurations == random_configurations(space, 50, seed=1)
+    assert configurations != random_configurations(space, 50, seed=2)
+    for configuration in configurations:
+        values = dict(configuration)
+        assert 1e-5 <= values["wolfe_line_search_c1"] <= 1e-2
+        assert values["l_bfgs_memory"] in [3, 5, 10]
+
+
+def test_invalid_spaces():
+    with pytest.raises(ValueError):
+        run_sweep([ProblemType.Rosenbrock_2], [Method.BFGSW], {"no_such_option": [1]})
+    with pytest.raises(ValueError):
+        run_sweep([ProblemType.Rosenbrock_2], [Method.BFGSW], {"wolfe_line_search_c1": SweepRange(0, 1)})
+    with pytest.raises(ValueError):
+        run_sweep([ProblemType.Rosenbrock_2], [Method.BFGSW], {"step_callback": [print]})
+
+
+def test_grid_sweep_is_memoized(tmp_path):
+    path = os.path.join(tmp_path, "cache.json")
+    sweep_options = SweepOptions(abort_ratio=None, max_workers=1, cache_path=path)
+    problem_types = [ProblemType.Rosenbrock_2, ProblemType.P5_quartic_1]
+    methods = [Method.BFGSW, Method.NewtonCGW]
+
+    first = run_sweep(problem_types, methods, {"wolfe_line_search_c2": [0.5, 0.9]}, sweep_options)
+    assert len(first) == 8
+    assert not any(result.cached for result in first)
+    assert len(SweepCache(path)) == 8
+
+    second = run_sweep(problem_types, methods, {"wolfe_line_search_c2": [0.5, 0.7, 0.9]}, sweep_options)
+    assert [dict(result.trial.overrides)["wolfe_line_search_c2"] for result in second if not result.cached] == \
+           [0.7] * 4
+    for result in second:
+        if result.cached:
+            assert result.outcome in [earlier.outcome for earlier in first if earlier.trial == result.trial]
+        assert result.outcome.converged
+        assert len(result.outcome.gradient_norms) == result.outcome.iterations + 1
+
+    # a changed base option is a different trial.
+    third = run_sweep(problem_types, methods, {"wolfe_line_search_c2": [0.9]}, sweep_options,
+                      OptimizationOptions(wolfe_line_search_c1=1e-4))
+    assert not any(result.cached for result in third)
+
+
+def test_dominated_trials_are_aborted(tmp_path):
+    path = os.path.join(tmp_path, "cache.json")
+    sweep_options = SweepOptions(abort_ratio=1, max_workers=1, cache_path=path)
+    problem_types = [ProblemType.Exponential_10]
+    methods = [Method.LBFGS]
+    space = {"armijo_backtracking_c1": [0.5, 1e-4]}
+
+    fast, slow = run_sweep(problem_types, methods, space, sweep_options)
+    assert fast.outcome.converged
+    assert slow.outcome.aborted
+    assert slow.outcome.abort_limit == fast.outcome.iterations
+    assert slow.outcome.iterations == slow.outcome.abort_limit + 1
+
+    # the aborted trial is cached for the same abort limit, and runs again without one.
+    assert run_sweep(problem_types, methods, space, sweep_options)[1].cached
+    rerun = run_sweep(problem_types, methods, {"armijo_backtracking_c1": [1e-4]},
+                      sweep_options._replace(abort_ratio=None))
+    assert not rerun[0].cached
+    assert rerun[0].outcome.converged
+    assert rerun[0].outcome.iterations > fast.outcome.iterations
+
+
+def test_abort_limit_is_inclusive():
+    # a trial that converges at exactly the limit is not aborted.
+    monitor = _StepMonitor(5)
+    for k in range(6):
+        monitor(k, OptimizationStep(1, 1, 1))
+    with pytest.raises(_TrialAborted):
+        monitor(6, OptimizationStep(1, 1, 1))
+
+
+def test_trials_write_no_checkpoints():
+    trial = SweepTrial(ProblemType.Rosenbrock_2, Method.LBFGS, (("l_bfgs_memory", 3),))
+    options = trial_options(trial, OptimizationOptions(checkpoint_path="generated/run.pt"))
+    assert options.checkpoint_path is None
+    assert options.l_bfgs_memory == 3
+
+
+def test_successive_halving():
+    sweep_options = SweepOptions(strategy=SweepStrategy.successive_halving, samples=9, halving_eta=3,
+                                 halving_min_iterations=10, abort_ratio=None, max_workers=1)
+    results = run_sweep([ProblemType.Rosenbrock_2], [Method.LBFGSW, Method.BFGSW],
+                        {"wolfe_line_search_c2": SweepRange(0.1, 0.99)}, sweep_options,
+                        OptimizationOptions(max_iterations=90))
+
+    budgets = [dict(result.trial.overrides)["max_iterations"] for result in results]
+    assert budgets == [10] * 18 + [30] * 6 + [90] * 2
+
+    # the configurations of each rung are the best of the one before.
+    first_rung = [result for result in results if dict(result.trial.overrides)["max_iterations"] == 10]
+    promoted = {result.trial.overrides[:-1] for result in results[18:24]}
+    assert promoted == {configuration[:-1] for configuration in rank_configurations(first_rung)[:3]}
+
+
+def test_process_pool_matches_in_process():
+    space = {"wolfe_line_search_c2": [0.5, 0.9]}
+    in_process = run_sweep([ProblemType.Rosenbrock_2], [Method.BFGSW], space, SweepOptions(max_workers=1))
+    pooled = run_sweep([ProblemType.Rosenbrock_2], [Method.BFGSW], space, SweepOptions(max_workers=2))
+    assert [result.trial for result in pooled] == [result.trial for result in in_process]
+    assert [result.outcome.gradient_norms for result in pooled] == \
+           [result.outcome.gradient_norms for result in in_process]
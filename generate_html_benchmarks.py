@@ -1,11 +1,23 @@
+import concurrent.futures
+import datetime
+import multiprocessing
 import os
+from typing import NamedTuple, Optional
 
-from methods.methods import Method, OptimizationOptions
+import torch
+
+from methods.methods import Method, OptimizationOptions, OptimizationPhase, TimedOptimizationResults
 from methods.run_optimization import timed_run_optimization
-from problems.problems import ProblemType, load_problem
+from problems.problems import ProblemType, load_problem, PROBLEM_DIMENSIONS
 from methods.timedelta_format import timedelta_format
 
 
+class BenchmarkJob(NamedTuple):
+    problem_type: ProblemType
+    method: Method
+    options: OptimizationOptions
+
+
 def mkdir_generated():
     try:
         os.mkdir("generated")
@@ -14,43 +26,131 @@ def mkdir_generated():
         pass
 
 
-def go():
-    mkdir_generated()
+# rough cost exponent in the dimension n of one iteration of each method: dense factorizations are n^3, dense
+# quasi-newton matrices n^2 and the rest O(n) apart from the oracles.
+def estimated_job_cost(method: Method, n: int) -> float:
+    match method:
+        case Method.ModifiedNewton | Method.ModifiedNewtonW | Method.TrustRegionDogleg:
+            return n**3
+        case Method.BFGS | Method.BFGSW | Method.BFGSCholesky | Method.BFGSCholeskyW | Method.DFP | Method.DFPW | \
+                Method.TrustRegionSR1:
+            return n**2
+        case _:
+            return n
 
-    options = OptimizationOptions()
-    for problem_type in ProblemType:
-        problem = load_problem(ProblemType(problem_type))
-        print(f"loaded. problem={problem_type}")
-
-        file_path = os.path.join("generated", f"{problem_type}.html")
-        with open(file_path, 'w') as html_file:
-            html_file.write("<html><body>")
-            html_file.write("<div>")
-            html_file.write("<table>")
+
+def _init_worker(threads_per_worker: int):
+    # one pool worker per core share, so that the workers' torch intra-op thread pools don't oversubscribe the cores.
+    torch.set_num_threads(threads_per_worker)
+
+
+def _run_job(job: BenchmarkJob) -> tuple[BenchmarkJob, TimedOptimizationResults]:
+    # load_problem is memoized, so each worker reads a problem's data files once, not once per job.
+    return job, timed_run_optimization(job.method, load_problem(job.problem_type), job.options)
+
+
+def run_benchmark_jobs(jobs: list[BenchmarkJob], costs: list[float],
+                       max_workers: Optional[int] = None) -> dict[tuple[ProblemType, Method], TimedOptimizationResults]:
+    cpu_count = os.cpu_count() or 1
+    if max_workers is None:
+        max_workers = cpu_count
+    threads_per_worker = max(1, cpu_count // max_workers)
+
+    # longest jobs first so that a slow job started last doesn't hold up the whole grid.
+    ordered_jobs = [job for _, job in sorted(zip(costs, jobs), key=lambda cost_job: -cost_job[0])]
+
+    results = {}
+    # spawn instead of fork: forking a process that has already started torch's thread pools is unsafe.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_worker,
+                                                initargs=(threads_per_worker,)) as executor:
+        futures = [executor.submit(_run_job, job) for job in ordered_jobs]
+        for future in concurrent.futures.as_completed(futures):
+            job, timed_results = future.result()
+            print(f"method={job.method}. problem={job.problem_type}. time={timedelta_format(timed_results.run_time)}")
+            results[(job.problem_type, job.method)] = timed_results
+
+    return results
+
+
+def write_problem_html(problem_type: ProblemType,
+                       results: dict[tuple[ProblemType, Method], TimedOptimizationResults]):
+    file_path = os.path.join("generated", f"{problem_type}.html")
+    with open(file_path, 'w') as html_file:
+        html_file.write("<html><body>")
+        html_file.write("<div>")
+        html_file.write("<table>")
+        html_file.write("<tr>")
+        html_file.write("<th>method</th>")
+        html_file.write("<th>final f</th>")
+        html_file.write("<th>gradient norm</th>")
+        html_file.write("<th>steps</th>")
+        html_file.write("<th>time</th>")
+        html_file.write("<th>termination reason</th>")
+        html_file.write("<th>f evals</th>")
+        html_file.write("<th>gradient evals</th>")
+        html_file.write("<th>f and gradient evals</th>")
+        html_file.write("<th>hessian evals</th>")
+        html_file.write("<th>hessian-vector products</th>")
+        html_file.write("<th>line search trials</th>")
+        html_file.write("<th>CG iterations</th>")
+        html_file.write("<th>rejected trust region steps</th>")
+        html_file.write("<th>radius contractions</th>")
+        html_file.write("<th>radius expansions</th>")
+        for phase in OptimizationPhase:
+            html_file.write(f"<th>{phase.replace('_', ' ')} time</th>")
+        html_file.write("</tr>")
+
+        for method in Method:
+            timed_results = results[(problem_type, method)]
             html_file.write("<tr>")
-            html_file.write("<th>method</th>")
-            html_file.write("<th>final f</th>")
-            html_file.write("<th>gradient norm</th>")
-            html_file.write("<th>steps</th>")
-            html_file.write("<th>time</th>")
-            html_file.write("<th>termination reason</th>")
+            html_file.write(f"<td>{method.name}</td>")
+            html_file.write(f"<td>{timed_results.results.final_function_value:<14.5f}</td>")
+            html_file.write(f"<td>{timed_results.results.final_gradient_norm:<10.5f}</td>")
+            html_file.write(f"<td>{timed_results.results.trace.total_steps}</td>")
+            html_file.write(f"<td>{timedelta_format(timed_results.run_time)}</td>")
+            html_file.write(f"<td>{timed_results.results.termination_reason}</td>")
+            statistics = timed_results.results.statistics
+            if statistics is not None:
+                html_file.write(f"<td>{statistics.function_evaluations}</td>")
+                html_file.write(f"<td>{statistics.gradient_evaluations}</td>")
+                html_file.write(f"<td>{statistics.value_and_gradient_evaluations}</td>")
+                html_file.write(f"<td>{statistics.hessian_evaluations}</td>")
+                html_file.write(f"<td>{statistics.hessian_vector_products}</td>")
+                html_file.write(f"<td>{statistics.line_search_trials}</td>")
+                html_file.write(f"<td>{statistics.cg_iterations}</td>")
+                html_file.write(f"<td>{statistics.trust_region_rejected_steps}</td>")
+                html_file.write(f"<td>{statistics.trust_region_contractions}</td>")
+                html_file.write(f"<td>{statistics.trust_region_expansions}</td>")
+                for phase in OptimizationPhase:
+                    phase_time = datetime.timedelta(seconds=statistics.phase_seconds[phase])
+                    html_file.write(f"<td>{timedelta_format(phase_time)}</td>")
             html_file.write("</tr>")
 
-            for method in Method:
-                print(f"method={method}. problem={problem_type}")
-                results = timed_run_optimization(Method(method), problem, options)
-                html_file.write("<tr>")
-                html_file.write(f"<td>{method.name}</td>")
-                html_file.write(f"<td>{results.results.final_function_value:<14.5f}</td>")
-                html_file.write(f"<td>{results.results.final_gradient_norm:<10.5f}</td>")
-                html_file.write(f"<td>{len(results.results.steps)}</td>")
-                html_file.write(f"<td>{timedelta_format(results.run_time)}</td>")
-                html_file.write(f"<td>{results.results.termination_reason}</td>")
-                html_file.write("</tr>")
-
-            html_file.write("</table>")
-            html_file.write("</div>")
-            html_file.write("</body></html>")
+        html_file.write("</table>")
+        html_file.write("</div>")
+        html_file.write("</body></html>")
+
+
+def go(max_workers: Optional[int] = None):
+    mkdir_generated()
+
+    options = OptimizationOptions(collect_statistics=True)
+    jobs = []
+    costs = []
+    for problem_type in ProblemType:
+        # the workers load the problems.
+        n = PROBLEM_DIMENSIONS[problem_type]
+        for method in Method:
+            jobs.append(BenchmarkJob(ProblemType(problem_type), Method(method), options))
+            costs.append(estimated_job_cost(Method(method), n))
+
+    results = run_benchmark_jobs(jobs, costs, max_workers)
+
+    # same files and row order as a sequential run.
+    for problem_type in ProblemType:
+        write_problem_html(ProblemType(problem_type), results)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,200 @@
+import collections
+import math
+from typing import Optional
+
+import torch
+
+from methods.checkpoint import checkpoint_if_due, start_iterate
+from methods.instrumentation import active_recorder
+from methods.methods import OptimizationOptions, OptimizationResults, OptimizationStep, OptimizationTerminationReason, \
+    OptimizationPhase, Method, SolverState, start_trace
+from problems.precision import accumulated_dot, accumulated_norm
+from problems.problems import Problem, ProblemFunctionType
+
+
+# first-order methods that only evaluate f and the gradient, and keep O(n) (Nesterov) or O(n m) (Anderson) state.
+
+def gradient_step_backtracking(options: OptimizationOptions, f: ProblemFunctionType, x: torch.Tensor, fx: float,
+                               gradient: torch.Tensor, lipschitz: float) -> tuple[torch.Tensor, float, float]:
+    # x - gradient / L with f(x - gradient / L) <= f(x) - ||gradient||^2 / (2 L), which holds once L is at least the
+    # lipschitz constant of the gradient near x. returns the new x, its f and L. a failed search returns x.
+    gradient_normsq = accumulated_dot(gradient, gradient, options.accumulation_dtype)
+    lipschitz = lipschitz * options.accelerated_gradient_lipschitz_decrease
+
+    recorder = active_recorder()
+    for _ in range(options.armijo_backtracking_max_iterations):
+        if recorder is not None:
+            recorder.line_search_trials += 1
+        x_next = x - (1 / lipschitz) * gradient
+        f_next = f(x_next)
+        # nan on overflow, which fails the test.
+        if f_next <= fx - gradient_normsq / (2 * lipschitz):
+            return x_next, f_next, lipschitz
+        lipschitz = lipschitz / options.armijo_backtracking_contraction_factor
+
+    return x, fx, lipschitz
+
+
+def run_nesterov_optimization_loop(method: Method, problem: Problem, options: OptimizationOptions,
+                                   initial_state: Optional[SolverState] = None) -> OptimizationResults:
+    # Nesterov's accelerated gradient (FISTA's momentum sequence t_k) with the gradient restart of O'Donoghue and
+    # Candes: the momentum is dropped when the last step went uphill for the gradient it was taken with. the gradient
+    # is only evaluated at the extrapolated points y_k, so those are the iterates that are traced and returned.
+    k0, yk, fyk, gradyk, _ = start_iterate(problem, initial_state)
+    gradyk_norm = accumulated_norm(gradyk, options.accumulation_dtype)
+    lipschitz = options.accelerated_gradient_initial_lipschitz
+    xk = yk
+    tk = 1.0
+    if initial_state is not None and initial_state.lipschitz_estimate is not None:
+        lipschitz = initial_state.lipschitz_estimate
+    if initial_state is not None and initial_state.nesterov_x is not None:
+        xk = initial_state.nesterov_x
+        tk = initial_state.nesterov_t
+
+    def state() -> SolverState:
+        return SolverState(method, i, yk, fyk, gradyk, lipschitz_estimate=lipschitz, nesterov_x=xk, nesterov_t=tk)
+
+    trace = start_trace(options, yk)
+    step = OptimizationStep(0, fyk, gradyk_norm)
+    trace.record(k0, step, yk)
+    options.step_callback(k0, step)
+
+    recorder = active_recorder()
+
+    i = k0
+    for i in range(k0 + 1, options.max_iterations + 1):
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.line_search)
+        x_next, fx_next, lipschitz = gradient_step_backtracking(options, problem.objective_function, yk, fyk, gradyk,
+                                                                lipschitz)
+        if recorder is not None:
+            recorder.enter_phase(None)
+
+        fykm1 = fyk
+        gradykm1_norm = gradyk_norm
+
+        if accumulated_dot(gradyk, x_next - xk, options.accumulation_dtype) > 0:
+            # restart.
+            tk = 1.0
+            yk = x_next
+            fyk = fx_next
+            gradyk = problem.objective_gradient_function(yk)
+        else:
+            tkp1 = (1 + math.sqrt(1 + 4 * tk * tk)) / 2
+            yk = x_next + ((tk - 1) / tkp1) * (x_next - xk)
+            tk = tkp1
+            fyk, gradyk = problem.value_and_gradient(yk)
+        xk = x_next
+        gradyk_norm = accumulated_norm(gradyk, options.accumulation_dtype)
+
+        step = OptimizationStep(1 / lipschitz, fyk, gradyk_norm)
+        trace.record(i, step, yk)
+        options.step_callback(i, step)
+
+        if math.fabs(fykm1 - fyk) < options.no_decrease_tolerance and \
+                math.fabs(gradykm1_norm - gradyk_norm) < options.no_decrease_tolerance:
+            return OptimizationResults(trace.finalize(), yk, fyk, gradyk_norm,
+                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing,
+                                       final_state=state())
+        if gradyk_norm < options.stationary_point_gradient_norm_tolerance:
+            return OptimizationResults(trace.finalize(), yk, fyk, gradyk_norm,
+                                       OptimizationTerminationReason.reached_stationary_point, final_state=state())
+        checkpoint_if_due(options, i, state)
+
+    return OptimizationResults(trace.finalize(), yk, fyk, gradyk_norm,
+                               OptimizationTerminationReason.reached_iteration_limit, final_state=state())
+
+
+def anderson_step(xk: torch.Tensor, gradk: torch.Tensor, step_length: float, dxs: collections.deque,
+                  dgs: collections.deque) -> torch.Tensor:
+    # type-II Anderson acceleration of the fixed point iteration x -> x - step_length * gradient: the combination of
+    # the last steps whose gradient, extrapolated linearly from the differences, is smallest.
+    dx = torch.stack(list(dxs), 1)
+    dg = torch.stack(list(dgs), 1)
+    gamma = torch.linalg.lstsq(dg, gradk.unsqueeze(1)).solution.squeeze(1)
+    return xk - step_length * gradk - torch.mv(dx - step_length * dg, gamma)
+
+
+def run_anderson_optimization_loop(method: Method, problem: Problem, options: OptimizationOptions,
+                                   initial_state: Optional[SolverState] = None) -> OptimizationResults:
+    # an accelerated step is taken when it decreases f as much as the gradient step 1 / L would be guaranteed to.
+    # otherwise the history is cleared and the loop takes the gradient step.
+    if options.anderson_memory < 1:
+        raise ValueError(f"anderson memory must be positive: {options.anderson_memory}")
+
+    n = problem.x0.shape[0]
+    dxs = collections.deque(maxlen=min(options.anderson_memory, n))
+    dgs = collections.deque(maxlen=min(options.anderson_memory, n))
+    lipschitz = options.accelerated_gradient_initial_lipschitz
+    if initial_state is not None and initial_state.anderson_dxs is not None:
+        dxs.extend(initial_state.anderson_dxs)
+        dgs.extend(initial_state.anderson_dgs)
+    if initial_state is not None and initial_state.lipschitz_estimate is not None:
+        lipschitz = initial_state.lipschitz_estimate
+
+    k0, xk, fk, gradk, _ = start_iterate(problem, initial_state)
+    gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
+
+    def state() -> SolverState:
+        return SolverState(method, i, xk, fk, gradk, lipschitz_estimate=lipschitz,
+                           anderson_dxs=torch.stack(list(dxs)) if dxs else None,
+                           anderson_dgs=torch.stack(list(dgs)) if dgs else None)
+
+    trace = start_trace(options, xk)
+    step = OptimizationStep(0, fk, gradk_norm)
+    trace.record(k0, step, xk)
+    options.step_callback(k0, step)
+
+    recorder = active_recorder()
+
+    i = k0
+    for i in range(k0 + 1, options.max_iterations + 1):
+        x_next = None
+        if dxs:
+            if recorder is not None:
+                recorder.enter_phase(OptimizationPhase.search_direction)
+            candidate = anderson_step(xk, gradk, 1 / lipschitz, dxs, dgs)
+            if recorder is not None:
+                recorder.enter_phase(None)
+            f_candidate, gradient_candidate = problem.value_and_gradient(candidate)
+            if f_candidate <= fk - gradk_norm * gradk_norm / (2 * lipschitz):
+                x_next, f_next, grad_next = candidate, f_candidate, gradient_candidate
+            else:
+                dxs.clear()
+                dgs.clear()
+
+        if x_next is None:
+            if recorder is not None:
+                recorder.enter_phase(OptimizationPhase.line_search)
+            x_next, f_next, lipschitz = gradient_step_backtracking(options, problem.objective_function, xk, fk,
+                                                                   gradk, lipschitz)
+            if recorder is not None:
+                recorder.enter_phase(None)
+            grad_next = problem.objective_gradient_function(x_next)
+
+        dxs.append(x_next - xk)
+        dgs.append(grad_next - gradk)
+
+        fkm1 = fk
+        gradkm1_norm = gradk_norm
+        xk = x_next
+        fk = f_next
+        gradk = grad_next
+        gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
+
+        step = OptimizationStep(1 / lipschitz, fk, gradk_norm)
+        trace.record(i, step, xk)
+        options.step_callback(i, step)
+
+        if math.fabs(fkm1 - fk) < options.no_decrease_tolerance and \
+                math.fabs(gradkm1_norm - gradk_norm) < options.no_decrease_tolerance:
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing,
+                                       final_state=state())
+        if gradk_norm < options.stationary_point_gradient_norm_tolerance:
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.reached_stationary_point, final_state=state())
+        checkpoint_if_due(options, i, state)
+
+    return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                               OptimizationTerminationReason.reached_iteration_limit, final_state=state())
@@ -0,0 +1,151 @@
+import atexit
+import collections
+import json
+import sys
+import threading
+from enum import StrEnum, auto
+from typing import Optional, TextIO
+
+from methods.methods import OptimizationStep
+from methods.optimization_print import format_header, format_step
+
+
+class StepOutputFormat(StrEnum):
+    # the optimization_print table.
+    stdout = auto()
+    csv = auto()
+    jsonl = auto()
+
+
+class BackpressurePolicy(StrEnum):
+    # a full queue discards the step and counts it in dropped. the solver never waits.
+    drop = auto()
+    # a full queue makes the solver wait for the writer. no step is lost.
+    block = auto()
+
+
+class AsyncStepWriter:
+    # a step_callback that only appends (k, step) to a bounded queue. a background thread formats and writes the
+    # queued steps in batches, every flush_interval seconds or as soon as the queue is full, to path or, without a
+    # path, to stdout. use it as a context manager, or call close(); it is also closed at interpreter exit.
+    #
+    #     with AsyncStepWriter(StepOutputFormat.csv, "steps.csv") as writer:
+    #         run_optimization(method, problem, options._replace(step_callback=writer))
+    def __init__(self, output_format: StepOutputFormat = StepOutputFormat.stdout, path: Optional[str] = None,
+                 max_queue_size: int = 4096, policy: BackpressurePolicy = BackpressurePolicy.drop,
+                 flush_interval: float = 0.1):
+        if max_queue_size < 1:
+            raise ValueError(f"queue size must be positive: {max_queue_size}")
+
+        self.output_format = output_format
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        self._output: TextIO = sys.stdout if path is None else open(path, "w", newline="")
+        self._owns_output = path is not None
+        # deque appends and pops are atomic, so the solver side takes no lock.
+        self._pending: collections.deque[tuple[int, OptimizationStep]] = collections.deque()
+        self._enqueued = 0
+        self._written = 0
+        self._closing = False
+        self._closed = False
+        self._wake = threading.Event()
+        # signalled by the writer after each batch, for block and flush() to wait on.
+        self._batch_written = threading.Condition()
+
+        self._write_text(self._header())
+        self._thread = threading.Thread(target=self._run, name="AsyncStepWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __call__(self, k: int, step: OptimizationStep):
+        if len(self._pending) >= self.max_queue_size:
+            if self.policy == BackpressurePolicy.drop:
+                self.dropped += 1
+                self._wake.set()
+                return
+            with self._batch_written:
+                while len(self._pending) >= self.max_queue_size and self._thread.is_alive():
+                    self._wake.set()
+                    self._batch_written.wait(self.flush_interval)
+        self._pending.append((k, step))
+        self._enqueued += 1
+        if len(self._pending) >= self.max_queue_size:
+            self._wake.set()
+
+    def flush(self):
+        # waits until every step queued so far is written.
+        target = self._enqueued
+        with self._batch_written:
+            while self._written < target and self._thread.is_alive():
+                self._wake.set()
+                self._batch_written.wait(self.flush_interval)
+        self._output.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+
+        self._closing = True
+        self._wake.set()
+        self._thread.join()
+        self._output.flush()
+        if self._owns_output:
+            self._output.close()
+
+    def __enter__(self) -> "AsyncStepWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # read before draining, so that steps queued before close() are always written.
+            closing = self._closing
+            self._write_batch()
+            if closing:
+                return
+
+    def _write_batch(self):
+        batch = []
+        while self._pending:
+            batch.append(self._pending.popleft())
+        if batch:
+            self._write_text("".join(self._format(k, step) + "\n" for k, step in batch))
+        with self._batch_written:
+            self._written += len(batch)
+            self._batch_written.notify_all()
+
+    def _write_text(self, text: str):
+        self._output.write(text)
+        if not self._owns_output:
+            self._output.flush()
+
+    def _header(self) -> str:
+        match self.output_format:
+            case StepOutputFormat.stdout:
+                return format_header() + "\n"
+            case StepOutputFormat.csv:
+                return "k,step_length,after_function_value,after_gradient_norm\n"
+            case StepOutputFormat.jsonl:
+                return ""
+            case _:
+                raise NotImplementedError(f"unknown step output format: {self.output_format}")
+
+    def _format(self, k: int, step: OptimizationStep) -> str:
+        match self.output_format:
+            case StepOutputFormat.stdout:
+                return format_step(k, step)
+            case StepOutputFormat.csv:
+                return f"{k},{step.step_length!r},{step.after_function_value!r},{step.after_gradient_norm!r}"
+            case StepOutputFormat.jsonl:
+                return json.dumps({"k": k, **step._asdict()})
+            case _:
+                raise NotImplementedError(f"unknown step output format: {self.output_format}")
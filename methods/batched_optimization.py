@@ -0,0 +1,304 @@
+import math
+from typing import Callable, NamedTuple, Optional
+
+import torch
+
+from methods.methods import OptimizationOptions, OptimizationTerminationReason
+from problems.problems import Problem
+
+# the batched loops run K starting points, the rows of a (K x n) matrix, together. every row has its own step length
+# and its own termination, and the objective, gradient and hessian are evaluated for all active rows in one call.
+
+type BatchedFunctionType = Callable[[torch.Tensor], torch.Tensor]
+type BatchedValueAndGradientFunctionType = Callable[[torch.Tensor], tuple[torch.Tensor, torch.Tensor]]
+
+
+class BatchedOracles(NamedTuple):
+    # (K x n) -> (K)
+    objective_function: BatchedFunctionType
+    # (K x n) -> (K), (K x n)
+    value_and_gradient: BatchedValueAndGradientFunctionType
+    # (K x n) -> (K x n x n)
+    objective_hessian_function: BatchedFunctionType
+
+
+class BatchedOptimizationResults(NamedTuple):
+    final_x: torch.Tensor
+    final_function_values: torch.Tensor
+    final_gradient_norms: torch.Tensor
+    # iterations taken by each row.
+    iterations: torch.Tensor
+    termination_reasons: list[OptimizationTerminationReason]
+
+
+def batched_oracles(problem: Problem) -> BatchedOracles:
+    f = problem.tensor_objective_function
+    if f is None:
+        raise ValueError(f"{problem.problem_type} has no tensor objective function for batched optimization")
+
+    # the rows are independent, so the gradient of the summed values is the matrix of per-row gradients. plain
+    # autograd has much less per-call overhead here than torch.func.
+    def value_and_gradient(xs: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        xs = xs.detach().requires_grad_(True)
+        with torch.enable_grad():
+            values = f(xs)
+            gradients, = torch.autograd.grad(torch.sum(values), xs)
+        return values.detach(), gradients
+
+    # row i of every hessian is the gradient of the summed i-th gradient components: n backward passes.
+    def hessian(xs: torch.Tensor) -> torch.Tensor:
+        xs = xs.detach().requires_grad_(True)
+        with torch.enable_grad():
+            gradients, = torch.autograd.grad(torch.sum(f(xs)), xs, create_graph=True)
+            hessian_rows = [torch.autograd.grad(torch.sum(gradients[:, i]), xs, retain_graph=True)[0]
+                            for i in range(xs.shape[1])]
+        return torch.stack(hessian_rows, 1)
+
+    return BatchedOracles(f, value_and_gradient, hessian)
+
+
+class BatchedLineSearchResult(NamedTuple):
+    # zero for rows that were not searched or whose line search failed.
+    step_lengths: torch.Tensor
+    function_values: torch.Tensor
+    # gradients at the accepted points, or None if the line search does not compute them.
+    gradients: Optional[torch.Tensor]
+
+
+type BatchedLineSearchFunctionType = Callable[[
+    OptimizationOptions, BatchedOracles, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor,
+    torch.Tensor], BatchedLineSearchResult]
+
+
+def batched_armijo_backtracking(options: OptimizationOptions, oracles: BatchedOracles, active: torch.Tensor,
+                                xk: torch.Tensor, fk: torch.Tensor, gradk: torch.Tensor, searchk: torch.Tensor,
+                                alpha_init: torch.Tensor) -> BatchedLineSearchResult:
+    slopes = torch.sum(searchk * gradk, 1)
+    alphas = torch.where(active, alpha_init, 0)
+    function_values = fk.clone()
+    pending = active.clone()
+
+    for contraction_iter in range(1, options.armijo_backtracking_max_iterations):
+        rows = torch.nonzero(pending).squeeze(1)
+        if rows.numel() == 0:
+            break
+
+        trial_values = oracles.objective_function(xk[rows] + alphas[rows].unsqueeze(1) * searchk[rows])
+        expected_targets = fk[rows] + options.armijo_backtracking_c1 * alphas[rows] * slopes[rows]
+        accepted = trial_values <= expected_targets
+
+        function_values[rows[accepted]] = trial_values[accepted]
+        pending[rows[accepted]] = False
+        alphas[rows[~accepted]] *= options.armijo_backtracking_contraction_factor
+
+    # failed rows take a zero step.
+    alphas[pending] = 0
+    return BatchedLineSearchResult(alphas, function_values, None)
+
+
+def batched_wolfe_line_search(options: OptimizationOptions, oracles: BatchedOracles, active: torch.Tensor,
+                              xk: torch.Tensor, fk: torch.Tensor, gradk: torch.Tensor, searchk: torch.Tensor,
+                              _: torch.Tensor) -> BatchedLineSearchResult:
+    phi_prime_zero = torch.sum(searchk * gradk, 1)
+    lower_limits = torch.zeros_like(fk)
+    upper_limits = torch.full_like(fk, math.inf)
+    alphas = torch.where(active, 1, 0).to(fk.dtype)
+    function_values = fk.clone()
+    gradients = gradk.clone()
+    pending = active.clone()
+
+    for i in range(options.wolfe_line_search_max_iterations):
+        rows = torch.nonzero(pending).squeeze(1)
+        if rows.numel() == 0:
+            break
+
+        x_after_step = xk[rows] + alphas[rows].unsqueeze(1) * searchk[rows]
+        phi_alpha = oracles.objective_function(x_after_step)
+        sufficient_decrease = phi_alpha <= fk[rows] + options.wolfe_line_search_c1 * alphas[rows] * phi_prime_zero[rows]
+        upper_limits[rows[~sufficient_decrease]] = alphas[rows[~sufficient_decrease]]
+
+        # the gradient is only needed where the sufficient decrease condition holds.
+        decreased_rows = rows[sufficient_decrease]
+        if decreased_rows.numel() > 0:
+            _, gradient_after_step = oracles.value_and_gradient(x_after_step[sufficient_decrease])
+            phi_prime_alpha = torch.sum(searchk[decreased_rows] * gradient_after_step, 1)
+            curvature = phi_prime_alpha >= options.wolfe_line_search_c2 * phi_prime_zero[decreased_rows]
+
+            lower_limits[decreased_rows[~curvature]] = alphas[decreased_rows[~curvature]]
+            accepted_rows = decreased_rows[curvature]
+            function_values[accepted_rows] = phi_alpha[sufficient_decrease][curvature]
+            gradients[accepted_rows] = gradient_after_step[curvature]
+            pending[accepted_rows] = False
+
+        alphas = torch.where(pending & torch.isinf(upper_limits), 2 * alphas, alphas)
+        alphas = torch.where(pending & ~torch.isinf(upper_limits), (lower_limits + upper_limits) / 2, alphas)
+
+    # failed rows take a zero step and keep f and the gradient at x.
+    alphas[pending] = 0
+    return BatchedLineSearchResult(alphas, function_values, gradients)
+
+
+# (K) active rows, (K x n) xk, (K x n) gradients -> (K x n) search directions
+type BatchedSearchDirectionFunctionType = Callable[[torch.Tensor, torch.Tensor, torch.Tensor], torch.Tensor]
+
+
+def batched_steepest_descent_search_direction(_active: torch.Tensor, _xk: torch.Tensor,
+                                              gradk: torch.Tensor) -> torch.Tensor:
+    return -1 * gradk
+
+
+class BatchedModifiedNewtonSearchDirection:
+    # modify_hessian for every row at once: each row gets its own tau, carried over between iterations, and the
+    # rows are refactored with one batched cholesky_ex until all are positive definite.
+    def __init__(self, oracles: BatchedOracles, k: int, dtype: torch.dtype):
+        self.oracles = oracles
+        self.taus = torch.zeros(k, dtype=dtype)
+
+    def __call__(self, active: torch.Tensor, xk: torch.Tensor, gradk: torch.Tensor) -> torch.Tensor:
+        beta = 10e-4
+        searchk = torch.zeros_like(gradk)
+        rows = torch.nonzero(active).squeeze(1)
+        if rows.numel() == 0:
+            return searchk
+
+        hessians = self.oracles.objective_hessian_function(xk[rows])
+        minaii = torch.amin(torch.diagonal(hessians, dim1=1, dim2=2), 1)
+        taus = torch.where(minaii > 0, 0, beta - minaii)
+        factors = torch.zeros_like(hessians)
+        pending = torch.ones_like(taus, dtype=torch.bool)
+
+        max_iterations = 50
+        for k in range(max_iterations):
+            shifted = hessians[pending].clone()
+            shifted.diagonal(dim1=1, dim2=2).add_(taus[pending].unsqueeze(1))
+            pending_factors, info = torch.linalg.cholesky_ex(shifted)
+
+            succeeded = info == 0
+            pending_rows = torch.nonzero(pending).squeeze(1)
+            factors[pending_rows[succeeded]] = pending_factors[succeeded]
+            pending[pending_rows[succeeded]] = False
+            if not pending.any():
+                break
+
+            taus = torch.where(pending, torch.maximum(torch.clamp(2 * taus, min=beta), self.taus[rows]), taus)
+        else:
+            raise torch.linalg.LinAlgError
+
+        self.taus[rows] = taus
+        searchk[rows] = -1 * torch.cholesky_solve(gradk[rows].unsqueeze(2), factors).squeeze(2)
+        return searchk
+
+
+class BatchedLBfgsHistory:
+    # LBfgsHistory for K rows sharing one ring buffer head. a row whose curvature pair is rejected stores rho = 0,
+    # which makes that slot a no-op in the two-loop recursion for that row.
+    def __init__(self, m: int, k: int, n: int, dtype: torch.dtype):
+        if m < 1:
+            raise ValueError(f"l-bfgs memory must be positive: {m}")
+
+        self.m = m
+        self.sks = torch.zeros(m, k, n, dtype=dtype)
+        self.yks = torch.zeros(m, k, n, dtype=dtype)
+        self.rhoks = torch.zeros(m, k, dtype=dtype)
+        self.gammaks = torch.ones(k, dtype=dtype)
+        self.count = 0
+        self.newest = -1
+
+    def add(self, sks: torch.Tensor, yks: torch.Tensor, accepted: torch.Tensor):
+        yk_dot_sk = torch.sum(yks * sks, 1)
+        yk_dot_yk = torch.sum(yks * yks, 1)
+
+        self.newest = (self.newest + 1) % self.m
+        self.sks[self.newest].copy_(sks)
+        self.yks[self.newest].copy_(yks)
+        self.rhoks[self.newest] = torch.where(accepted, 1 / torch.where(accepted, yk_dot_sk, 1), 0)
+        self.gammaks = torch.where(accepted, yk_dot_sk / torch.where(accepted, yk_dot_yk, 1), self.gammaks)
+        self.count = min(self.count + 1, self.m)
+
+    def newest_to_oldest(self) -> list[int]:
+        return [(self.newest - j) % self.m for j in range(self.count)]
+
+    def __call__(self, _active: torch.Tensor, _xk: torch.Tensor, gradk: torch.Tensor) -> torch.Tensor:
+        order = self.newest_to_oldest()
+
+        q = gradk.clone()
+        alphaks = []
+        for i in order:
+            alphak = self.rhoks[i] * torch.sum(self.sks[i] * q, 1)
+            alphaks.append(alphak)
+            q.sub_(alphak.unsqueeze(1) * self.yks[i])
+
+        r = q.mul_(self.gammaks.unsqueeze(1))
+
+        for i, alphak in zip(reversed(order), reversed(alphaks)):
+            beta = self.rhoks[i] * torch.sum(self.yks[i] * r, 1)
+            r.add_((alphak - beta).unsqueeze(1) * self.sks[i])
+
+        return r.neg_()
+
+
+def run_batched_optimization_loop(calc_search_direction: BatchedSearchDirectionFunctionType,
+                                  line_search_function: BatchedLineSearchFunctionType,
+                                  oracles: BatchedOracles, x0s: torch.Tensor, options: OptimizationOptions,
+                                  l_bfgs_history: Optional[BatchedLBfgsHistory] = None) -> BatchedOptimizationResults:
+    k = x0s.shape[0]
+    xk = x0s.clone()
+    fk, gradk = oracles.value_and_gradient(xk)
+    gradk_norm = torch.linalg.norm(gradk, 2, dim=1)
+
+    active = torch.ones(k, dtype=torch.bool)
+    iterations = torch.zeros(k, dtype=torch.long)
+    termination_reasons = [OptimizationTerminationReason.reached_iteration_limit] * k
+
+    # the previous iterate's f and phi'(0) for the armijo initial step length.
+    fkm1: Optional[torch.Tensor] = None
+    previous_slopes: Optional[torch.Tensor] = None
+
+    for i in range(1, options.max_iterations + 1):
+        searchk = calc_search_direction(active, xk, gradk)
+        slopes = torch.sum(searchk * gradk, 1)
+
+        alpha_init = torch.ones_like(fk)
+        if fkm1 is not None:
+            usable = active & (previous_slopes != 0)
+            alpha_init = torch.where(usable, 2 * (fk - fkm1) / torch.where(usable, previous_slopes, 1), alpha_init)
+
+        line_search_result = line_search_function(options, oracles, active, xk, fk, gradk, searchk, alpha_init)
+
+        # set previous
+        fkm1 = fk
+        previous_slopes = slopes
+        gradkm1 = gradk
+        gradkm1_norm = gradk_norm
+
+        # take step. update. inactive rows have a zero step length and keep f and the gradient.
+        sk = line_search_result.step_lengths.unsqueeze(1) * searchk
+        xk = xk + sk
+        fk = line_search_result.function_values
+        gradk = line_search_result.gradients
+        if gradk is None:
+            gradk = gradkm1.clone()
+            rows = torch.nonzero(active).squeeze(1)
+            _, gradk[rows] = oracles.value_and_gradient(xk[rows])
+        gradk_norm = torch.linalg.norm(gradk, 2, dim=1)
+        iterations[active] = i
+
+        stopped_decreasing = active & (torch.abs(fkm1 - fk) < options.no_decrease_tolerance) & \
+            (torch.abs(gradkm1_norm - gradk_norm) < options.no_decrease_tolerance)
+        stationary = active & ~stopped_decreasing & (gradk_norm < options.stationary_point_gradient_norm_tolerance)
+        for row in torch.nonzero(stopped_decreasing).squeeze(1).tolist():
+            termination_reasons[row] = OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing
+        for row in torch.nonzero(stationary).squeeze(1).tolist():
+            termination_reasons[row] = OptimizationTerminationReason.reached_stationary_point
+        active = active & ~stopped_decreasing & ~stationary
+        if not active.any():
+            break
+
+        if l_bfgs_history is not None:
+            yk = gradk - gradkm1
+            yk_dot_sk = torch.sum(yk * sk, 1)
+            threshold = options.l_bfgs_update_epsilon_min * torch.linalg.norm(yk, 2, dim=1) * \
+                torch.linalg.norm(sk, 2, dim=1)
+            l_bfgs_history.add(sk, yk, active & (yk_dot_sk > threshold))
+
+    return BatchedOptimizationResults(xk, fk, gradk_norm, iterations, termination_reasons)
@@ -1,87 +1,187 @@
-from typing import Callable
+from typing import Callable, Optional
 
 import math
 
 import torch
 
+from methods.checkpoint import checkpoint_if_due, start_iterate
+from methods.instrumentation import active_recorder
 from methods.line_search import LineSearchState, LineSearchFunctionType
-from methods.methods import OptimizationOptions, OptimizationResults, OptimizationStep, OptimizationTerminationReason
+from methods.methods import OptimizationOptions, OptimizationResults, OptimizationStep, OptimizationTerminationReason, \
+    OptimizationPhase, Method, SolverState, start_trace
+from problems.precision import accumulated_dot, accumulated_norm
 from problems.problems import Problem
 
 
+# the updates modify the (n x n) quasi-newton matrix in place and return it.
 type QuasiNewtonUpdateCallable = Callable[[
-    OptimizationOptions, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor], torch.Tensor]
+    OptimizationOptions, torch.Tensor, torch.Tensor, torch.Tensor], torch.Tensor]
+type QuasiNewtonSearchDirectionCallable = Callable[[torch.Tensor, torch.Tensor], torch.Tensor]
+# positive hessian diagonal -> initial quasi-newton matrix in the representation the search direction expects.
+type QuasiNewtonInitialMatrixCallable = Callable[[torch.Tensor], torch.Tensor]
 
 
-def dfp_update(options: OptimizationOptions, _: torch.Tensor,
+def inverse_hessian_initial_matrix(hessian_diagonal: torch.Tensor) -> torch.Tensor:
+    return torch.diag(1 / hessian_diagonal)
+
+
+def ldl_factor_initial_matrix(hessian_diagonal: torch.Tensor) -> torch.Tensor:
+    # L = I and D = the diagonal.
+    return torch.diag(hessian_diagonal)
+
+
+def inverse_hessian_search_direction(hk: torch.Tensor, gradk: torch.Tensor) -> torch.Tensor:
+    return -1 * torch.mv(hk, gradk)
+
+
+def ldl_factor_search_direction(packed_ldl: torch.Tensor, gradk: torch.Tensor) -> torch.Tensor:
+    # B_k = L D L^T with L unit lower triangular, packed with D on the diagonal. B_k^-1 gradk is two
+    # O(n^2) triangular solves.
+    gradk_column = gradk.unsqueeze(1)
+    forward = torch.linalg.solve_triangular(packed_ldl, gradk_column, upper=False, unitriangular=True)
+    forward = forward / packed_ldl.diagonal().unsqueeze(1)
+    backward = torch.linalg.solve_triangular(packed_ldl.t(), forward, upper=True, unitriangular=True)
+    return -1 * backward.squeeze(1)
+
+
+def dfp_update(options: OptimizationOptions,
                hk: torch.Tensor, sk: torch.Tensor, yk: torch.Tensor) -> torch.Tensor:
-    yk_dot_sk = torch.dot(yk, sk).item()
-    yk_norm = torch.linalg.norm(yk, 2).item()
-    sk_norm = torch.linalg.norm(sk, 2).item()
+    yk_dot_sk = accumulated_dot(yk, sk, options.accumulation_dtype)
+    yk_norm = accumulated_norm(yk, options.accumulation_dtype)
+    sk_norm = accumulated_norm(sk, options.accumulation_dtype)
 
     if yk_dot_sk <= options.bfgs_update_epsilon_min * yk_norm * sk_norm:
         return hk
 
-    sk_outer = torch.outer(sk, sk)
-    yk_outer = torch.outer(yk, yk)
-
-    first_denom = torch.dot(yk, torch.matmul(hk, yk)).item()
-    first_num = torch.matmul(torch.matmul(hk, yk_outer), hk)
-    first = first_num / first_denom
+    # H - (H y)(H y)^T / y^T H y + s s^T / y^T s as two rank-one updates.
+    hk_yk = torch.mv(hk, yk)
+    yk_hk_yk = accumulated_dot(yk, hk_yk, options.accumulation_dtype)
 
-    second = sk_outer / yk_dot_sk
+    hk.addr_(hk_yk, hk_yk, alpha=-1 / yk_hk_yk)
+    hk.addr_(sk, sk, alpha=1 / yk_dot_sk)
+    return hk
 
-    return hk - first + second
 
-
-def bfgs_update(options: OptimizationOptions, identity_n: torch.Tensor,
+def bfgs_update(options: OptimizationOptions,
                 hk: torch.Tensor, sk: torch.Tensor, yk: torch.Tensor) -> torch.Tensor:
-    yk_dot_sk = torch.dot(yk, sk).item()
-    yk_norm = torch.linalg.norm(yk, 2).item()
-    sk_norm = torch.linalg.norm(sk, 2).item()
+    yk_dot_sk = accumulated_dot(yk, sk, options.accumulation_dtype)
+    yk_norm = accumulated_norm(yk, options.accumulation_dtype)
+    sk_norm = accumulated_norm(sk, options.accumulation_dtype)
 
     if yk_dot_sk <= options.bfgs_update_epsilon_min * yk_norm * sk_norm:
         return hk
 
-    sk_outer_yk = torch.outer(sk, yk)
-    yk_outer_sk = torch.outer(yk, sk)
-    # sk_outer_yk.transpose()
+    # (I - rho s y^T) H (I - rho y s^T) + rho s s^T expands, with H symmetric, to
+    # H - rho (s (H y)^T + (H y) s^T) + (rho^2 y^T H y + rho) s s^T.
+    rhok = 1 / yk_dot_sk
+    hk_yk = torch.mv(hk, yk)
+    yk_hk_yk = accumulated_dot(yk, hk_yk, options.accumulation_dtype)
+
+    hk.addr_(sk, hk_yk, alpha=-rhok)
+    hk.addr_(hk_yk, sk, alpha=-rhok)
+    hk.addr_(sk, sk, alpha=rhok * rhok * yk_hk_yk + rhok)
+    return hk
+
+
+def ldl_rank_one_update(packed_ldl: torch.Tensor, z: torch.Tensor, sigma: float) -> Optional[torch.Tensor]:
+    # L D L^T + sigma z z^T in O(n^2) without a python loop over the rows (Gill, Golub, Murray and Saunders,
+    # method C1, with the scalar recurrence for alpha_j written as a cumulative sum of t_j = 1 / alpha_j).
+    # returns None if the result is not positive definite.
+    d = packed_ldl.diagonal()
+    strictly_lower = torch.tril(packed_ldl, -1)
+    p = torch.linalg.solve_triangular(packed_ldl, z.unsqueeze(1), upper=False, unitriangular=True).squeeze(1)
+
+    t_after = 1 / sigma + torch.cumsum(p * p / d, 0)
+    t_before = torch.cat([t_after.new_full([1], 1 / sigma), t_after[:-1]])
+    if sigma < 0 and t_after[-1].item() >= 0:
+        return None
+
+    d_updated = d * t_after / t_before
+    beta = p / (d * t_after)
+    # column j changes by beta_j * w_j where w_j = z - sum_{k <= j} p_k L[:, k].
+    w = z.unsqueeze(1) - torch.cumsum(strictly_lower * p, 1)
+    updated = torch.tril(strictly_lower + w * beta, -1)
+    updated.diagonal().copy_(d_updated)
+    return updated
+
+
+def bfgs_ldl_update(options: OptimizationOptions,
+                    packed_ldl: torch.Tensor, sk: torch.Tensor, yk: torch.Tensor) -> torch.Tensor:
+    # BFGS on the hessian approximation B = L D L^T kept in factored form:
+    # B + y y^T / y^T s - (B s)(B s)^T / s^T B s as a rank-one update followed by a rank-one downdate.
+    yk_dot_sk = accumulated_dot(yk, sk, options.accumulation_dtype)
+    yk_norm = accumulated_norm(yk, options.accumulation_dtype)
+    sk_norm = accumulated_norm(sk, options.accumulation_dtype)
+
+    if yk_dot_sk <= options.bfgs_update_epsilon_min * yk_norm * sk_norm:
+        return packed_ldl
 
-    left = identity_n - sk_outer_yk / yk_dot_sk
-    right = identity_n - yk_outer_sk / yk_dot_sk
-    first = torch.matmul(torch.matmul(left, hk), right)
+    d = packed_ldl.diagonal()
+    strictly_lower = torch.tril(packed_ldl, -1)
+    lt_sk = sk + torch.mv(strictly_lower.t(), sk)
+    d_lt_sk = d * lt_sk
+    bk_sk = d_lt_sk + torch.mv(strictly_lower, d_lt_sk)
+    sk_bk_sk = accumulated_dot(lt_sk, d_lt_sk, options.accumulation_dtype)
 
-    sk_outer = torch.outer(sk, sk)
-    second = sk_outer / yk_dot_sk
-    return first + second
+    updated = ldl_rank_one_update(packed_ldl, yk, 1 / yk_dot_sk)
+    if updated is not None:
+        updated = ldl_rank_one_update(updated, bk_sk, -1 / sk_bk_sk)
+    if updated is None:
+        # the downdate lost positive definiteness numerically. skip this update.
+        return packed_ldl
 
+    packed_ldl.copy_(updated)
+    return packed_ldl
 
-def run_quasi_newton_optimization_loop(line_search_function: LineSearchFunctionType,
+
+def run_quasi_newton_optimization_loop(method: Method, line_search_function: LineSearchFunctionType,
                                        hk_quasi_newton_update: QuasiNewtonUpdateCallable,
-                                       problem: Problem, options: OptimizationOptions) -> OptimizationResults:
-    xk = problem.x0
-    fk = problem.objective_function(xk)
-    gradk = problem.objective_gradient_function(xk)
-    gradk_norm = torch.linalg.norm(gradk, 2).item()
+                                       problem: Problem, options: OptimizationOptions,
+                                       calc_search_direction: QuasiNewtonSearchDirectionCallable =
+                                       inverse_hessian_search_direction,
+                                       calc_initial_matrix: QuasiNewtonInitialMatrixCallable =
+                                       inverse_hessian_initial_matrix,
+                                       initial_state: Optional[SolverState] = None) -> OptimizationResults:
+    k0, xk, fk, gradk, previous_line_search_state = start_iterate(problem, initial_state)
+    gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
+
+    # Use identity for H_0 or the initial inverse hessian (or for the packed L D L^T factors of B_0). hk is updated in place.
+    if initial_state is not None and initial_state.quasi_newton_matrix is not None:
+        # a copy, so that this run doesn't modify the state it started from.
+        hk = initial_state.quasi_newton_matrix.clone()
+    else:
+        hk = torch.eye(problem.x0.shape[0], dtype=problem.x0.dtype)
+        if options.quasi_newton_diagonal_initialization:
+            # works on structured and sparse hessians without densifying them.
+            hessian_diagonal = problem.hessian_operator(problem.x0).diagonal()
+            if torch.all(hessian_diagonal > 0).item():
+                hk = calc_initial_matrix(hessian_diagonal)
 
-    identity_n = torch.diag(torch.ones(problem.x0.shape[0], dtype=torch.double))
-    # Use identity for H_0 or the initial inverse hessian.
-    hk = torch.diag(torch.ones(problem.x0.shape[0], dtype=torch.double))
+    def state() -> SolverState:
+        return SolverState(method, i, xk, fk, gradk, previous_line_search_state, quasi_newton_matrix=hk)
 
-    step_list = []
+    trace = start_trace(options, xk)
     step = OptimizationStep(0, fk, gradk_norm)
-    step_list.append(step)
-    options.step_callback(0, step)
+    trace.record(k0, step, xk)
+    options.step_callback(k0, step)
 
-    previous_line_search_state = None
+    recorder = active_recorder()
 
-    for i in range(1, options.max_iterations + 1):
-        searchk = -1 * torch.matmul(hk, gradk)
+    i = k0
+    for i in range(k0 + 1, options.max_iterations + 1):
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.search_direction)
+        searchk = calc_search_direction(hk, gradk)
         current_line_search_state = LineSearchState(fk, gradk, searchk)
 
-        step_length_alpha = line_search_function(options, problem.objective_function,
-                                                 problem.objective_gradient_function,
-                                                 xk, previous_line_search_state, current_line_search_state)
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.line_search)
+        line_search_result = line_search_function(options, problem.objective_function,
+                                                  problem.objective_gradient_function,
+                                                  xk, previous_line_search_state, current_line_search_state)
+        if recorder is not None:
+            recorder.enter_phase(None)
+        step_length_alpha = line_search_result.step_length
 
         # set previous
         previous_line_search_state = current_line_search_state
@@ -92,90 +192,132 @@ def run_quasi_newton_optimization_loop(line_search_function: LineSearchFunctionT
         # take step. update
         sk = step_length_alpha * searchk
         xk = xk + sk
-        fk = problem.objective_function(xk)
-        gradk = problem.objective_gradient_function(xk)
-        gradk_norm = torch.linalg.norm(gradk, 2).item()
+        # reuse f, and the gradient when available, from the line search's accepted point.
+        fk = line_search_result.function_value
+        gradk = line_search_result.gradient
+        if gradk is None:
+            gradk = problem.objective_gradient_function(xk)
+        gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
         yk = gradk - gradkm1
 
         step = OptimizationStep(step_length_alpha, fk, gradk_norm)
-        step_list.append(step)
+        trace.record(i, step, xk)
         options.step_callback(i, step)
 
         if math.fabs(fkm1 - fk) < options.no_decrease_tolerance and \
                 math.fabs(gradkm1_norm - gradk_norm) < options.no_decrease_tolerance:
-            return OptimizationResults(step_list, xk, fk, gradk_norm,
-                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing)
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing,
+                                       final_state=state())
         if gradk_norm < options.stationary_point_gradient_norm_tolerance:
-            return OptimizationResults(step_list, xk, fk, gradk_norm,
-                                       OptimizationTerminationReason.reached_stationary_point)
-
-        hk = hk_quasi_newton_update(options, identity_n, hk, sk, yk)
-
-    return OptimizationResults(step_list, xk, fk, gradk_norm,
-                               OptimizationTerminationReason.reached_iteration_limit)
-
-
-def l_bfgs_get_gammak(sks_and_yks: list[tuple[torch.Tensor, torch.Tensor]]) -> float:
-    if len(sks_and_yks) > 0:
-        sk, yk = sks_and_yks[0]
-        num = torch.dot(sk, yk).item()
-        denom = torch.dot(yk, yk).item()
-        return num / denom
-    else:
-        return 1
-
-
-def l_bfgs_recursion(identity: torch.Tensor, gradk: torch.Tensor,
-                     sks_and_yks: list[tuple[torch.Tensor, torch.Tensor]]) -> torch.Tensor:
-    gammak = l_bfgs_get_gammak(sks_and_yks)
-    hk = gammak * identity
-
-    q = gradk
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.reached_stationary_point, final_state=state())
+
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.quasi_newton_update)
+        hk = hk_quasi_newton_update(options, hk, sk, yk)
+        if recorder is not None:
+            recorder.enter_phase(None)
+        checkpoint_if_due(options, i, state)
+
+    return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                               OptimizationTerminationReason.reached_iteration_limit, final_state=state())
+
+
+class LBfgsHistory:
+    # the m most recent curvature pairs (s_k, y_k) in preallocated (m x n) ring buffers. rho_k = 1 / y_k^T s_k
+    # is cached when a pair is added, and the initial hessian approximation is the scalar gamma_k * I.
+    def __init__(self, m: int, n: int, dtype: torch.dtype, accumulation_dtype: Optional[torch.dtype] = None):
+        if m < 1:
+            raise ValueError(f"l-bfgs memory must be positive: {m}")
+
+        self.m = m
+        self.sks = torch.zeros(m, n, dtype=dtype)
+        self.yks = torch.zeros(m, n, dtype=dtype)
+        self.rhoks = [0.0] * m
+        self.gammak = 1.0
+        self.count = 0
+        self.newest = -1
+        self.accumulation_dtype = accumulation_dtype
+
+    def add(self, sk: torch.Tensor, yk: torch.Tensor, yk_dot_sk: float):
+        self.newest = (self.newest + 1) % self.m
+        self.sks[self.newest].copy_(sk)
+        self.yks[self.newest].copy_(yk)
+        self.rhoks[self.newest] = 1 / yk_dot_sk
+        self.gammak = yk_dot_sk / accumulated_dot(yk, yk, self.accumulation_dtype)
+        self.count = min(self.count + 1, self.m)
+
+    def newest_to_oldest(self) -> list[int]:
+        return [(self.newest - j) % self.m for j in range(self.count)]
+
+    def pairs(self) -> tuple[torch.Tensor, torch.Tensor]:
+        # copies of the kept (s_k, y_k), oldest first.
+        order = list(reversed(self.newest_to_oldest()))
+        return self.sks[order], self.yks[order]
+
+    def add_pairs(self, sks: torch.Tensor, yks: torch.Tensor):
+        # the pairs of pairs(), in order. only the newest m are kept.
+        for sk, yk in zip(sks, yks):
+            self.add(sk, yk, accumulated_dot(yk, sk, self.accumulation_dtype))
+
+
+def l_bfgs_recursion(history: LBfgsHistory, gradk: torch.Tensor) -> torch.Tensor:
+    order = history.newest_to_oldest()
+
+    q = gradk.clone()
     alphaks = []
-    for sk_and_yk in sks_and_yks:
-        sk, yk = sk_and_yk
-        rhok = 1 / torch.dot(yk, sk).item()
-        alphak = rhok * torch.dot(sk, q).item()
+    for i in order:
+        alphak = history.rhoks[i] * accumulated_dot(history.sks[i], q, history.accumulation_dtype)
         alphaks.append(alphak)
-        q = q - alphak * yk
+        q.add_(history.yks[i], alpha=-alphak)
 
-    r = torch.matmul(hk, q)
+    r = q.mul_(history.gammak)
 
-    for (sk_and_yk, alphak) in zip(reversed(sks_and_yks), reversed(alphaks)):
-        sk, yk = sk_and_yk
-        rhok = 1 / torch.dot(yk, sk).item()
-        beta = rhok * torch.dot(yk, r).item()
-        r = r + sk * (alphak - beta)
+    for i, alphak in zip(reversed(order), reversed(alphaks)):
+        beta = history.rhoks[i] * accumulated_dot(history.yks[i], r, history.accumulation_dtype)
+        r.add_(history.sks[i], alpha=alphak - beta)
 
-    return -1 * r
+    return r.neg_()
 
 
-def run_l_bfgs_optimization_loop(line_search_function: LineSearchFunctionType,
-                                 problem: Problem, options: OptimizationOptions) -> OptimizationResults:
+def run_l_bfgs_optimization_loop(method: Method, line_search_function: LineSearchFunctionType,
+                                 problem: Problem, options: OptimizationOptions,
+                                 initial_state: Optional[SolverState] = None) -> OptimizationResults:
     n = problem.x0.shape[0]
-    m = min([10, n])
-    identity = torch.diag(torch.ones(n, dtype=torch.double))
-    sks_and_yks = []
+    history = LBfgsHistory(min(options.l_bfgs_memory, n), n, problem.x0.dtype, options.accumulation_dtype)
+    if initial_state is not None and initial_state.l_bfgs_sks is not None:
+        history.add_pairs(initial_state.l_bfgs_sks, initial_state.l_bfgs_yks)
+
+    k0, xk, fk, gradk, previous_line_search_state = start_iterate(problem, initial_state)
+    gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
 
-    xk = problem.x0
-    fk = problem.objective_function(xk)
-    gradk = problem.objective_gradient_function(xk)
-    gradk_norm = torch.linalg.norm(gradk, 2).item()
+    def state() -> SolverState:
+        sks, yks = history.pairs()
+        return SolverState(method, i, xk, fk, gradk, previous_line_search_state, l_bfgs_sks=sks, l_bfgs_yks=yks)
 
-    step_list = []
+    trace = start_trace(options, xk)
     step = OptimizationStep(0, fk, gradk_norm)
-    step_list.append(step)
-    options.step_callback(0, step)
+    trace.record(k0, step, xk)
+    options.step_callback(k0, step)
 
-    previous_line_search_state = None
+    recorder = active_recorder()
 
-    for i in range(1, options.max_iterations + 1):
-        searchk = l_bfgs_recursion(identity, gradk, sks_and_yks)
+    i = k0
+    for i in range(k0 + 1, options.max_iterations + 1):
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.search_direction)
+        searchk = l_bfgs_recursion(history, gradk)
         current_line_search_state = LineSearchState(fk, gradk, searchk)
 
-        step_length_alpha = line_search_function(options, problem.objective_function,
-                                                 problem.objective_gradient_function,
-                                                 xk, previous_line_search_state, current_line_search_state)
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.line_search)
+        line_search_result = line_search_function(options, problem.objective_function,
+                                                  problem.objective_gradient_function,
+                                                  xk, previous_line_search_state, current_line_search_state)
+        if recorder is not None:
+            recorder.enter_phase(None)
+        step_length_alpha = line_search_result.step_length
 
         # set previous
         previous_line_search_state = current_line_search_state
@@ -185,31 +327,38 @@ def run_l_bfgs_optimization_loop(line_search_function: LineSearchFunctionType,
         # take step. update
         sk = step_length_alpha * searchk
         xk = xk + sk
-        fk = problem.objective_function(xk)
-        gradk = problem.objective_gradient_function(xk)
+        # reuse f, and the gradient when available, from the line search's accepted point.
+        fk = line_search_result.function_value
+        gradk = line_search_result.gradient
+        if gradk is None:
+            gradk = problem.objective_gradient_function(xk)
         yk = gradk - current_line_search_state.gradient
-        gradk_norm = torch.linalg.norm(gradk, 2).item()
+        gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
 
         step = OptimizationStep(step_length_alpha, fk, gradk_norm)
-        step_list.append(step)
+        trace.record(i, step, xk)
         options.step_callback(i, step)
 
         if math.fabs(fkm1 - fk) < options.no_decrease_tolerance and \
                 math.fabs(gradkm1_norm - gradk_norm) < options.no_decrease_tolerance:
-            return OptimizationResults(step_list, xk, fk, gradk_norm,
-                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing)
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing,
+                                       final_state=state())
         if gradk_norm < options.stationary_point_gradient_norm_tolerance:
-            return OptimizationResults(step_list, xk, fk, gradk_norm,
-                                       OptimizationTerminationReason.reached_stationary_point)
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.reached_stationary_point, final_state=state())
 
-        yk_dot_sk = torch.dot(yk, sk).item()
-        yk_norm = torch.linalg.norm(yk, 2).item()
-        sk_norm = torch.linalg.norm(sk, 2).item()
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.quasi_newton_update)
+        yk_dot_sk = accumulated_dot(yk, sk, options.accumulation_dtype)
+        yk_norm = accumulated_norm(yk, options.accumulation_dtype)
+        sk_norm = accumulated_norm(sk, options.accumulation_dtype)
 
         if yk_dot_sk > options.l_bfgs_update_epsilon_min * yk_norm * sk_norm:
-            sks_and_yks.insert(0, (sk, yk))
-            if len(sks_and_yks) > m:
-                sks_and_yks.pop()
+            history.add(sk, yk, yk_dot_sk)
+        if recorder is not None:
+            recorder.enter_phase(None)
+        checkpoint_if_due(options, i, state)
 
-    return OptimizationResults(step_list, xk, fk, gradk_norm,
-                               OptimizationTerminationReason.reached_iteration_limit)
+    return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                               OptimizationTerminationReason.reached_iteration_limit, final_state=state())
@@ -0,0 +1,64 @@
+import os
+import tempfile
+from typing import Callable, Optional
+
+import torch
+
+from methods.methods import Method, OptimizationOptions, SolverState, LineSearchState
+from problems.problems import Problem
+
+
+# a SolverState on disk: a dict of tensors and numbers written with torch.save, so that it loads with
+# weights_only=True. the file is replaced atomically, so an interrupted run leaves the previous checkpoint intact.
+#
+#     options = OptimizationOptions(checkpoint_path="generated/run.pt", checkpoint_interval=50)
+#     run_optimization(Method.LBFGSW, problem, options)
+#     ...
+#     resume_optimization(Method.LBFGSW, problem, options)
+
+def save_checkpoint(path: str, state: SolverState):
+    saved = state._asdict()
+    saved["method"] = str(state.method)
+    if state.previous_line_search_state is not None:
+        saved["previous_line_search_state"] = state.previous_line_search_state._asdict()
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(file_descriptor, "wb") as checkpoint_file:
+        torch.save(saved, checkpoint_file)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(path: str) -> SolverState:
+    saved = torch.load(path, weights_only=True)
+    saved["method"] = Method(saved["method"])
+    if saved["previous_line_search_state"] is not None:
+        saved["previous_line_search_state"] = LineSearchState(**saved["previous_line_search_state"])
+    return SolverState(**saved)
+
+
+def checkpoint_if_due(options: OptimizationOptions, k: int, state: Callable[[], SolverState]):
+    # called by the loops at the end of iteration k. state builds the SolverState only when it is written.
+    if options.checkpoint_path is not None and options.checkpoint_interval > 0 and k % options.checkpoint_interval == 0:
+        save_checkpoint(options.checkpoint_path, state())
+
+
+def check_initial_state(method: Method, problem: Problem, initial_state: SolverState):
+    if initial_state.method != method:
+        raise ValueError(f"a {initial_state.method} state can't continue a {method} run")
+    if initial_state.xk is not None and initial_state.xk.shape != problem.x0.shape:
+        raise ValueError(f"the state's x has shape {tuple(initial_state.xk.shape)}, the problem's "
+                         f"{tuple(problem.x0.shape)}")
+    if initial_state.xk is not None and initial_state.xk.dtype != problem.x0.dtype:
+        raise ValueError(f"the state's x is {initial_state.xk.dtype}, the problem's {problem.x0.dtype}")
+
+
+def start_iterate(problem: Problem, initial_state: Optional[SolverState]) \
+        -> tuple[int, torch.Tensor, float, torch.Tensor, Optional[LineSearchState]]:
+    # k, xk, fk, gradk and the previous line search state that a loop starts from: x0, or the state's iterate.
+    if initial_state is None or initial_state.xk is None:
+        fk, gradk = problem.value_and_gradient(problem.x0)
+        return 0, problem.x0, fk, gradk, None
+    return initial_state.iteration, initial_state.xk, initial_state.fk, initial_state.gradk, \
+        initial_state.previous_line_search_state
@@ -0,0 +1,107 @@
+import contextlib
+import contextvars
+import time
+from typing import Optional, Iterator
+
+import torch
+
+from methods.methods import OptimizationPhase, OptimizationStatistics
+from problems.hessian_operators import HessianOperator
+from problems.problems import Problem
+
+
+class StatisticsRecorder:
+    # counters and phase timers for one run. `instrument` wraps a problem's oracles with counting versions, and the
+    # optimization loops, line searches and CG solvers report to the recorder made active by `recording`.
+    def __init__(self):
+        self.function_evaluations = 0
+        self.gradient_evaluations = 0
+        self.value_and_gradient_evaluations = 0
+        self.hessian_evaluations = 0
+        self.hessian_vector_products = 0
+        self.line_search_trials = 0
+        self.cg_iterations = 0
+        self.trust_region_rejected_steps = 0
+        self.trust_region_contractions = 0
+        self.trust_region_expansions = 0
+        self.phase_ns = {phase: 0 for phase in OptimizationPhase}
+        self._phase: Optional[OptimizationPhase] = None
+        self._phase_start_ns = 0
+
+    def enter_phase(self, phase: Optional[OptimizationPhase]):
+        # ends the current phase, if any, and starts `phase`. None ends the current phase only.
+        now = time.perf_counter_ns()
+        if self._phase is not None:
+            self.phase_ns[self._phase] += now - self._phase_start_ns
+        self._phase = phase
+        self._phase_start_ns = now
+
+    def instrument(self, problem: Problem) -> Problem:
+        # the optional oracles stay None, so that Problem's fallbacks count as the oracles they call.
+        def objective_function(x: torch.Tensor) -> float:
+            self.function_evaluations += 1
+            return problem.objective_function(x)
+
+        def objective_gradient_function(x: torch.Tensor) -> torch.Tensor:
+            self.gradient_evaluations += 1
+            return problem.objective_gradient_function(x)
+
+        def objective_hessian_function(x: torch.Tensor) -> torch.Tensor:
+            self.hessian_evaluations += 1
+            return problem.objective_hessian_function(x)
+
+        def hessian_operator_function(x: torch.Tensor) -> HessianOperator:
+            self.hessian_evaluations += 1
+            return problem.hessian_operator_function(x)
+
+        def value_and_gradient_function(x: torch.Tensor) -> tuple[float, torch.Tensor]:
+            self.value_and_gradient_evaluations += 1
+            return problem.value_and_gradient_function(x)
+
+        def hessian_vector_product_function(x: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+            self.hessian_vector_products += 1
+            return problem.hessian_vector_product_function(x, v)
+
+        return problem._replace(
+            objective_function=objective_function,
+            objective_gradient_function=objective_gradient_function,
+            objective_hessian_function=objective_hessian_function,
+            value_and_gradient_function=value_and_gradient_function
+            if problem.value_and_gradient_function is not None else None,
+            hessian_vector_product_function=hessian_vector_product_function
+            if problem.hessian_vector_product_function is not None else None,
+            hessian_operator_function=hessian_operator_function
+            if problem.hessian_operator_function is not None else None)
+
+    def statistics(self) -> OptimizationStatistics:
+        return OptimizationStatistics(
+            self.function_evaluations,
+            self.gradient_evaluations,
+            self.value_and_gradient_evaluations,
+            self.hessian_evaluations,
+            self.hessian_vector_products,
+            self.line_search_trials,
+            self.cg_iterations,
+            self.trust_region_rejected_steps,
+            self.trust_region_contractions,
+            self.trust_region_expansions,
+            {phase: ns / 1e9 for phase, ns in self.phase_ns.items()})
+
+
+_active_recorder: contextvars.ContextVar[Optional[StatisticsRecorder]] = \
+    contextvars.ContextVar("active_statistics_recorder", default=None)
+
+
+def active_recorder() -> Optional[StatisticsRecorder]:
+    # None unless statistics are being collected, so the hooks cost one lookup and a None check.
+    return _active_recorder.get()
+
+
+@contextlib.contextmanager
+def recording(recorder: StatisticsRecorder) -> Iterator[StatisticsRecorder]:
+    token = _active_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        recorder.enter_phase(None)
+        _active_recorder.reset(token)
@@ -3,14 +3,17 @@ from typing import Optional, Callable, NamedTuple
 
 import torch
 
+from problems.precision import accumulated_dot
 from problems.problems import ProblemFunctionType, GradientFunctionType
-from methods.methods import OptimizationOptions
+from methods.instrumentation import active_recorder
+from methods.methods import OptimizationOptions, LineSearchState
 
 
-class LineSearchState(NamedTuple):
+class LineSearchResult(NamedTuple):
+    step_length: float
+    # f and, when the line search computed it, the gradient at the accepted point x + step_length * search_direction.
     function_value: float
-    gradient: torch.Tensor
-    search_direction: torch.Tensor
+    gradient: Optional[torch.Tensor]
 
 
 type LineSearchFunctionType = Callable[[
@@ -19,7 +22,12 @@ type LineSearchFunctionType = Callable[[
     GradientFunctionType,
     torch.Tensor,
     Optional[LineSearchState],
-    LineSearchState], float]
+    LineSearchState], LineSearchResult]
+
+
+def line_search_failed(current: LineSearchState) -> LineSearchResult:
+    # a zero step stays at x, where f and the gradient are already known.
+    return LineSearchResult(0, current.function_value, current.gradient)
 
 
 def armijo_backtracking(options: OptimizationOptions,
@@ -27,33 +35,36 @@ def armijo_backtracking(options: OptimizationOptions,
                         _: Callable[[torch.Tensor], torch.Tensor],
                         x: torch.Tensor,
                         previous: Optional[LineSearchState],
-                        current: LineSearchState) -> float:
-    searchk_dot_gradk = torch.dot(current.search_direction, current.gradient).item()
+                        current: LineSearchState) -> LineSearchResult:
+    searchk_dot_gradk = accumulated_dot(current.search_direction, current.gradient, options.accumulation_dtype)
     if searchk_dot_gradk > 0:
         # this shouldn't happen.
         raise "error: searchk_dot_gradk is positive"
 
     alpha_init = 1
     if previous:
-        phi_slope = torch.dot(previous.gradient, previous.search_direction).item()
+        phi_slope = accumulated_dot(previous.gradient, previous.search_direction, options.accumulation_dtype)
         if phi_slope > 0:
             # this shouldn't happen.
             raise "error: phi_slope is positive"
         alpha_init = 2 * (current.function_value - previous.function_value) / phi_slope
 
+    recorder = active_recorder()
     alpha = alpha_init
     for contraction_iter in range(1, options.armijo_backtracking_max_iterations):
+        if recorder is not None:
+            recorder.line_search_trials += 1
         xkp1 = x + alpha * current.search_direction
         fkp1 = f(xkp1)
 
         expected_decrease = options.armijo_backtracking_c1 * alpha * searchk_dot_gradk
         expected_target = current.function_value + expected_decrease
         if fkp1 <= expected_target:
-            return alpha
+            return LineSearchResult(alpha, fkp1, None)
 
         alpha = alpha * options.armijo_backtracking_contraction_factor
 
-    return 0
+    return line_search_failed(current)
 
 
 def wolfe_line_search(options: OptimizationOptions,
@@ -61,17 +72,20 @@ def wolfe_line_search(options: OptimizationOptions,
                       gradient_function: Callable[[torch.Tensor], torch.Tensor],
                       x: torch.Tensor,
                       _: Optional[LineSearchState],
-                      current: LineSearchState) -> float:
+                      current: LineSearchState) -> LineSearchResult:
     step_length_alpha_lower_limit = 0
     step_length_alpha_upper_limit = math.inf
     step_length_alpha = 1
 
-    phi_prime_zero = torch.dot(current.search_direction, current.gradient).item()
+    phi_prime_zero = accumulated_dot(current.search_direction, current.gradient, options.accumulation_dtype)
     if phi_prime_zero > 0:
         # this shouldn't happen.
         raise "error: search_direction dot gradient is positive"
 
+    recorder = active_recorder()
     for i in range(options.wolfe_line_search_max_iterations):
+        if recorder is not None:
+            recorder.line_search_trials += 1
         x_after_step = x + step_length_alpha * current.search_direction
         phi_alpha = f(x_after_step)
 
@@ -79,11 +93,11 @@ def wolfe_line_search(options: OptimizationOptions,
             step_length_alpha_upper_limit = step_length_alpha
         else:
             gradient_after_step = gradient_function(x_after_step)
-            phi_prime_alpha = torch.dot(current.search_direction, gradient_after_step).item()
+            phi_prime_alpha = accumulated_dot(current.search_direction, gradient_after_step, options.accumulation_dtype)
             if phi_prime_alpha < options.wolfe_line_search_c2 * phi_prime_zero:
                 step_length_alpha_lower_limit = step_length_alpha
             else:
-                return step_length_alpha
+                return LineSearchResult(step_length_alpha, phi_alpha, gradient_after_step)
 
         if not math.isinf(step_length_alpha_upper_limit):
             step_length_alpha = (step_length_alpha_lower_limit + step_length_alpha_upper_limit) / 2
@@ -91,4 +105,184 @@ def wolfe_line_search(options: OptimizationOptions,
             step_length_alpha = 2 * step_length_alpha
 
     # print("wolfe line search hit iteration limit")
-    return 0
+    return line_search_failed(current)
+
+
+def _cubic_interpolation_minimizer(a: float, phi_a: float, dphi_a: float,
+                                   b: float, phi_b: float, dphi_b: float) -> Optional[float]:
+    # minimizer of the cubic that matches phi and phi' at a and b (Nocedal and Wright, 3.59). None if the cubic has
+    # no minimizer.
+    d1 = dphi_a + dphi_b - 3 * (phi_a - phi_b) / (a - b)
+    discriminant = d1 * d1 - dphi_a * dphi_b
+    if discriminant < 0:
+        return None
+    d2 = math.copysign(math.sqrt(discriminant), b - a)
+    denominator = dphi_b - dphi_a + 2 * d2
+    if denominator == 0:
+        return None
+    return b - (b - a) * (dphi_b + d2 - d1) / denominator
+
+
+def _quadratic_interpolation_minimizer(a: float, phi_a: float, dphi_a: float, b: float, phi_b: float) -> Optional[float]:
+    # minimizer of the quadratic that matches phi and phi' at a and phi at b. None if the quadratic is not convex.
+    curvature = phi_b - phi_a - dphi_a * (b - a)
+    if curvature <= 0:
+        return None
+    return a - dphi_a * (b - a) ** 2 / (2 * curvature)
+
+
+def _initial_step_length(options: OptimizationOptions, previous: Optional[LineSearchState],
+                         current: LineSearchState) -> float:
+    # armijo_backtracking's estimate: the step along the previous direction whose quadratic model gives the previous
+    # iteration's decrease in f. about the previous step length, and about 1 once newton and quasi-newton steps
+    # converge superlinearly. dividing by the current slope instead (Nocedal and Wright, 3.60) overshoots there.
+    if previous is None:
+        return 1
+    previous_slope = accumulated_dot(previous.gradient, previous.search_direction, options.accumulation_dtype)
+    alpha = 2 * (current.function_value - previous.function_value) / previous_slope if previous_slope < 0 else 0
+    return alpha if alpha > 0 else 1
+
+
+def interpolating_armijo_backtracking(options: OptimizationOptions,
+                                      f: ProblemFunctionType,
+                                      _: Callable[[torch.Tensor], torch.Tensor],
+                                      x: torch.Tensor,
+                                      previous: Optional[LineSearchState],
+                                      current: LineSearchState) -> LineSearchResult:
+    # armijo_backtracking with each contraction chosen by minimizing a quadratic, then cubic, model of phi(alpha)
+    # through the values already computed, safeguarded to [0.1, 0.5] times the previous trial.
+    phi_prime_zero = accumulated_dot(current.search_direction, current.gradient, options.accumulation_dtype)
+    if phi_prime_zero > 0:
+        # this shouldn't happen.
+        raise ValueError("search direction is not a descent direction")
+
+    recorder = active_recorder()
+    alpha = _initial_step_length(options, previous, current)
+    alpha_previous = 0.0
+    phi_previous = current.function_value
+    for contraction_iter in range(1, options.armijo_backtracking_max_iterations):
+        if recorder is not None:
+            recorder.line_search_trials += 1
+        phi_alpha = f(x + alpha * current.search_direction)
+        if phi_alpha <= current.function_value + options.armijo_backtracking_c1 * alpha * phi_prime_zero:
+            return LineSearchResult(alpha, phi_alpha, None)
+
+        if alpha_previous == 0:
+            alpha_next = _quadratic_interpolation_minimizer(0, current.function_value, phi_prime_zero,
+                                                            alpha, phi_alpha)
+        else:
+            alpha_next = _armijo_cubic_minimizer(current.function_value, phi_prime_zero, alpha_previous,
+                                                 phi_previous, alpha, phi_alpha)
+        if alpha_next is None or math.isnan(alpha_next):
+            alpha_next = alpha / 2
+
+        alpha_previous = alpha
+        phi_previous = phi_alpha
+        alpha = min(max(alpha_next, 0.1 * alpha), 0.5 * alpha)
+
+    return line_search_failed(current)
+
+
+def _armijo_cubic_minimizer(phi_zero: float, phi_prime_zero: float, alpha_0: float, phi_0: float,
+                            alpha_1: float, phi_1: float) -> Optional[float]:
+    # minimizer of the cubic through phi(0), phi'(0), phi(alpha_0) and phi(alpha_1) (Nocedal and Wright, 3.58).
+    r0 = phi_0 - phi_zero - phi_prime_zero * alpha_0
+    r1 = phi_1 - phi_zero - phi_prime_zero * alpha_1
+    scale = alpha_0 ** 2 * alpha_1 ** 2 * (alpha_1 - alpha_0)
+    if scale == 0:
+        return None
+    a = (alpha_0 ** 2 * r1 - alpha_1 ** 2 * r0) / scale
+    b = (-alpha_0 ** 3 * r1 + alpha_1 ** 3 * r0) / scale
+    if a == 0:
+        return -phi_prime_zero / (2 * b) if b > 0 else None
+    discriminant = b * b - 3 * a * phi_prime_zero
+    if discriminant < 0:
+        return None
+    return (-b + math.sqrt(discriminant)) / (3 * a)
+
+
+def strong_wolfe_line_search(options: OptimizationOptions,
+                             f: ProblemFunctionType,
+                             gradient_function: GradientFunctionType,
+                             x: torch.Tensor,
+                             previous: Optional[LineSearchState],
+                             current: LineSearchState) -> LineSearchResult:
+    # bracketing and zoom (Nocedal and Wright, algorithms 3.5 and 3.6) for the strong wolfe conditions. the zoom
+    # interpolates with a cubic when phi' is known at both ends of the bracket and a quadratic otherwise, so rejected
+    # trials never cost a gradient. wolfe_line_search_max_iterations bounds the number of trials.
+    c1 = options.wolfe_line_search_c1
+    c2 = options.wolfe_line_search_c2
+    accumulation = options.accumulation_dtype
+    phi_zero = current.function_value
+    phi_prime_zero = accumulated_dot(current.search_direction, current.gradient, accumulation)
+    if phi_prime_zero > 0:
+        # this shouldn't happen.
+        raise ValueError("search direction is not a descent direction")
+
+    recorder = active_recorder()
+    trials = 0
+
+    def evaluate(alpha: float) -> float:
+        nonlocal trials
+        trials += 1
+        if recorder is not None:
+            recorder.line_search_trials += 1
+        return f(x + alpha * current.search_direction)
+
+    def evaluate_slope(alpha: float) -> tuple[torch.Tensor, float]:
+        gradient = gradient_function(x + alpha * current.search_direction)
+        return gradient, accumulated_dot(current.search_direction, gradient, accumulation)
+
+    # alpha_lo is the best trial so far that satisfies the sufficient decrease condition, with its gradient.
+    def zoom(alpha_lo: float, phi_lo: float, phi_prime_lo: float, gradient_lo: torch.Tensor,
+             alpha_hi: float, phi_hi: float, phi_prime_hi: Optional[float]) -> LineSearchResult:
+        while trials < options.wolfe_line_search_max_iterations:
+            if math.fabs(alpha_hi - alpha_lo) <= 1e-12 * max(alpha_lo, alpha_hi):
+                break
+            if phi_prime_hi is not None:
+                alpha = _cubic_interpolation_minimizer(alpha_lo, phi_lo, phi_prime_lo, alpha_hi, phi_hi, phi_prime_hi)
+            else:
+                alpha = _quadratic_interpolation_minimizer(alpha_lo, phi_lo, phi_prime_lo, alpha_hi, phi_hi)
+            # keep the trial away from the ends of the bracket, or bisect.
+            low, high = min(alpha_lo, alpha_hi), max(alpha_lo, alpha_hi)
+            margin = 0.1 * (high - low)
+            if alpha is None or math.isnan(alpha) or not low + margin <= alpha <= high - margin:
+                alpha = (alpha_lo + alpha_hi) / 2
+
+            phi_alpha = evaluate(alpha)
+            if phi_alpha > phi_zero + c1 * alpha * phi_prime_zero or phi_alpha >= phi_lo:
+                alpha_hi, phi_hi, phi_prime_hi = alpha, phi_alpha, None
+                continue
+
+            gradient, phi_prime_alpha = evaluate_slope(alpha)
+            if math.fabs(phi_prime_alpha) <= -c2 * phi_prime_zero:
+                return LineSearchResult(alpha, phi_alpha, gradient)
+            if phi_prime_alpha * (alpha_hi - alpha_lo) >= 0:
+                alpha_hi, phi_hi, phi_prime_hi = alpha_lo, phi_lo, phi_prime_lo
+            alpha_lo, phi_lo, phi_prime_lo, gradient_lo = alpha, phi_alpha, phi_prime_alpha, gradient
+
+        if alpha_lo > 0:
+            # no strong wolfe point found. alpha_lo still decreases f sufficiently.
+            return LineSearchResult(alpha_lo, phi_lo, gradient_lo)
+        return line_search_failed(current)
+
+    alpha_previous, phi_previous, phi_prime_previous = 0.0, phi_zero, phi_prime_zero
+    gradient_previous = current.gradient
+    alpha = _initial_step_length(options, previous, current)
+    while trials < options.wolfe_line_search_max_iterations:
+        phi_alpha = evaluate(alpha)
+        if phi_alpha > phi_zero + c1 * alpha * phi_prime_zero or (alpha_previous > 0 and phi_alpha >= phi_previous):
+            return zoom(alpha_previous, phi_previous, phi_prime_previous, gradient_previous, alpha, phi_alpha, None)
+
+        gradient, phi_prime_alpha = evaluate_slope(alpha)
+        if math.fabs(phi_prime_alpha) <= -c2 * phi_prime_zero:
+            return LineSearchResult(alpha, phi_alpha, gradient)
+        if phi_prime_alpha >= 0:
+            return zoom(alpha, phi_alpha, phi_prime_alpha, gradient, alpha_previous, phi_previous, phi_prime_previous)
+
+        alpha_previous, phi_previous, phi_prime_previous, gradient_previous = alpha, phi_alpha, phi_prime_alpha, gradient
+        alpha = 2 * alpha
+
+    if alpha_previous > 0:
+        return LineSearchResult(alpha_previous, phi_previous, gradient_previous)
+    return line_search_failed(current)
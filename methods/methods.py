@@ -1,9 +1,12 @@
 import datetime
 from enum import StrEnum, auto
-from typing import NamedTuple, Callable
+from typing import NamedTuple, Callable, Optional
 
 import torch
 
+from methods.optimization_trace import OptimizationStep, OptimizationTrace, TraceMode
+from problems.precision import Precision, accumulation_dtype
+
 
 class OptimizationTerminationReason(StrEnum):
     reached_stationary_point = auto()
@@ -11,12 +14,6 @@ class OptimizationTerminationReason(StrEnum):
     function_and_gradient_norm_stopped_decreasing = auto()
 
 
-class OptimizationStep(NamedTuple):
-    step_length: float
-    after_function_value: float
-    after_gradient_norm: float
-
-
 def step_callback_noop(k: int, step: OptimizationStep):
     pass
 
@@ -32,18 +29,132 @@ class OptimizationOptions(NamedTuple):
     wolfe_line_search_max_iterations: int = 50
     wolfe_line_search_c1: float = 10e-4
     wolfe_line_search_c2: float = 0.9
+    # the Method variants use interpolating_armijo_backtracking and strong_wolfe_line_search instead of
+    # armijo_backtracking and the bisecting wolfe_line_search.
+    interpolating_line_search: bool = False
     bfgs_update_epsilon_min: float = 1e-8
+    # start BFGS and DFP from the diagonal of the hessian at x0, when it is positive, instead of the identity.
+    quasi_newton_diagonal_initialization: bool = False
     l_bfgs_update_epsilon_min: float = 1e-8
+    # number of curvature pairs kept by L-BFGS (capped at the problem dimension).
+    l_bfgs_memory: int = 10
     newton_cg_eta_tolerance: float = 0.01
     newton_cg_seaerch_direction_max_iterations: int = 50
+    # accelerated gradient methods: the gradient step is 1 / L for an estimate L of the gradient's lipschitz constant.
+    # L is multiplied by accelerated_gradient_lipschitz_decrease before each step, so that steps can grow again, and
+    # divided by armijo_backtracking_contraction_factor until the step decreases f by ||g||^2 / (2 L).
+    accelerated_gradient_initial_lipschitz: float = 1.0
+    accelerated_gradient_lipschitz_decrease: float = 0.9
+    # number of iterate and gradient differences kept by Anderson acceleration.
+    anderson_memory: int = 5
+    # trust region methods (Nocedal & Wright algorithm 4.1). a step is accepted when f decreases by more than
+    # trust_region_eta times the model's predicted reduction.
+    trust_region_initial_radius: float = 1.0
+    trust_region_max_radius: float = 1000.0
+    trust_region_eta: float = 10e-4
+    # the SR1 update is skipped when |s^T (y - B s)| < sr1_update_r * ||s|| ||y - B s||.
+    sr1_update_r: float = 1e-8
+    # must match the precision the problem was loaded with.
+    precision: Precision = Precision.float64
+    # which steps OptimizationResults.trace keeps. trace_capacity bounds the decimate and ring modes.
+    trace_mode: TraceMode = TraceMode.full
+    trace_capacity: int = 1024
+    trace_timestamps: bool = False
+    # stream every x_k to this .npy file.
+    trace_x_path: Optional[str] = None
+    # write the solver state to this file every checkpoint_interval iterations and when the run ends. see
+    # methods.checkpoint.
+    checkpoint_path: Optional[str] = None
+    checkpoint_interval: int = 10
+    # count oracle calls, line search trials, CG iterations and trust region radius updates and time each phase into
+    # OptimizationResults.statistics.
+    collect_statistics: bool = False
+
+    @property
+    def accumulation_dtype(self) -> torch.dtype:
+        # dtype of the methods' dot products and norms, and so of the convergence tests.
+        return accumulation_dtype(self.precision)
+
+
+def start_trace(options: OptimizationOptions, x0: torch.Tensor) -> OptimizationTrace:
+    # x0 plus at most max_iterations steps.
+    return OptimizationTrace(options.trace_mode, options.trace_capacity, options.max_iterations + 1, x0,
+                             options.trace_timestamps, options.trace_x_path)
+
+
+class OptimizationPhase(StrEnum):
+    search_direction = auto()
+    line_search = auto()
+    # the quasi-newton matrix or l-bfgs history update.
+    quasi_newton_update = auto()
+
+
+class OptimizationStatistics(NamedTuple):
+    function_evaluations: int
+    gradient_evaluations: int
+    # fused value_and_gradient_function calls. problems without one count a function and a gradient evaluation.
+    value_and_gradient_evaluations: int
+    hessian_evaluations: int
+    hessian_vector_products: int
+    line_search_trials: int
+    cg_iterations: int
+    # trust region methods: steps rejected by the ratio test, and radius shrinks and expansions.
+    trust_region_rejected_steps: int
+    trust_region_contractions: int
+    trust_region_expansions: int
+    # perf_counter time per phase.
+    phase_seconds: dict[OptimizationPhase, float]
+
+
+class LineSearchState(NamedTuple):
+    function_value: float
+    gradient: torch.Tensor
+    search_direction: torch.Tensor
+
+
+class SolverState(NamedTuple):
+    # what a loop needs to continue a run after `iteration` iterations. the curvature fields that the method doesn't
+    # use are None.
+    method: "Method"
+    iteration: int
+    # None in a warm start, which starts at problem.x0.
+    xk: Optional[torch.Tensor]
+    fk: Optional[float]
+    gradk: Optional[torch.Tensor]
+    previous_line_search_state: Optional[LineSearchState] = None
+    # the BFGS and DFP inverse hessian, the packed L D L^T factors of BFGSCholesky or the SR1 hessian.
+    quasi_newton_matrix: Optional[torch.Tensor] = None
+    # the L-BFGS curvature pairs, oldest first, as (count x n) tensors.
+    l_bfgs_sks: Optional[torch.Tensor] = None
+    l_bfgs_yks: Optional[torch.Tensor] = None
+    # the shift of the last modified hessian.
+    hessian_modification_tau: float = 0.0
+    trust_region_radius: Optional[float] = None
+    # accelerated gradient methods. for Nesterov, xk is the extrapolated point where the gradient is evaluated and
+    # nesterov_x the last gradient step from it.
+    lipschitz_estimate: Optional[float] = None
+    nesterov_x: Optional[torch.Tensor] = None
+    nesterov_t: float = 1.0
+    # the Anderson iterate and gradient differences, oldest first, as (count x n) tensors.
+    anderson_dxs: Optional[torch.Tensor] = None
+    anderson_dgs: Optional[torch.Tensor] = None
+
+    def warm_start(self) -> "SolverState":
+        # only the curvature, for a new solve of a similar problem. Nesterov's momentum belongs to the iterate.
+        return self._replace(iteration=0, xk=None, fk=None, gradk=None, previous_line_search_state=None,
+                             nesterov_x=None, nesterov_t=1.0)
 
 
 class OptimizationResults(NamedTuple):
-    steps: list[OptimizationStep]
+    trace: OptimizationTrace
     final_x: torch.Tensor
     final_function_value: float
     final_gradient_norm: float
     termination_reason: OptimizationTerminationReason
+    # with options.collect_statistics.
+    statistics: Optional[OptimizationStatistics] = None
+    # the state to resume the run from, or to warm-start another from.
+    final_state: Optional[SolverState] = None
 
 
 class TimedOptimizationResults(NamedTuple):
@@ -60,7 +171,14 @@ class Method(StrEnum):
     NewtonCGW = auto()
     BFGS = auto()
     BFGSW = auto()
+    BFGSCholesky = auto()
+    BFGSCholeskyW = auto()
     DFP = auto()
     DFPW = auto()
     LBFGS = auto()
     LBFGSW = auto()
+    TrustRegionNewtonCG = auto()
+    TrustRegionDogleg = auto()
+    TrustRegionSR1 = auto()
+    NesterovAcceleratedGradient = auto()
+    AndersonAcceleratedGradient = auto()
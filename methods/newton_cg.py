@@ -1,44 +1,171 @@
+import math
+from typing import Callable, NamedTuple, Optional
+
 import torch
 
+from methods.instrumentation import active_recorder
 from methods.methods import OptimizationOptions
-from problems.problems import HessianFunctionType
+from problems.precision import accumulated_dot, accumulated_norm
+from problems.problems import Problem
 
 
 def calc_newton_cg_search_direction(options: OptimizationOptions, xk: torch.Tensor, gradk: torch.Tensor,
-                                    hessian_function: HessianFunctionType) -> torch.Tensor:
-    gradk_norm = torch.linalg.norm(gradk, 2).item()
+                                    problem: Problem) -> torch.Tensor:
+    # matrix-free: the hessian is only used through hessian-vector products.
+    accumulation = options.accumulation_dtype
+    gradk_norm = accumulated_norm(gradk, accumulation)
     eta_gradk_norm = options.newton_cg_eta_tolerance * gradk_norm
-    hessk = hessian_function(xk)
 
-    n = gradk.shape[0]
-    zj = torch.zeros(n, dtype=torch.double)
+    zj = torch.zeros_like(gradk)
     rj = gradk
     dj = -1 * rj
+    rj_normsq = accumulated_dot(rj, rj, accumulation)
 
+    recorder = active_recorder()
     for j in range(options.newton_cg_seaerch_direction_max_iterations):
-        djt_hessk_dj = torch.dot(dj, torch.matmul(hessk, dj)).item()
+        if recorder is not None:
+            recorder.cg_iterations += 1
+        hessk_dj = problem.hessian_vector_product(xk, dj)
+        djt_hessk_dj = accumulated_dot(dj, hessk_dj, accumulation)
         if djt_hessk_dj <= 0:
             if j == 0:
                 return dj
             else:
                 return zj
 
-        rj_normsq = torch.dot(rj, rj).item()
         alphaj = rj_normsq / djt_hessk_dj
 
         # next
         zjp1 = zj + alphaj * dj
-        rjp1 = rj + alphaj * torch.matmul(hessk, dj)
-        rjp1_norm = torch.linalg.norm(rjp1, 2).item()
+        rjp1 = rj + alphaj * hessk_dj
+        rjp1_normsq = accumulated_dot(rjp1, rjp1, accumulation)
 
-        if rjp1_norm <= eta_gradk_norm:
+        if math.sqrt(rjp1_normsq) <= eta_gradk_norm:
             return zjp1
 
-        betajp1 = torch.dot(rjp1, rjp1).item() / torch.dot(rj, rj).item()
+        betajp1 = rjp1_normsq / rj_normsq
         djp1 = -1 * rjp1 + betajp1 * dj
 
         zj = zjp1
         rj = rjp1
         dj = djp1
+        rj_normsq = rjp1_normsq
+
+    return torch.zeros_like(gradk)
+
+
+def conjugate_gradient(matvec: Callable[[torch.Tensor], torch.Tensor], b: torch.Tensor, tolerance: float,
+                       max_iterations: int, accumulation_dtype: Optional[torch.dtype] = None) -> Optional[torch.Tensor]:
+    # solves A z = b for symmetric A given only z -> A z. returns None on nonpositive curvature, which shows that A
+    # is not positive definite, and the last iterate if max_iterations is reached.
+    zj = torch.zeros_like(b)
+    rj = b.clone()
+    dj = b.clone()
+    rj_normsq = accumulated_dot(rj, rj, accumulation_dtype)
+    if math.sqrt(rj_normsq) <= tolerance:
+        return zj
+
+    recorder = active_recorder()
+    for j in range(max_iterations):
+        if recorder is not None:
+            recorder.cg_iterations += 1
+        a_dj = matvec(dj)
+        djt_a_dj = accumulated_dot(dj, a_dj, accumulation_dtype)
+        if djt_a_dj <= 0:
+            return None
+
+        alphaj = rj_normsq / djt_a_dj
+        zj.add_(dj, alpha=alphaj)
+        rj.sub_(a_dj, alpha=alphaj)
+        rjp1_normsq = accumulated_dot(rj, rj, accumulation_dtype)
+        if math.sqrt(rjp1_normsq) <= tolerance:
+            break
+
+        dj.mul_(rjp1_normsq / rj_normsq).add_(rj)
+        rj_normsq = rjp1_normsq
+
+    return zj
+
+
+def boundary_step_length(z: torch.Tensor, d: torch.Tensor, radius: float,
+                         accumulation_dtype: Optional[torch.dtype] = None) -> float:
+    # tau >= 0 with ||z + tau * d|| = radius, for ||z|| <= radius.
+    dt_d = accumulated_dot(d, d, accumulation_dtype)
+    zt_d = accumulated_dot(z, d, accumulation_dtype)
+    zt_z = accumulated_dot(z, z, accumulation_dtype)
+    discriminant = max(zt_d * zt_d - dt_d * (zt_z - radius * radius), 0.0)
+    return (math.sqrt(discriminant) - zt_d) / dt_d
+
+
+class SteihaugSegment(NamedTuple):
+    # one CG step z -> z + alpha d, with the model reduction at z and ||z + alpha d||, inf on nonpositive curvature.
+    z: torch.Tensor
+    d: torch.Tensor
+    rt_d: float
+    dt_b_d: float
+    model_reduction: float
+    end_norm: float
+
+
+def steihaug_conjugate_gradient(hessian_vector_product: Callable[[torch.Tensor], torch.Tensor],
+                                gradient: torch.Tensor, radius: float, tolerance: float, max_iterations: int,
+                                accumulation_dtype: Optional[torch.dtype] = None,
+                                path: Optional[list[SteihaugSegment]] = None) -> tuple[torch.Tensor, float, bool]:
+    # truncated CG on the trust region subproblem min g^T p + p^T B p / 2 with ||p|| <= radius (Nocedal & Wright
+    # algorithm 7.2). B may be indefinite: nonpositive curvature or leaving the region ends the solve on the boundary.
+    # returns p, the model reduction -(g^T p + p^T B p / 2) and whether p is on the boundary. the model is updated
+    # along the way: q(z + alpha d) = q(z) + alpha r^T d + alpha^2 d^T B d / 2 with the residual r = B z + g.
+    # the CG steps are appended to path, if given, for truncate_steihaug_path.
+    zj = torch.zeros_like(gradient)
+    rj = gradient
+    dj = -1 * rj
+    rj_normsq = accumulated_dot(rj, rj, accumulation_dtype)
+    model_reduction = 0.0
+    if math.sqrt(rj_normsq) <= tolerance:
+        return zj, model_reduction, False
+
+    recorder = active_recorder()
+    for j in range(max_iterations):
+        if recorder is not None:
+            recorder.cg_iterations += 1
+        b_dj = hessian_vector_product(dj)
+        djt_b_dj = accumulated_dot(dj, b_dj, accumulation_dtype)
+        rjt_dj = accumulated_dot(rj, dj, accumulation_dtype)
+
+        zjp1_norm = math.inf
+        if djt_b_dj > 0:
+            alphaj = rj_normsq / djt_b_dj
+            zjp1 = zj + alphaj * dj
+            zjp1_norm = accumulated_norm(zjp1, accumulation_dtype)
+        if path is not None:
+            path.append(SteihaugSegment(zj, dj, rjt_dj, djt_b_dj, model_reduction, zjp1_norm))
+        if zjp1_norm >= radius:
+            tau = boundary_step_length(zj, dj, radius, accumulation_dtype)
+            model_reduction -= tau * rjt_dj + 0.5 * tau * tau * djt_b_dj
+            return zj + tau * dj, model_reduction, True
+
+        model_reduction -= alphaj * rjt_dj + 0.5 * alphaj * alphaj * djt_b_dj
+        rjp1 = rj + alphaj * b_dj
+        rjp1_normsq = accumulated_dot(rjp1, rjp1, accumulation_dtype)
+        zj = zjp1
+        if math.sqrt(rjp1_normsq) <= tolerance:
+            return zj, model_reduction, False
+
+        dj = -1 * rjp1 + (rjp1_normsq / rj_normsq) * dj
+        rj = rjp1
+        rj_normsq = rjp1_normsq
+
+    return zj, model_reduction, False
+
 
-    return torch.zeros(n, dtype=torch.double)
+def truncate_steihaug_path(path: list[SteihaugSegment], step: torch.Tensor, model_reduction: float, radius: float,
+                           accumulation_dtype: Optional[torch.dtype] = None) -> tuple[torch.Tensor, float, bool]:
+    # the result of steihaug_conjugate_gradient for a smaller radius, from the path and result of a solve with the
+    # same B and gradient, without any hessian-vector products. the CG iterates grow in norm, so the solve with the
+    # smaller radius leaves the region on the same path, or ends where the larger one did.
+    for segment in path:
+        if segment.end_norm >= radius:
+            tau = boundary_step_length(segment.z, segment.d, radius, accumulation_dtype)
+            return segment.z + tau * segment.d, \
+                segment.model_reduction - (tau * segment.rt_d + 0.5 * tau * tau * segment.dt_b_d), True
+    return step, model_reduction, False
@@ -1,89 +1,159 @@
 import math
-from typing import Callable
+from typing import Callable, Optional
 
 import torch
 
+from methods.checkpoint import checkpoint_if_due, start_iterate
+from methods.instrumentation import active_recorder
 from methods.line_search import LineSearchState, LineSearchFunctionType
-from methods.methods import OptimizationOptions, OptimizationResults, OptimizationStep, OptimizationTerminationReason
-from problems.problems import Problem, HessianFunctionType
+from methods.methods import OptimizationOptions, OptimizationResults, OptimizationStep, OptimizationTerminationReason, \
+    OptimizationPhase, Method, SolverState, start_trace
+from methods.newton_cg import conjugate_gradient
+from problems.hessian_operators import HessianOperator, HessianFactor, DenseHessian, hessian_operator
+from problems.precision import accumulated_norm
+from problems.problems import Problem
+
+
+def shifted_cholesky(a: torch.Tensor, tau: float) -> Optional[torch.Tensor]:
+    # lower cholesky factor of A + tau * I, or None if that matrix is not positive definite.
+    factor = DenseHessian(a).shifted_cholesky(tau)
+    return factor.lower if factor is not None else None
 
 
 def is_matrix_spd(a: torch.Tensor) -> bool:
-    # Is A symmetric?
-    if torch.linalg.norm(a - torch.t(a), 2).item() > 10e-4:
-        return False
+    # symmetric, and a successful cholesky factorization is the positive definiteness test.
+    return DenseHessian(a).is_positive_definite()
+
 
-    # check for all positive eigenvalues.
-    eig_val, _ = torch.linalg.eig(a)
-    return torch.min(eig_val.float() > 0).item()
+class HessianModificationState:
+    # tau that made the previous iteration's hessian positive definite. the next iteration jumps to it after its
+    # first failed factorization instead of doubling up from beta again.
+    def __init__(self, tau: float = 0.0):
+        self.tau = tau
 
 
-def modify_hessian(hess: torch.Tensor) -> torch.Tensor:
+def modify_hessian_operator(hess: HessianOperator, previous_tau: float = 0.0) -> tuple[HessianFactor, float]:
+    # cholesky with added multiple of the identity, in the factorization of the hessian's structure. returns the
+    # factor of hess + tau * I and tau.
     beta = 10e-4
 
-    n = torch.diagonal(hess).size(0)
-    identity = torch.diag(torch.full([n], 1, dtype=torch.double))
+    minaii = torch.min(hess.diagonal()).item()
+    tau0 = 0 if minaii > 0 else beta - minaii
+
+    tauk = tau0
+    max_iterations = 50
+    for k in range(max_iterations):
+        factor = hess.shifted_cholesky(tauk)
+        if factor is not None:
+            return factor, tauk
+
+        tauk = max(2*tauk, beta, previous_tau)
+
+    raise torch.linalg.LinAlgError
 
-    minaii = torch.min(torch.diagonal(hess))
+
+def modify_hessian(hess: torch.Tensor, previous_tau: float = 0.0) -> tuple[torch.Tensor, float]:
+    # modify_hessian_operator for a dense hessian. returns the lower cholesky factor of hess + tau * I and tau.
+    factor, tau = modify_hessian_operator(DenseHessian(hess), previous_tau)
+    return factor.lower, tau
+
+
+def modified_newton_conjugate_gradient(hess: HessianOperator | torch.Tensor, gradient: torch.Tensor,
+                                       previous_tau: float = 0.0,
+                                       accumulation_dtype: Optional[torch.dtype] = None) -> tuple[torch.Tensor, float]:
+    # modify_hessian for hessians that can't be factored, like sparse ones with a wide band: solve
+    # (hess + tau * I) p = -gradient by conjugate gradient, and treat nonpositive curvature in the solve like a
+    # failed factorization. returns p and tau.
+    if isinstance(hess, torch.Tensor):
+        hess = hessian_operator(hess)
+    beta = 10e-4
+
+    minaii = torch.min(hess.diagonal()).item()
     tau0 = 0 if minaii > 0 else beta - minaii
 
+    tolerance = 1e-10 * accumulated_norm(gradient, accumulation_dtype)
     tauk = tau0
     max_iterations = 50
     for k in range(max_iterations):
-        modified_hess = hess + tauk * identity
-        if is_matrix_spd(modified_hess):
-            return modified_hess
+        searchk = conjugate_gradient(lambda v: hess.matvec(v) + tauk * v, -1 * gradient, tolerance,
+                                     gradient.shape[0], accumulation_dtype)
+        if searchk is not None:
+            return searchk, tauk
 
-        tauk = torch.max(torch.tensor([2*tauk, beta], dtype=torch.double)).item()
+        tauk = max(2*tauk, beta, previous_tau)
 
     raise torch.linalg.LinAlgError
 
 
-# xk, gradient, HessianFunctionType
-type SearchDirectionCalculationFunctionType = Callable[[OptimizationOptions, torch.Tensor, torch.Tensor, HessianFunctionType], torch.Tensor]
+# xk, gradient, Problem (for the hessian or hessian-vector products)
+type SearchDirectionCalculationFunctionType = Callable[[OptimizationOptions, torch.Tensor, torch.Tensor, Problem], torch.Tensor]
 
 def calc_search_direction_steepest_descent(_options: OptimizationOptions, _xk: torch.Tensor, gradient: torch.Tensor,
-                                           _hessian_function: Callable[[torch.Tensor], torch.Tensor]) -> torch.Tensor:
+                                           _problem: Problem) -> torch.Tensor:
     return -1 * gradient
 
 
 def calc_search_direction_newton_unmodified(_options: OptimizationOptions, xk: torch.Tensor, gradient: torch.Tensor,
-                                            hessian_function: Callable[[torch.Tensor], torch.Tensor]) -> torch.Tensor:
-    hessk = hessian_function(xk)
+                                            problem: Problem) -> torch.Tensor:
+    hessk = problem.objective_hessian_function(xk)
     searchk = -1 * torch.linalg.solve(hessk, gradient)
     return searchk
 
 
-def calc_search_direction_newton_modified(_options: OptimizationOptions, xk: torch.Tensor, gradient: torch.Tensor,
-                                          hessian_function: Callable[[torch.Tensor], torch.Tensor]) -> torch.Tensor:
-    hessk = hessian_function(xk)
-    modified_hessk = modify_hessian(hessk)
-    searchk = -1 * torch.linalg.solve(modified_hessk, gradient)
-    return searchk
+def modified_newton_step(state: HessianModificationState, hessk: HessianOperator, gradient: torch.Tensor,
+                         accumulation_dtype: Optional[torch.dtype] = None) -> torch.Tensor:
+    # O(n) for diagonal and O(n b^2) for banded hessians. state.tau is the shift of the hessian that was solved with.
+    if not hessk.factorable:
+        searchk, state.tau = modified_newton_conjugate_gradient(hessk, gradient, state.tau, accumulation_dtype)
+        return searchk
 
+    factor, state.tau = modify_hessian_operator(hessk, state.tau)
+    # reuse the factor from the positive definiteness test for the solve.
+    return -1 * factor.solve(gradient)
 
-def run_optimization_loop_simple(calc_search_direction: SearchDirectionCalculationFunctionType,
-                                 line_search_function: LineSearchFunctionType,
-                                 problem: Problem, options: OptimizationOptions) -> OptimizationResults:
-    xk = problem.x0
-    fk = problem.objective_function(xk)
-    gradk = problem.objective_gradient_function(xk)
-    gradk_norm = torch.linalg.norm(gradk, 2).item()
 
-    step_list = []
+def calc_search_direction_newton_modified(state: HessianModificationState,
+                                          options: OptimizationOptions, xk: torch.Tensor, gradient: torch.Tensor,
+                                          problem: Problem) -> torch.Tensor:
+    # bind a fresh HessianModificationState per run with functools.partial.
+    return modified_newton_step(state, problem.hessian_operator(xk), gradient, options.accumulation_dtype)
+
+
+def run_optimization_loop_simple(method: Method, calc_search_direction: SearchDirectionCalculationFunctionType,
+                                 line_search_function: LineSearchFunctionType,
+                                 problem: Problem, options: OptimizationOptions,
+                                 hessian_modification: Optional[HessianModificationState] = None,
+                                 initial_state: Optional[SolverState] = None) -> OptimizationResults:
+    # hessian_modification is the state bound to calc_search_direction, if any, so that its tau is checkpointed.
+    k0, xk, fk, gradk, previous_line_search_state = start_iterate(problem, initial_state)
+    gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
+
+    def state() -> SolverState:
+        tau = hessian_modification.tau if hessian_modification is not None else 0.0
+        return SolverState(method, i, xk, fk, gradk, previous_line_search_state, hessian_modification_tau=tau)
+
+    trace = start_trace(options, xk)
     step = OptimizationStep(0, fk, gradk_norm)
-    step_list.append(step)
-    options.step_callback(0, step)
+    trace.record(k0, step, xk)
+    options.step_callback(k0, step)
 
-    previous_line_search_state = None
+    recorder = active_recorder()
 
-    for i in range(1, options.max_iterations + 1):
-        searchk = calc_search_direction(options, xk, gradk, problem.objective_hessian_function)
+    i = k0
+    for i in range(k0 + 1, options.max_iterations + 1):
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.search_direction)
+        searchk = calc_search_direction(options, xk, gradk, problem)
         current_line_search_state = LineSearchState(fk, gradk, searchk)
 
-        step_length_alpha = line_search_function(options, problem.objective_function,
-                                                 problem.objective_gradient_function,
-                                                 xk, previous_line_search_state, current_line_search_state)
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.line_search)
+        line_search_result = line_search_function(options, problem.objective_function,
+                                                  problem.objective_gradient_function,
+                                                  xk, previous_line_search_state, current_line_search_state)
+        if recorder is not None:
+            recorder.enter_phase(None)
+        step_length_alpha = line_search_result.step_length
 
         # set previous
         previous_line_search_state = current_line_search_state
@@ -92,21 +162,26 @@ def run_optimization_loop_simple(calc_search_direction: SearchDirectionCalculati
 
         # take step. update
         xk = xk + step_length_alpha * searchk
-        fk = problem.objective_function(xk)
-        gradk = problem.objective_gradient_function(xk)
-        gradk_norm = torch.linalg.norm(gradk, 2).item()
+        # reuse f, and the gradient when available, from the line search's accepted point.
+        fk = line_search_result.function_value
+        gradk = line_search_result.gradient
+        if gradk is None:
+            gradk = problem.objective_gradient_function(xk)
+        gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
 
         step = OptimizationStep(step_length_alpha, fk, gradk_norm)
-        step_list.append(step)
+        trace.record(i, step, xk)
         options.step_callback(i, step)
 
         if math.fabs(fkm1 - fk) < options.no_decrease_tolerance and \
                 math.fabs(gradkm1_norm - gradk_norm) < options.no_decrease_tolerance:
-            return OptimizationResults(step_list, xk, fk, gradk_norm,
-                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing)
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing,
+                                       final_state=state())
         if gradk_norm < options.stationary_point_gradient_norm_tolerance:
-            return OptimizationResults(step_list, xk, fk, gradk_norm,
-                                       OptimizationTerminationReason.reached_stationary_point)
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.reached_stationary_point, final_state=state())
+        checkpoint_if_due(options, i, state)
 
-    return OptimizationResults(step_list, xk, fk, gradk_norm,
-                               OptimizationTerminationReason.reached_iteration_limit)
+    return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                               OptimizationTerminationReason.reached_iteration_limit, final_state=state())
@@ -0,0 +1,220 @@
+import io
+import os
+import time
+from enum import StrEnum, auto
+from typing import NamedTuple, Optional, Iterator
+
+import numpy as np
+import torch
+
+
+class OptimizationStep(NamedTuple):
+    step_length: float
+    after_function_value: float
+    after_gradient_norm: float
+
+
+class TraceMode(StrEnum):
+    # every step.
+    full = auto()
+    # at most capacity steps spread over the whole run: when the columns fill up, every other row is dropped and the
+    # stride between recorded steps doubles. the last step is always kept.
+    decimate = auto()
+    # the most recent capacity steps.
+    ring = auto()
+
+
+class OptimizationTrace:
+    # per-step history of a run in preallocated numpy columns instead of a list of OptimizationStep tuples. the column
+    # properties are torch views of the recorded rows, in step order once finalize() has been called.
+    # with x_path, every x_k, independent of the mode, is also streamed to a memory-mapped .npy file of shape
+    # (total_steps, n).
+    def __init__(self, mode: TraceMode, capacity: int, max_steps: int, x0: torch.Tensor,
+                 record_timestamps: bool = False, x_path: Optional[str] = None):
+        if capacity < 2 and mode != TraceMode.full:
+            raise ValueError(f"trace capacity must be at least 2: {capacity}")
+
+        self.mode = mode
+        # full mode preallocates the whole run. the pages of unused rows are never touched.
+        self.capacity = max_steps if mode == TraceMode.full else min(capacity, max_steps)
+        self.total_steps = 0
+        self.stride = 1
+        self.count = 0
+        # ring mode: the row that the next step overwrites once the ring is full.
+        self.next_row = 0
+        self.finalized = False
+
+        # one spare row so that decimation can always append the last step.
+        rows = self.capacity + 1
+        self._iterations = np.zeros(rows, dtype=np.int64)
+        self._step_lengths = np.zeros(rows, dtype=np.float64)
+        self._function_values = np.zeros(rows, dtype=np.float64)
+        self._gradient_norms = np.zeros(rows, dtype=np.float64)
+        self._timestamps = np.zeros(rows, dtype=np.int64) if record_timestamps else None
+        self.start_ns = time.perf_counter_ns()
+        # the most recent step, which decimation may not have recorded.
+        self._last: Optional[tuple[int, OptimizationStep, int]] = None
+
+        self.x_path = x_path
+        self._x_file: Optional[np.memmap] = None
+        if x_path is not None:
+            x_dtype = x0.detach().cpu().numpy().dtype
+            self._x_file = np.lib.format.open_memmap(x_path, mode="w+", dtype=x_dtype,
+                                                     shape=(max_steps, x0.shape[0]))
+
+    def record(self, k: int, step: OptimizationStep, xk: torch.Tensor):
+        timestamp = time.perf_counter_ns() - self.start_ns if self._timestamps is not None else 0
+        if self._x_file is not None:
+            self._x_file[self.total_steps] = xk.detach().cpu().numpy()
+        self.total_steps += 1
+        self._last = (k, step, timestamp)
+
+        match self.mode:
+            case TraceMode.full:
+                self._write_row(self.count, k, step, timestamp)
+                self.count += 1
+            case TraceMode.decimate:
+                if k % self.stride != 0:
+                    return
+                if self.count == self.capacity:
+                    self._drop_every_other_row()
+                    if k % self.stride != 0:
+                        return
+                self._write_row(self.count, k, step, timestamp)
+                self.count += 1
+            case TraceMode.ring:
+                self._write_row(self.next_row, k, step, timestamp)
+                self.next_row = (self.next_row + 1) % self.capacity
+                self.count = min(self.count + 1, self.capacity)
+            case _:
+                raise NotImplementedError(f"unknown trace mode: {self.mode}")
+
+    def _write_row(self, row: int, k: int, step: OptimizationStep, timestamp: int):
+        self._iterations[row] = k
+        self._step_lengths[row] = step.step_length
+        self._function_values[row] = step.after_function_value
+        self._gradient_norms[row] = step.after_gradient_norm
+        if self._timestamps is not None:
+            self._timestamps[row] = timestamp
+
+    def _columns(self) -> list[np.ndarray]:
+        columns = [self._iterations, self._step_lengths, self._function_values, self._gradient_norms]
+        if self._timestamps is not None:
+            columns.append(self._timestamps)
+        return columns
+
+    def _drop_every_other_row(self):
+        kept = (self.count + 1) // 2
+        for column in self._columns():
+            column[:kept] = column[0:self.count:2]
+        self.count = kept
+        self.stride *= 2
+
+    def finalize(self) -> "OptimizationTrace":
+        # puts the rows in step order, adds the last step if decimation skipped it and trims the x_k file to the
+        # steps taken. idempotent.
+        if self.finalized:
+            return self
+        self.finalized = True
+
+        if self.mode == TraceMode.ring and self.total_steps > self.capacity:
+            for column in self._columns():
+                column[:self.capacity] = np.roll(column[:self.capacity], -self.next_row)
+            self.next_row = 0
+        if self.mode == TraceMode.decimate and self._last is not None and \
+                self._iterations[self.count - 1] != self._last[0]:
+            k, step, timestamp = self._last
+            self._write_row(self.count, k, step, timestamp)
+            self.count += 1
+
+        if self._x_file is not None:
+            self._x_file.flush()
+            rows = self._x_file.shape[0]
+            del self._x_file
+            self._x_file = None
+            if self.total_steps < rows:
+                _truncate_npy_rows(self.x_path, self.total_steps)
+        return self
+
+    def __getstate__(self) -> dict:
+        # only the recorded rows, so that results sent back from a process pool don't carry the unused capacity.
+        state = self.__dict__.copy()
+        if self.finalized:
+            rows = self.count
+            for name in ["_iterations", "_step_lengths", "_function_values", "_gradient_norms", "_timestamps"]:
+                if state[name] is not None:
+                    state[name] = state[name][:rows].copy()
+        return state
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> OptimizationStep:
+        if not -self.count <= i < self.count:
+            raise IndexError(f"trace row out of range: {i}")
+        i %= self.count
+        return OptimizationStep(self._step_lengths[i].item(), self._function_values[i].item(),
+                                self._gradient_norms[i].item())
+
+    def __iter__(self) -> Iterator[OptimizationStep]:
+        return (self[i] for i in range(self.count))
+
+    @property
+    def iterations(self) -> torch.Tensor:
+        # the step index k of each row. differs from the row index in decimate and ring mode.
+        return torch.from_numpy(self._iterations[:self.count])
+
+    @property
+    def step_lengths(self) -> torch.Tensor:
+        return torch.from_numpy(self._step_lengths[:self.count])
+
+    @property
+    def function_values(self) -> torch.Tensor:
+        return torch.from_numpy(self._function_values[:self.count])
+
+    @property
+    def gradient_norms(self) -> torch.Tensor:
+        return torch.from_numpy(self._gradient_norms[:self.count])
+
+    @property
+    def timestamps_ns(self) -> Optional[torch.Tensor]:
+        # perf_counter_ns since the trace was created.
+        if self._timestamps is None:
+            return None
+        return torch.from_numpy(self._timestamps[:self.count])
+
+    def x_trajectory(self) -> Optional[torch.Tensor]:
+        # (total_steps x n) memory map of the streamed x_k, copy-on-write like load_csv_to_tensor.
+        if self.x_path is None or not self.finalized:
+            return None
+        return torch.from_numpy(np.load(self.x_path, mmap_mode="c"))
+
+
+def _truncate_npy_rows(path: str, rows: int):
+    # shrinks the first dimension of a C-order .npy file in place: rewrite the shape in the header and cut the file.
+    # the header is padded, so the shorter shape nearly always fits in the same header length. otherwise copy.
+    with open(path, "r+b") as npy_file:
+        if np.lib.format.read_magic(npy_file) == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+            data_offset = npy_file.tell()
+
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(header, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                          "fortran_order": fortran_order,
+                                                          "shape": (rows,) + tuple(shape[1:])})
+            if len(header.getvalue()) != data_offset:
+                header = None
+        else:
+            header = None
+
+        if header is not None:
+            npy_file.seek(0)
+            npy_file.write(header.getvalue())
+            npy_file.truncate(data_offset + rows * int(np.prod(shape[1:])) * dtype.itemsize)
+            return
+
+    trimmed = np.array(np.load(path, mmap_mode="r")[:rows])
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as npy_file:
+        np.save(npy_file, trimmed)
+    os.replace(temporary_path, path)
@@ -1,61 +1,185 @@
 import datetime
+import functools
 import time
+from typing import Optional
 
+import torch
+
+from methods.accelerated_gradient import run_nesterov_optimization_loop, run_anderson_optimization_loop
+from methods.batched_optimization import BatchedOptimizationResults, batched_oracles, run_batched_optimization_loop, \
+    batched_armijo_backtracking, batched_wolfe_line_search, batched_steepest_descent_search_direction, \
+    BatchedModifiedNewtonSearchDirection, BatchedLBfgsHistory
 from methods.bfgs_optimization import run_l_bfgs_optimization_loop, \
-    run_quasi_newton_optimization_loop, bfgs_update, dfp_update
-from methods.line_search import armijo_backtracking, wolfe_line_search
+    run_quasi_newton_optimization_loop, bfgs_update, dfp_update, bfgs_ldl_update, ldl_factor_search_direction, \
+    ldl_factor_initial_matrix
+from methods.checkpoint import save_checkpoint, load_checkpoint, check_initial_state
+from methods.instrumentation import StatisticsRecorder, recording
+from methods.line_search import armijo_backtracking, wolfe_line_search, interpolating_armijo_backtracking, \
+    strong_wolfe_line_search
 from methods.newton_cg import calc_newton_cg_search_direction
 from methods.optimization_loop_simple import run_optimization_loop_simple, calc_search_direction_steepest_descent, \
-    calc_search_direction_newton_modified
-from methods.methods import Method, OptimizationOptions, OptimizationResults, TimedOptimizationResults
+    calc_search_direction_newton_modified, HessianModificationState
+from methods.trust_region import run_trust_region_optimization_loop, SteihaugTrustRegionModel, \
+    DoglegTrustRegionModel, SR1TrustRegionModel
+from methods.methods import Method, OptimizationOptions, OptimizationResults, TimedOptimizationResults, SolverState
+from problems.precision import storage_dtype
 from problems.problems import Problem
 
 
 def timed_run_optimization(method: Method, problem: Problem, options: OptimizationOptions) -> TimedOptimizationResults:
-    # timedelta
-    start_datetime = datetime.datetime.now()
+    # perf_counter_ns is monotonic and has a much finer resolution than datetime.now(). see benchmarks.suite for
+    # repeated timings.
+    start_ns = time.perf_counter_ns()
     results = run_optimization(method, problem, options)
-    run_time = datetime.datetime.now() - start_datetime
+    run_time = datetime.timedelta(microseconds=(time.perf_counter_ns() - start_ns) / 1000)
     return TimedOptimizationResults(results, run_time)
 
 
-def run_optimization(method: Method, problem: Problem, options: OptimizationOptions) -> OptimizationResults:
+def check_precision(options: OptimizationOptions, x: torch.Tensor):
+    # the methods create their vectors and matrices in x's dtype, so a mismatch would silently run in the wrong
+    # precision.
+    dtype = storage_dtype(options.precision)
+    if x.dtype != dtype:
+        raise ValueError(f"{options.precision} precision needs {dtype} starting points, not {x.dtype}. load the problem "
+                         f"with the same precision")
+
+
+def run_optimization(method: Method, problem: Problem, options: OptimizationOptions,
+                     initial_state: Optional[SolverState] = None) -> OptimizationResults:
+    # initial_state continues a run from its iterate, or warm-starts one from its curvature (SolverState.warm_start).
+    # a resumed run counts its iterations from the state's, and its trace starts there.
+    check_precision(options, problem.x0)
+    if initial_state is not None:
+        check_initial_state(method, problem, initial_state)
+    if not options.collect_statistics:
+        results = run_method(method, problem, options, initial_state)
+    else:
+        recorder = StatisticsRecorder()
+        with recording(recorder):
+            results = run_method(method, recorder.instrument(problem), options, initial_state)
+        results = results._replace(statistics=recorder.statistics())
+
+    if options.checkpoint_path is not None:
+        save_checkpoint(options.checkpoint_path, results.final_state)
+    return results
+
+
+def resume_optimization(method: Method, problem: Problem, options: OptimizationOptions) -> OptimizationResults:
+    # continue the run that wrote options.checkpoint_path.
+    return run_optimization(method, problem, options, load_checkpoint(options.checkpoint_path))
+
+
+def run_method(method: Method, problem: Problem, options: OptimizationOptions,
+               initial_state: Optional[SolverState] = None) -> OptimizationResults:
+    if options.interpolating_line_search:
+        armijo, wolfe = interpolating_armijo_backtracking, strong_wolfe_line_search
+    else:
+        armijo, wolfe = armijo_backtracking, wolfe_line_search
+    tau = initial_state.hessian_modification_tau if initial_state is not None else 0.0
+
     match method:
         case Method.GradientDescent:
             return run_optimization_loop_simple(
-                calc_search_direction_steepest_descent, armijo_backtracking, problem, options)
+                method, calc_search_direction_steepest_descent, armijo, problem, options,
+                initial_state=initial_state)
         case Method.GradientDescentW:
             return run_optimization_loop_simple(
-                calc_search_direction_steepest_descent, wolfe_line_search, problem, options)
+                method, calc_search_direction_steepest_descent, wolfe, problem, options,
+                initial_state=initial_state)
         case Method.ModifiedNewton:
+            modification = HessianModificationState(tau)
             return run_optimization_loop_simple(
-                calc_search_direction_newton_modified, armijo_backtracking, problem, options)
+                method, functools.partial(calc_search_direction_newton_modified, modification),
+                armijo, problem, options, modification, initial_state)
         case Method.ModifiedNewtonW:
+            modification = HessianModificationState(tau)
             return run_optimization_loop_simple(
-                calc_search_direction_newton_modified, wolfe_line_search, problem, options)
+                method, functools.partial(calc_search_direction_newton_modified, modification),
+                wolfe, problem, options, modification, initial_state)
         case Method.NewtonCG:
             return run_optimization_loop_simple(
-                calc_newton_cg_search_direction, armijo_backtracking, problem, options)
+                method, calc_newton_cg_search_direction, armijo, problem, options, initial_state=initial_state)
         case Method.NewtonCGW:
             return run_optimization_loop_simple(
-                calc_newton_cg_search_direction, wolfe_line_search, problem, options)
+                method, calc_newton_cg_search_direction, wolfe, problem, options, initial_state=initial_state)
         case Method.BFGS:
             return run_quasi_newton_optimization_loop(
-                armijo_backtracking, bfgs_update, problem, options)
+                method, armijo, bfgs_update, problem, options, initial_state=initial_state)
         case Method.BFGSW:
             return run_quasi_newton_optimization_loop(
-                wolfe_line_search, bfgs_update, problem, options)
+                method, wolfe, bfgs_update, problem, options, initial_state=initial_state)
+        case Method.BFGSCholesky:
+            return run_quasi_newton_optimization_loop(
+                method, armijo, bfgs_ldl_update, problem, options, ldl_factor_search_direction,
+                ldl_factor_initial_matrix, initial_state)
+        case Method.BFGSCholeskyW:
+            return run_quasi_newton_optimization_loop(
+                method, wolfe, bfgs_ldl_update, problem, options, ldl_factor_search_direction,
+                ldl_factor_initial_matrix, initial_state)
         case Method.DFP:
             return run_quasi_newton_optimization_loop(
-                armijo_backtracking, dfp_update, problem, options)
+                method, armijo, dfp_update, problem, options, initial_state=initial_state)
         case Method.DFPW:
             return run_quasi_newton_optimization_loop(
-                wolfe_line_search, dfp_update, problem, options)
+                method, wolfe, dfp_update, problem, options, initial_state=initial_state)
         case Method.LBFGS:
             return run_l_bfgs_optimization_loop(
-                armijo_backtracking, problem, options)
+                method, armijo, problem, options, initial_state)
         case Method.LBFGSW:
             return run_l_bfgs_optimization_loop(
-                wolfe_line_search, problem, options)
+                method, wolfe, problem, options, initial_state)
+        # the trust region methods have no line search.
+        case Method.TrustRegionNewtonCG:
+            return run_trust_region_optimization_loop(
+                method, SteihaugTrustRegionModel().step, problem, options, initial_state=initial_state)
+        case Method.TrustRegionDogleg:
+            dogleg = DoglegTrustRegionModel(HessianModificationState(tau))
+            return run_trust_region_optimization_loop(
+                method, dogleg.step, problem, options, hessian_modification=dogleg.hessian_modification,
+                initial_state=initial_state)
+        case Method.TrustRegionSR1:
+            model = SR1TrustRegionModel(problem.x0.shape[0], problem.x0.dtype,
+                                        initial_state.quasi_newton_matrix if initial_state is not None else None)
+            return run_trust_region_optimization_loop(
+                method, model.step, problem, options, model, initial_state=initial_state)
+        case Method.NesterovAcceleratedGradient:
+            return run_nesterov_optimization_loop(method, problem, options, initial_state)
+        case Method.AndersonAcceleratedGradient:
+            return run_anderson_optimization_loop(method, problem, options, initial_state)
         case _:
             raise NotImplementedError(f"unknown method type: {method}")
+
+
+def run_batched_optimization(method: Method, problem: Problem, x0s: torch.Tensor,
+                             options: OptimizationOptions) -> BatchedOptimizationResults:
+    # run each row of the (K x n) x0s as a starting point. needs problem.tensor_objective_function. the batched loop
+    # runs entirely in x0s's dtype: in mixed precision its reductions are float32 too.
+    check_precision(options, x0s)
+    oracles = batched_oracles(problem)
+    k, n = x0s.shape
+
+    match method:
+        case Method.GradientDescent:
+            return run_batched_optimization_loop(
+                batched_steepest_descent_search_direction, batched_armijo_backtracking, oracles, x0s, options)
+        case Method.GradientDescentW:
+            return run_batched_optimization_loop(
+                batched_steepest_descent_search_direction, batched_wolfe_line_search, oracles, x0s, options)
+        case Method.ModifiedNewton:
+            return run_batched_optimization_loop(
+                BatchedModifiedNewtonSearchDirection(oracles, k, x0s.dtype), batched_armijo_backtracking,
+                oracles, x0s, options)
+        case Method.ModifiedNewtonW:
+            return run_batched_optimization_loop(
+                BatchedModifiedNewtonSearchDirection(oracles, k, x0s.dtype), batched_wolfe_line_search,
+                oracles, x0s, options)
+        case Method.LBFGS:
+            history = BatchedLBfgsHistory(min(options.l_bfgs_memory, n), k, n, x0s.dtype)
+            return run_batched_optimization_loop(
+                history, batched_armijo_backtracking, oracles, x0s, options, history)
+        case Method.LBFGSW:
+            history = BatchedLBfgsHistory(min(options.l_bfgs_memory, n), k, n, x0s.dtype)
+            return run_batched_optimization_loop(
+                history, batched_wolfe_line_search, oracles, x0s, options, history)
+        case _:
+            raise NotImplementedError(f"no batched implementation of method: {method}")
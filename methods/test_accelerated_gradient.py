@@ -0,0 +1,66 @@
+import pytest
+import torch
+
+from methods.accelerated_gradient import gradient_step_backtracking
+from methods.methods import Method, OptimizationOptions, OptimizationTerminationReason
+from methods.run_optimization import run_optimization
+from problems.registry import ProblemFamily, build_problem
+
+
+def test_gradient_step_backtracking():
+    problem = build_problem(ProblemFamily.Quadratic, 10, condition_number=1000)
+    x = problem.x0
+    fx, gradient = problem.value_and_gradient(x)
+    options = OptimizationOptions()
+
+    # from an underestimate, L grows until the step decreases f enough.
+    x_next, f_next, lipschitz = gradient_step_backtracking(options, problem.objective_function, x, fx, gradient, 1e-3)
+    assert lipschitz > 1e-3
+    assert torch.allclose(x_next, x - gradient / lipschitz)
+    assert f_next <= fx - torch.dot(gradient, gradient).item() / (2 * lipschitz)
+
+    # an overestimate is decreased once, and the first trial is accepted.
+    _, _, lipschitz = gradient_step_backtracking(options, problem.objective_function, x, fx, gradient, 1e6)
+    assert lipschitz == pytest.approx(1e6 * options.accelerated_gradient_lipschitz_decrease)
+
+
+@pytest.mark.parametrize("method", [Method.NesterovAcceleratedGradient, Method.AndersonAcceleratedGradient])
+def test_accelerated_methods_beat_gradient_descent(method: Method):
+    problem = build_problem(ProblemFamily.Quadratic, 10, condition_number=1000)
+    options = OptimizationOptions(collect_statistics=True, max_iterations=1000)
+    results = run_optimization(method, problem, options)
+    baseline = run_optimization(Method.GradientDescentW, problem, options)
+
+    assert results.termination_reason == OptimizationTerminationReason.reached_stationary_point
+    assert baseline.termination_reason == OptimizationTerminationReason.reached_iteration_limit
+    # first-order: no hessians, and a few oracle calls per iteration.
+    statistics = results.statistics
+    iterations = results.trace.total_steps - 1
+    assert statistics.hessian_evaluations == statistics.hessian_vector_products == 0
+    assert statistics.function_evaluations + statistics.value_and_gradient_evaluations + \
+        statistics.gradient_evaluations <= 3 * iterations + 1
+
+
+def test_nesterov_restarts():
+    # without restarts t_k grows like k / 2.
+    problem = build_problem(ProblemFamily.Quadratic, 10, condition_number=1000)
+    results = run_optimization(Method.NesterovAcceleratedGradient, problem, OptimizationOptions(max_iterations=1000))
+    assert results.termination_reason == OptimizationTerminationReason.reached_stationary_point
+    assert results.final_state.nesterov_t < (results.trace.total_steps - 1) / 4
+
+
+@pytest.mark.parametrize("memory", [1, 5, 20])
+def test_anderson_window(memory: int):
+    problem = build_problem(ProblemFamily.Quadratic, 10, condition_number=1000)
+    results = run_optimization(Method.AndersonAcceleratedGradient, problem,
+                               OptimizationOptions(max_iterations=1000, anderson_memory=memory))
+    assert results.termination_reason == OptimizationTerminationReason.reached_stationary_point
+    # at most n differences are kept.
+    state = results.final_state
+    assert state.anderson_dxs.shape[0] == state.anderson_dgs.shape[0] <= min(memory, 10)
+    if memory >= 10:
+        # the full window on a quadratic: a krylov method.
+        assert results.trace.total_steps - 1 <= 20
+
+    with pytest.raises(ValueError):
+        run_optimization(Method.AndersonAcceleratedGradient, problem, OptimizationOptions(anderson_memory=0))
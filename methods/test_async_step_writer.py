@@ -0,0 +1,69 @@
+import csv
+import json
+import os
+import time
+
+from methods.async_step_writer import AsyncStepWriter, StepOutputFormat, BackpressurePolicy
+from methods.methods import Method, OptimizationOptions, OptimizationStep
+from methods.run_optimization import run_optimization
+from problems.registry import ProblemFamily, build_problem
+
+
+def test_csv_writer_matches_trace(tmp_path):
+    path = os.path.join(tmp_path, "steps.csv")
+    with AsyncStepWriter(StepOutputFormat.csv, path, policy=BackpressurePolicy.block) as writer:
+        results = run_optimization(Method.LBFGSW, build_problem(ProblemFamily.Rosenbrock, 20),
+                                   OptimizationOptions(step_callback=writer))
+
+    with open(path, newline="") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert [int(row["k"]) for row in rows] == results.trace.iterations.tolist()
+    assert [float(row["after_function_value"]) for row in rows] == results.trace.function_values.tolist()
+    assert writer.dropped == 0
+
+
+def test_jsonl_writer_flush(tmp_path):
+    path = os.path.join(tmp_path, "steps.jsonl")
+    writer = AsyncStepWriter(StepOutputFormat.jsonl, path, flush_interval=60)
+    writer(0, OptimizationStep(0, 2.5, 1.0))
+    writer(1, OptimizationStep(0.5, 1.5, 0.25))
+    writer.flush()
+
+    with open(path) as jsonl_file:
+        lines = [json.loads(line) for line in jsonl_file]
+    assert lines == [{"k": 0, "step_length": 0, "after_function_value": 2.5, "after_gradient_norm": 1.0},
+                     {"k": 1, "step_length": 0.5, "after_function_value": 1.5, "after_gradient_norm": 0.25}]
+    writer.close()
+    writer.close()
+
+
+def test_drop_policy_never_waits(tmp_path):
+    path = os.path.join(tmp_path, "steps.csv")
+    # a full queue wakes the writer long before its interval.
+    with AsyncStepWriter(StepOutputFormat.csv, path, max_queue_size=3, flush_interval=60) as writer:
+        for k in range(3):
+            writer(k, OptimizationStep(1, k, k))
+        deadline = time.monotonic() + 10
+        while writer._written < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer._written == 3
+
+        # the solver doesn't wait for the writer, so some of these may be dropped, and every one is counted.
+        for k in range(3, 1000):
+            writer(k, OptimizationStep(1, k, k))
+        dropped = writer.dropped
+
+    with open(path) as csv_file:
+        assert len(csv_file.readlines()) == 1 + 1000 - dropped
+
+
+def test_block_policy_keeps_every_step(tmp_path):
+    path = os.path.join(tmp_path, "steps.csv")
+    with AsyncStepWriter(StepOutputFormat.csv, path, max_queue_size=3, flush_interval=60,
+                         policy=BackpressurePolicy.block) as writer:
+        for k in range(100):
+            writer(k, OptimizationStep(1, k, k))
+
+    with open(path) as csv_file:
+        assert len(csv_file.readlines()) == 1 + 100
+    assert writer.dropped == 0
@@ -0,0 +1,43 @@
+import pytest
+import torch
+
+from methods.methods import Method, OptimizationOptions
+from methods.run_optimization import run_optimization, run_batched_optimization
+from problems.problems import load_problem, ProblemType, DerivativeBackend
+
+
+@pytest.mark.parametrize("method", [Method.GradientDescent, Method.GradientDescentW, Method.ModifiedNewton,
+                                    Method.ModifiedNewtonW, Method.LBFGS, Method.LBFGSW])
+def test_batched_optimization_matches_sequential_runs(method: Method):
+    # the autograd backend gives the sequential runs the same derivatives as the batched runs.
+    problem = load_problem(ProblemType.Rosenbrock_2, DerivativeBackend.autograd)
+    x0s = problem.x0 + torch.tensor([[0, 0], [0.5, -0.5], [2, 1], [-1, -2]], dtype=torch.double)
+    options = OptimizationOptions(max_iterations=20)
+
+    batched_results = run_batched_optimization(method, problem, x0s, options)
+
+    for i in range(x0s.shape[0]):
+        results = run_optimization(method, problem._replace(x0=x0s[i]), options)
+        assert batched_results.termination_reasons[i] == results.termination_reason
+        assert batched_results.iterations[i].item() == results.trace.total_steps - 1
+        assert batched_results.final_function_values[i].item() == pytest.approx(results.final_function_value, rel=1e-8)
+        assert torch.linalg.norm(batched_results.final_x[i] - results.final_x, 2).item() < 1e-6
+
+
+def test_batched_optimization_rows_terminate_independently():
+    problem = load_problem(ProblemType.Rosenbrock_2)
+    # the first row starts at the minimizer.
+    x0s = torch.stack([torch.ones_like(problem.x0), problem.x0])
+
+    results = run_batched_optimization(Method.LBFGSW, problem, x0s, OptimizationOptions())
+
+    assert results.iterations[0].item() == 1
+    assert results.iterations[1].item() > 1
+    assert torch.linalg.norm(results.final_x[0] - x0s[0], 2).item() == 0
+    assert torch.all(results.final_gradient_norms < OptimizationOptions().stationary_point_gradient_norm_tolerance)
+
+
+def test_batched_optimization_requires_tensor_objective():
+    problem = load_problem(ProblemType.Rosenbrock_2)._replace(tensor_objective_function=None)
+    with pytest.raises(ValueError):
+        run_batched_optimization(Method.GradientDescent, problem, problem.x0.unsqueeze(0), OptimizationOptions())
@@ -0,0 +1,97 @@
+import torch
+
+from methods.bfgs_optimization import bfgs_update, dfp_update, bfgs_ldl_update, ldl_factor_search_direction, \
+    LBfgsHistory, l_bfgs_recursion
+from methods.methods import OptimizationOptions
+
+
+def random_spd_and_pair(n: int) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    generator = torch.Generator().manual_seed(n)
+    a = torch.randn(n, n, generator=generator, dtype=torch.double)
+    spd = a @ a.t() + n * torch.eye(n, dtype=torch.double)
+    sk = torch.randn(n, generator=generator, dtype=torch.double)
+    yk = spd @ sk
+    return spd, sk, yk
+
+
+def test_bfgs_update_matches_dense_formula():
+    hk, sk, yk = random_spd_and_pair(7)
+    hk = torch.linalg.inv(hk)
+    identity = torch.eye(7, dtype=torch.double)
+    rhok = 1 / torch.dot(yk, sk)
+
+    expected = (identity - rhok * torch.outer(sk, yk)) @ hk @ (identity - rhok * torch.outer(yk, sk)) + \
+        rhok * torch.outer(sk, sk)
+    updated = bfgs_update(OptimizationOptions(), hk.clone(), sk, yk)
+
+    assert torch.linalg.norm(updated - expected).item() < 1e-10
+
+
+def test_dfp_update_matches_dense_formula():
+    hk, sk, yk = random_spd_and_pair(7)
+    hk = torch.linalg.inv(hk)
+
+    expected = hk - hk @ torch.outer(yk, yk) @ hk / torch.dot(yk, hk @ yk) + torch.outer(sk, sk) / torch.dot(yk, sk)
+    updated = dfp_update(OptimizationOptions(), hk.clone(), sk, yk)
+
+    assert torch.linalg.norm(updated - expected).item() < 1e-10
+
+
+def test_bfgs_ldl_update_matches_dense_hessian_update():
+    bk, sk, yk = random_spd_and_pair(7)
+    lower = torch.linalg.cholesky(bk)
+    d = torch.diagonal(lower) ** 2
+    packed_ldl = lower / torch.diagonal(lower)
+    packed_ldl.diagonal().copy_(d)
+    bk_sk = bk @ sk
+
+    expected = bk + torch.outer(yk, yk) / torch.dot(yk, sk) - torch.outer(bk_sk, bk_sk) / torch.dot(sk, bk_sk)
+    updated = bfgs_ldl_update(OptimizationOptions(), packed_ldl, sk, yk)
+
+    unit_lower = torch.tril(updated, -1) + torch.eye(7, dtype=torch.double)
+    reconstructed = unit_lower @ torch.diag(torch.diagonal(updated)) @ unit_lower.t()
+    assert torch.linalg.norm(reconstructed - expected).item() < 1e-8
+
+    gradient = torch.ones(7, dtype=torch.double)
+    expected_direction = -1 * torch.linalg.solve(expected, gradient)
+    assert torch.linalg.norm(ldl_factor_search_direction(updated, gradient) - expected_direction).item() < 1e-8
+
+
+def list_l_bfgs_direction(sks: list[torch.Tensor], yks: list[torch.Tensor], gradk: torch.Tensor) -> torch.Tensor:
+    # Nocedal & Wright algorithm 7.4 on plain lists, oldest pair first.
+    q = gradk.clone()
+    alphas = []
+    for sk, yk in reversed(list(zip(sks, yks))):
+        alpha = torch.dot(sk, q) / torch.dot(yk, sk)
+        alphas.append(alpha)
+        q = q - alpha * yk
+    r = torch.dot(sks[-1], yks[-1]) / torch.dot(yks[-1], yks[-1]) * q
+    for (sk, yk), alpha in zip(zip(sks, yks), reversed(alphas)):
+        beta = torch.dot(yk, r) / torch.dot(yk, sk)
+        r = r + (alpha - beta) * sk
+    return -r
+
+
+def test_l_bfgs_history_wraps_around():
+    n = 6
+    m = OptimizationOptions(l_bfgs_memory=3).l_bfgs_memory
+    spd, _, _ = random_spd_and_pair(n)
+    generator = torch.Generator().manual_seed(1)
+    gradk = torch.randn(n, generator=generator, dtype=torch.double)
+    history = LBfgsHistory(m, n, torch.double)
+    sks, yks = [], []
+
+    # more than m updates, so the ring buffer overwrites its oldest pairs.
+    for _ in range(3 * m + 1):
+        sk = torch.randn(n, generator=generator, dtype=torch.double)
+        yk = spd @ sk
+        history.add(sk, yk, torch.dot(yk, sk).item())
+        sks.append(sk)
+        yks.append(yk)
+
+        expected = list_l_bfgs_direction(sks[-m:], yks[-m:], gradk)
+        assert torch.allclose(l_bfgs_recursion(history, gradk), expected, rtol=1e-10)
+
+    kept_sks, kept_yks = history.pairs()
+    assert torch.equal(kept_sks, torch.stack(sks[-m:]))
+    assert torch.equal(kept_yks, torch.stack(yks[-m:]))
@@ -0,0 +1,113 @@
+import functools
+import os
+
+import pytest
+import torch
+
+from methods.checkpoint import save_checkpoint, load_checkpoint
+from methods.methods import Method, OptimizationOptions, OptimizationTerminationReason
+from methods.run_optimization import run_optimization, resume_optimization
+from problems import quadratics
+from problems.problems import Problem
+from problems.registry import ProblemFamily, build_problem
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_at(k_interrupt: int):
+    def step_callback(k, _step):
+        if k == k_interrupt:
+            raise Interrupted
+    return step_callback
+
+
+@pytest.mark.parametrize("method", list(Method))
+def test_resumed_run_matches_uninterrupted_run(method: Method):
+    problem = build_problem(ProblemFamily.Genhumps, 5)
+    options = OptimizationOptions(max_iterations=12)
+    uninterrupted = run_optimization(method, problem, options)
+
+    first = run_optimization(method, problem, options._replace(max_iterations=5))
+    assert first.final_state.iteration == 5
+    resumed = run_optimization(method, problem, options, first.final_state)
+
+    assert torch.equal(resumed.final_x, uninterrupted.final_x)
+    assert resumed.final_function_value == uninterrupted.final_function_value
+    assert resumed.termination_reason == uninterrupted.termination_reason
+    assert resumed.trace.iterations[0].item() == 5
+    assert torch.equal(resumed.trace.function_values, uninterrupted.trace.function_values[5:])
+
+
+@pytest.mark.parametrize("method", [Method.BFGSW, Method.LBFGS, Method.ModifiedNewton, Method.TrustRegionSR1])
+def test_resume_from_periodic_checkpoint(tmp_path, method: Method):
+    problem = build_problem(ProblemFamily.Genhumps, 5)
+    path = os.path.join(tmp_path, "checkpoint.pt")
+    options = OptimizationOptions(checkpoint_path=path, checkpoint_interval=4)
+    uninterrupted = run_optimization(method, problem, options._replace(checkpoint_path=None))
+
+    with pytest.raises(Interrupted):
+        run_optimization(method, problem, options._replace(step_callback=interrupt_at(10)))
+    assert load_checkpoint(path).iteration == 8
+
+    resumed = resume_optimization(method, problem, options)
+    assert torch.equal(resumed.final_x, uninterrupted.final_x)
+    assert resumed.trace.total_steps == uninterrupted.trace.total_steps - 8
+    # the finished run's state.
+    assert load_checkpoint(path).iteration == uninterrupted.trace.total_steps - 1
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "nested", "checkpoint.pt")
+    state = run_optimization(Method.LBFGSW, build_problem(ProblemFamily.Rosenbrock, 10),
+                             OptimizationOptions(max_iterations=15)).final_state
+    save_checkpoint(path, state)
+    loaded = load_checkpoint(path)
+
+    assert loaded.method == Method.LBFGSW
+    assert loaded.l_bfgs_sks.shape == (10, 10)
+    for field, value in state._asdict().items():
+        loaded_value = getattr(loaded, field)
+        if isinstance(value, torch.Tensor):
+            assert torch.equal(loaded_value, value)
+        elif field == "previous_line_search_state":
+            assert loaded_value.function_value == value.function_value
+            assert torch.equal(loaded_value.search_direction, value.search_direction)
+        else:
+            assert loaded_value == value
+
+
+def test_invalid_initial_states():
+    problem = build_problem(ProblemFamily.Rosenbrock, 10)
+    state = run_optimization(Method.BFGSW, problem, OptimizationOptions(max_iterations=3)).final_state
+    with pytest.raises(ValueError):
+        run_optimization(Method.LBFGSW, problem, OptimizationOptions(), state)
+    with pytest.raises(ValueError):
+        run_optimization(Method.BFGSW, build_problem(ProblemFamily.Rosenbrock, 12), OptimizationOptions(), state)
+
+
+def with_linear_term(problem: Problem, small_q: torch.Tensor) -> Problem:
+    big_q = problem.objective_hessian_function(problem.x0)
+    return problem._replace(
+        objective_function=functools.partial(quadratics.quadratic_function, big_q, small_q),
+        objective_gradient_function=functools.partial(quadratics.quadratic_gradient, big_q, small_q),
+        value_and_gradient_function=functools.partial(quadratics.quadratic_value_and_gradient, big_q, small_q),
+        tensor_objective_function=functools.partial(quadratics.quadratic_tensor_function, big_q, small_q))
+
+
+@pytest.mark.parametrize("method", [Method.BFGSW, Method.BFGSCholeskyW, Method.TrustRegionSR1])
+def test_warm_start_reuses_curvature(method: Method):
+    # a new small_q for the same big_q: the previous solve's hessian approximation still applies.
+    problem = build_problem(ProblemFamily.Quadratic, 50, condition_number=1000)
+    generator = torch.Generator().manual_seed(7)
+    changed = with_linear_term(problem, torch.randn(50, generator=generator, dtype=torch.double))
+    options = OptimizationOptions()
+
+    previous = run_optimization(method, problem, options)
+    cold = run_optimization(method, changed, options)
+    warm = run_optimization(method, changed, options, previous.final_state.warm_start())
+
+    assert warm.termination_reason == OptimizationTerminationReason.reached_stationary_point
+    assert warm.trace.iterations[0].item() == 0
+    assert warm.trace.total_steps < cold.trace.total_steps
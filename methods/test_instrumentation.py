@@ -0,0 +1,75 @@
+import pytest
+import torch
+
+from methods.methods import Method, OptimizationOptions, OptimizationPhase
+from methods.run_optimization import run_optimization
+from problems.registry import ProblemFamily, build_problem
+
+
+@pytest.mark.parametrize("method", list(Method))
+def test_statistics_do_not_change_the_run(method: Method):
+    problem = build_problem(ProblemFamily.Rosenbrock, 10)
+    results = run_optimization(method, problem, OptimizationOptions(collect_statistics=True))
+    expected = run_optimization(method, problem, OptimizationOptions())
+
+    assert expected.statistics is None
+    assert torch.equal(results.final_x, expected.final_x)
+    assert results.trace.total_steps == expected.trace.total_steps
+
+    statistics = results.statistics
+    iterations = results.trace.total_steps - 1
+    assert all(seconds >= 0 for seconds in statistics.phase_seconds.values())
+    if method.name.startswith("TrustRegion"):
+        # x0, and then a function evaluation at every trial point.
+        accepted = iterations - statistics.trust_region_rejected_steps
+        assert statistics.value_and_gradient_evaluations + statistics.gradient_evaluations >= accepted + 1
+        assert statistics.line_search_trials == 0
+        assert statistics.phase_seconds[OptimizationPhase.line_search] == 0
+        return
+
+    # x0, and then a gradient or line search evaluation after every step.
+    assert statistics.value_and_gradient_evaluations + statistics.gradient_evaluations >= iterations + 1
+    if method == Method.AndersonAcceleratedGradient:
+        # only the steps that fall back to the gradient step search, the first one always does.
+        assert 0 < statistics.line_search_trials < 2 * iterations
+        assert statistics.phase_seconds[OptimizationPhase.search_direction] > 0
+    else:
+        assert statistics.line_search_trials >= iterations
+    assert statistics.phase_seconds[OptimizationPhase.line_search] > 0
+    assert statistics.trust_region_rejected_steps == statistics.trust_region_contractions == \
+        statistics.trust_region_expansions == 0
+
+
+def test_gradient_descent_armijo_counts():
+    problem = build_problem(ProblemFamily.Rosenbrock, 10)
+    results = run_optimization(Method.GradientDescent, problem, OptimizationOptions(collect_statistics=True))
+    statistics = results.statistics
+    iterations = results.trace.total_steps - 1
+
+    # armijo backtracking evaluates only f, once per trial, and the loop evaluates the gradient after each step.
+    assert statistics.function_evaluations == statistics.line_search_trials
+    assert statistics.value_and_gradient_evaluations == 1
+    assert statistics.gradient_evaluations == iterations
+    assert statistics.hessian_evaluations == 0
+    assert statistics.phase_seconds[OptimizationPhase.quasi_newton_update] == 0
+
+
+def test_newton_counts():
+    problem = build_problem(ProblemFamily.Rosenbrock, 10)
+    options = OptimizationOptions(collect_statistics=True)
+
+    newton_cg = run_optimization(Method.NewtonCGW, problem, options).statistics
+    assert newton_cg.cg_iterations == newton_cg.hessian_vector_products > 0
+    assert newton_cg.hessian_evaluations == 0
+
+    modified_newton = run_optimization(Method.ModifiedNewtonW, problem, options)
+    assert modified_newton.statistics.hessian_evaluations == modified_newton.trace.total_steps - 1
+
+    bfgs = run_optimization(Method.BFGSW, problem, options).statistics
+    assert bfgs.phase_seconds[OptimizationPhase.quasi_newton_update] > 0
+
+
+def test_sparse_modified_newton_counts_cg_iterations():
+    problem = build_problem(ProblemFamily.Quadratic, 50, density=0.05, sparse=True)
+    statistics = run_optimization(Method.ModifiedNewton, problem, OptimizationOptions(collect_statistics=True)).statistics
+    assert statistics.cg_iterations > 0
@@ -0,0 +1,76 @@
+import pytest
+import torch
+
+from methods.line_search import LineSearchState, interpolating_armijo_backtracking, strong_wolfe_line_search
+from methods.methods import Method, OptimizationOptions, OptimizationTerminationReason
+from methods.run_optimization import run_optimization
+from problems.registry import ProblemFamily, build_problem
+
+
+def steepest_descent_state(family: ProblemFamily, n: int) -> tuple:
+    problem = build_problem(family, n)
+    gradient = problem.objective_gradient_function(problem.x0)
+    return problem, LineSearchState(problem.objective_function(problem.x0), gradient, -gradient)
+
+
+@pytest.mark.parametrize("family", [ProblemFamily.Rosenbrock, ProblemFamily.Quartic, ProblemFamily.Genhumps])
+def test_strong_wolfe_conditions(family: ProblemFamily):
+    options = OptimizationOptions()
+    problem, state = steepest_descent_state(family, 10)
+    result = strong_wolfe_line_search(options, problem.objective_function, problem.objective_gradient_function,
+                                      problem.x0, None, state)
+
+    slope = torch.dot(state.search_direction, state.gradient).item()
+    x = problem.x0 + result.step_length * state.search_direction
+    assert result.step_length > 0
+    assert result.function_value == pytest.approx(problem.objective_function(x))
+    assert result.function_value <= state.function_value + options.wolfe_line_search_c1 * result.step_length * slope
+    assert torch.allclose(result.gradient, problem.objective_gradient_function(x))
+    assert abs(torch.dot(state.search_direction, result.gradient).item()) <= -options.wolfe_line_search_c2 * slope
+
+
+@pytest.mark.parametrize("family", [ProblemFamily.Rosenbrock, ProblemFamily.Quartic, ProblemFamily.Genhumps])
+def test_interpolating_armijo_sufficient_decrease(family: ProblemFamily):
+    options = OptimizationOptions()
+    problem, state = steepest_descent_state(family, 10)
+    result = interpolating_armijo_backtracking(options, problem.objective_function,
+                                               problem.objective_gradient_function, problem.x0, None, state)
+
+    slope = torch.dot(state.search_direction, state.gradient).item()
+    assert 0 < result.step_length <= 1
+    assert result.gradient is None
+    assert result.function_value <= state.function_value + options.armijo_backtracking_c1 * result.step_length * slope
+
+
+@pytest.mark.parametrize("line_search", [interpolating_armijo_backtracking, strong_wolfe_line_search])
+def test_ascent_direction_raises(line_search):
+    problem, state = steepest_descent_state(ProblemFamily.Rosenbrock, 10)
+    with pytest.raises(ValueError):
+        line_search(OptimizationOptions(), problem.objective_function, problem.objective_gradient_function,
+                    problem.x0, None, state._replace(search_direction=state.gradient))
+
+
+@pytest.mark.parametrize("method", list(Method))
+def test_methods_converge_with_interpolating_line_search(method: Method):
+    if method in [Method.GradientDescent, Method.GradientDescentW]:
+        pytest.skip("needs more than max_iterations steps on rosenbrock with either line search")
+    problem = build_problem(ProblemFamily.Rosenbrock, 10)
+    options = OptimizationOptions(interpolating_line_search=True)
+    results = run_optimization(method, problem, options)
+    assert results.termination_reason == OptimizationTerminationReason.reached_stationary_point
+    assert results.final_gradient_norm <= options.stationary_point_gradient_norm_tolerance
+
+
+@pytest.mark.parametrize("family, n", [(ProblemFamily.Rosenbrock, 10), (ProblemFamily.Genhumps, 5)])
+def test_interpolation_saves_evaluations(family: ProblemFamily, n: int):
+    problem = build_problem(family, n)
+    counts = []
+    for interpolating in [False, True]:
+        options = OptimizationOptions(collect_statistics=True, interpolating_line_search=interpolating)
+        count = 0
+        for method in Method:
+            statistics = run_optimization(method, problem, options).statistics
+            count += statistics.function_evaluations + statistics.gradient_evaluations + \
+                statistics.value_and_gradient_evaluations
+        counts.append(count)
+    assert counts[1] < counts[0]
@@ -0,0 +1,101 @@
+import pytest
+import torch
+
+from methods.methods import Method, OptimizationOptions, OptimizationTerminationReason
+from methods.optimization_loop_simple import modify_hessian, is_matrix_spd, modified_newton_conjugate_gradient, \
+    modify_hessian_operator
+from methods.run_optimization import run_optimization
+from problems.hessian_operators import DenseHessian
+from problems.precision import Precision
+from problems.registry import ProblemFamily, build_problem
+
+
+def test_modify_hessian_spd_unchanged():
+    hess = torch.tensor([[4.0, 1.0], [1.0, 3.0]], dtype=torch.float64)
+    factor, tau = modify_hessian(hess)
+    assert tau == 0
+    assert torch.allclose(factor @ factor.T, hess)
+
+
+def test_modify_hessian_indefinite():
+    hess = torch.tensor([[1.0, 0.0], [0.0, -2.0]], dtype=torch.float64)
+    assert not is_matrix_spd(hess)
+    factor, tau = modify_hessian(hess)
+    assert tau > 2
+    assert torch.allclose(factor @ factor.T, hess + tau * torch.eye(2, dtype=torch.float64))
+    assert is_matrix_spd(factor @ factor.T)
+
+
+class CountingDenseHessian(DenseHessian):
+    def __init__(self, matrix: torch.Tensor):
+        super().__init__(matrix)
+        self.factorizations = 0
+
+    def shifted_cholesky(self, tau: float):
+        self.factorizations += 1
+        return super().shifted_cholesky(tau)
+
+
+def test_modify_hessian_carries_tau_over():
+    # positive diagonal, so the first factorization is unshifted and fails. without the previous tau, tau doubles up
+    # from beta.
+    hess = torch.tensor([[1.0, 2.0], [2.0, 1.0]], dtype=torch.float64)
+    fresh = CountingDenseHessian(hess)
+    _, tau = modify_hessian_operator(fresh)
+    assert tau > 1
+
+    # starting from the previous tau reaches the same modification in fewer factorizations: the failed unshifted
+    # one, and then the previous tau.
+    carried = CountingDenseHessian(hess)
+    _, tau_carried = modify_hessian_operator(carried, tau)
+    assert tau_carried == tau
+    assert carried.factorizations == 2
+    assert fresh.factorizations > 10
+
+
+@pytest.mark.parametrize("method", [Method.ModifiedNewtonW, Method.NewtonCGW, Method.BFGSW, Method.BFGSCholeskyW])
+def test_sparse_quadratic_matches_dense(method: Method):
+    sparse_problem = build_problem(ProblemFamily.Quadratic, 50, condition_number=100, density=0.05, sparse=True)
+    big_q = sparse_problem.objective_hessian_function(sparse_problem.x0)
+    dense_problem = sparse_problem._replace(objective_hessian_function=lambda x: big_q.to_dense())
+    options = OptimizationOptions(quasi_newton_diagonal_initialization=True)
+
+    sparse_results = run_optimization(method, sparse_problem, options)
+    dense_results = run_optimization(method, dense_problem, options)
+
+    assert sparse_results.termination_reason == OptimizationTerminationReason.reached_stationary_point
+    # both stop once the gradient norm is below 1e-4, and the smallest eigenvalue of Q is about 1.
+    assert torch.linalg.norm(sparse_results.final_x - dense_results.final_x, 2).item() < 1e-4
+
+
+def test_modified_newton_conjugate_gradient_indefinite():
+    hess = torch.tensor([[1.0, 0.0], [0.0, -2.0]], dtype=torch.float64)
+    gradient = torch.tensor([1.0, 1.0], dtype=torch.float64)
+
+    searchk, tau = modified_newton_conjugate_gradient(hess.to_sparse_csr(), gradient)
+    factor, expected_tau = modify_hessian(hess)
+
+    assert tau == expected_tau
+    assert torch.allclose(searchk, -1 * torch.cholesky_solve(gradient.unsqueeze(1), factor).squeeze(1))
+
+
+@pytest.mark.parametrize("method", [Method.ModifiedNewtonW, Method.NewtonCGW, Method.BFGSW, Method.LBFGSW])
+def test_mixed_precision_matches_float64(method: Method):
+    problem = build_problem(ProblemFamily.Quadratic, 50, condition_number=100, density=0.05, sparse=True,
+                            precision=Precision.mixed)
+    reference = build_problem(ProblemFamily.Quadratic, 50, condition_number=100, density=0.05, sparse=True)
+
+    results = run_optimization(method, problem, OptimizationOptions(precision=Precision.mixed))
+    reference_results = run_optimization(method, reference, OptimizationOptions())
+
+    assert results.final_x.dtype == torch.float32
+    # the quasi-newton methods can stop on a float32 iterate that no longer moves, short of the gradient tolerance.
+    assert results.termination_reason != OptimizationTerminationReason.reached_iteration_limit
+    assert results.final_function_value == pytest.approx(reference_results.final_function_value, rel=1e-6)
+    assert torch.linalg.norm(results.final_x.double() - reference_results.final_x, 2).item() < 1e-3
+
+
+def test_precision_mismatch_is_an_error():
+    problem = build_problem(ProblemFamily.Rosenbrock, 10, precision=Precision.float32)
+    with pytest.raises(ValueError):
+        run_optimization(Method.GradientDescent, problem, OptimizationOptions())
@@ -0,0 +1,74 @@
+import os
+import pickle
+
+import pytest
+import torch
+
+from methods.methods import Method, OptimizationOptions, OptimizationStep
+from methods.optimization_trace import OptimizationTrace, TraceMode
+from methods.run_optimization import run_optimization
+from problems.registry import ProblemFamily, build_problem
+
+
+def record_steps(trace: OptimizationTrace, count: int) -> OptimizationTrace:
+    x = torch.zeros(3, dtype=torch.double)
+    for k in range(count):
+        trace.record(k, OptimizationStep(1 / (k + 1), float(count - k), float(k)), x + k)
+    return trace.finalize()
+
+
+def test_full_trace_matches_step_callback():
+    steps = []
+    options = OptimizationOptions(step_callback=lambda k, step: steps.append(step), trace_timestamps=True)
+    results = run_optimization(Method.BFGSW, build_problem(ProblemFamily.Rosenbrock, 10), options)
+    trace = results.trace
+
+    assert list(trace) == steps
+    assert trace.total_steps == len(steps)
+    assert torch.equal(trace.iterations, torch.arange(len(steps)))
+    assert trace.gradient_norms[-1].item() == results.final_gradient_norm
+    assert torch.all(torch.diff(trace.timestamps_ns) >= 0)
+
+
+@pytest.mark.parametrize("count", [5, 8, 9, 100, 1000])
+def test_decimated_trace(count: int):
+    trace = record_steps(OptimizationTrace(TraceMode.decimate, 8, 1000, torch.zeros(3)), count)
+
+    iterations = trace.iterations.tolist()
+    assert trace.total_steps == count
+    assert len(trace) <= 9
+    assert iterations[0] == 0
+    assert iterations[-1] == count - 1
+    # evenly spaced apart from the appended last step.
+    assert len(set(torch.diff(trace.iterations[:-1]).tolist())) <= 1
+    assert trace[-1] == OptimizationStep(1 / count, 1.0, float(count - 1))
+
+
+def test_ring_trace_keeps_the_last_steps_in_order():
+    trace = record_steps(OptimizationTrace(TraceMode.ring, 5, 1000, torch.zeros(3)), 103)
+
+    assert trace.iterations.tolist() == [98, 99, 100, 101, 102]
+    assert trace.gradient_norms.tolist() == [98, 99, 100, 101, 102]
+    assert trace.total_steps == 103
+
+
+def test_x_trajectory_is_streamed_to_disk(tmp_path):
+    x_path = os.path.join(tmp_path, "x.npy")
+    problem = build_problem(ProblemFamily.Rosenbrock, 10)
+    options = OptimizationOptions(trace_mode=TraceMode.ring, trace_capacity=4, trace_x_path=x_path)
+    results = run_optimization(Method.LBFGSW, problem, options)
+
+    trajectory = results.trace.x_trajectory()
+    assert trajectory.shape == (results.trace.total_steps, 10)
+    assert torch.equal(trajectory[0], problem.x0)
+    assert torch.equal(trajectory[-1], results.final_x)
+    assert len(results.trace) == 4
+
+
+def test_pickled_trace_keeps_only_recorded_rows():
+    trace = record_steps(OptimizationTrace(TraceMode.full, 8, 1000, torch.zeros(3)), 10)
+    unpickled = pickle.loads(pickle.dumps(trace))
+
+    assert len(pickle.dumps(trace)) < 1000 * 8
+    assert list(unpickled) == list(trace)
+    assert torch.equal(unpickled.iterations, trace.iterations)
@@ -0,0 +1,126 @@
+import pytest
+import torch
+
+from methods.methods import Method, OptimizationOptions, OptimizationTerminationReason
+from methods.newton_cg import steihaug_conjugate_gradient, truncate_steihaug_path
+from methods.optimization_loop_simple import HessianModificationState
+from methods.run_optimization import run_optimization
+from methods.trust_region import DoglegTrustRegionModel, SR1TrustRegionModel
+from problems.registry import ProblemFamily, build_problem
+
+
+def random_symmetric(n: int, shift: float) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(n)
+    a = torch.randn(n, n, generator=generator, dtype=torch.double)
+    return a @ a.t() / n + shift * torch.eye(n, dtype=torch.double)
+
+
+def model_reduction(b: torch.Tensor, gradient: torch.Tensor, p: torch.Tensor) -> float:
+    return -(torch.dot(gradient, p) + 0.5 * torch.dot(p, b @ p)).item()
+
+
+def test_steihaug_conjugate_gradient():
+    n = 20
+    b = random_symmetric(n, 1)
+    gradient = torch.linspace(-1, 1, n, dtype=torch.double)
+
+    # a large region: the newton step.
+    p, reduction, on_boundary = steihaug_conjugate_gradient(lambda v: b @ v, gradient, 1e6, 1e-12, n)
+    assert not on_boundary
+    assert torch.allclose(b @ p, -gradient)
+    assert reduction == pytest.approx(model_reduction(b, gradient, p), rel=1e-10)
+
+    # the newton step is outside: a boundary step that still reduces the model.
+    radius = 0.1 * torch.linalg.norm(p).item()
+    p, reduction, on_boundary = steihaug_conjugate_gradient(lambda v: b @ v, gradient, radius, 1e-12, n)
+    assert on_boundary
+    assert torch.linalg.norm(p).item() == pytest.approx(radius, rel=1e-10)
+    assert reduction == pytest.approx(model_reduction(b, gradient, p), rel=1e-10)
+    assert reduction > 0
+
+    # negative curvature: to the boundary.
+    indefinite = random_symmetric(n, -2)
+    p, reduction, on_boundary = steihaug_conjugate_gradient(lambda v: indefinite @ v, gradient, 5.0, 1e-12, n)
+    assert on_boundary
+    assert torch.linalg.norm(p).item() == pytest.approx(5.0, rel=1e-10)
+    assert reduction == pytest.approx(model_reduction(indefinite, gradient, p), rel=1e-10)
+    assert reduction > 0
+
+    # a smaller radius, from the path of the solve above.
+    path = []
+    result = steihaug_conjugate_gradient(lambda v: indefinite @ v, gradient, 5.0, 1e-12, n, path=path)
+    for radius in [5.0, 1.0, 0.01]:
+        truncated, truncated_reduction, truncated_on_boundary = truncate_steihaug_path(path, *result[:2], radius)
+        p, reduction, on_boundary = steihaug_conjugate_gradient(lambda v: indefinite @ v, gradient, radius, 1e-12, n)
+        assert torch.allclose(truncated, p)
+        assert truncated_reduction == pytest.approx(reduction, rel=1e-10)
+        assert truncated_on_boundary == on_boundary
+
+
+@pytest.mark.parametrize("radius", [1e-3, 0.05, 1e6])
+def test_dogleg_step(radius: float):
+    problem = build_problem(ProblemFamily.Rosenbrock, 10)
+    x = problem.x0
+    gradient = problem.objective_gradient_function(x)
+    hessian = problem.objective_hessian_function(x)
+
+    p, reduction, on_boundary = DoglegTrustRegionModel(HessianModificationState()).step(OptimizationOptions(), x,
+                                                                                        gradient, radius, problem)
+    assert torch.linalg.norm(p).item() <= radius * (1 + 1e-10)
+    assert on_boundary == (radius < 1e6)
+    assert reduction == pytest.approx(model_reduction(hessian, gradient, p), rel=1e-10)
+    assert reduction > 0
+    # at least the reduction of the cauchy point.
+    cauchy_length = min(radius / torch.linalg.norm(gradient).item(),
+                        torch.dot(gradient, gradient).item() / torch.dot(gradient, hessian @ gradient).item())
+    assert reduction >= model_reduction(hessian, gradient, -cauchy_length * gradient) * (1 - 1e-10)
+
+
+def test_sr1_update_satisfies_secant_equation():
+    n = 8
+    model = SR1TrustRegionModel(n, torch.double)
+    b = random_symmetric(n, 1)
+    for k in range(3):
+        sk = torch.randn(n, generator=torch.Generator().manual_seed(k), dtype=torch.double)
+        model.update(OptimizationOptions(), sk, b @ sk)
+        assert torch.allclose(model.bk @ sk, b @ sk)
+        assert torch.allclose(model.bk, model.bk.t())
+
+    # s^T (y - B s) = 0: skipped.
+    previous = model.bk.clone()
+    residual = torch.ones(n, dtype=torch.double)
+    residual -= torch.dot(residual, sk) / torch.dot(sk, sk) * sk
+    model.update(OptimizationOptions(), sk, model.bk @ sk + residual)
+    assert torch.equal(model.bk, previous)
+
+
+@pytest.mark.parametrize("method", [Method.TrustRegionNewtonCG, Method.TrustRegionDogleg, Method.TrustRegionSR1])
+@pytest.mark.parametrize("family, n", [(ProblemFamily.Genhumps, 5), (ProblemFamily.Rosenbrock, 2)])
+def test_trust_region_methods_converge(method: Method, family: ProblemFamily, n: int):
+    problem = build_problem(family, n)
+    steps = []
+    options = OptimizationOptions(collect_statistics=True, step_callback=lambda k, step: steps.append(step))
+    results = run_optimization(method, problem, options)
+    assert results.termination_reason == OptimizationTerminationReason.reached_stationary_point
+
+    # a rejected step leaves f unchanged, and f decreases on every accepted one.
+    statistics = results.statistics
+    rejected = [step for step in steps[1:] if step.step_length == 0]
+    assert len(rejected) == statistics.trust_region_rejected_steps
+    assert statistics.trust_region_contractions >= statistics.trust_region_rejected_steps
+    for before, after in zip(steps, steps[1:]):
+        assert after.after_function_value <= before.after_function_value
+
+    # a rejected step reuses the hessian, or the CG path, of its iterate.
+    accepted = len(steps) - 1 - len(rejected)
+    if method == Method.TrustRegionDogleg:
+        assert statistics.hessian_evaluations == accepted
+    if method == Method.TrustRegionNewtonCG:
+        assert statistics.cg_iterations == statistics.hessian_vector_products
+
+
+def test_dogleg_uses_the_banded_factorization():
+    # O(n) solves of the tridiagonal hessian.
+    problem = build_problem(ProblemFamily.Rosenbrock, 2000)
+    results = run_optimization(Method.TrustRegionDogleg, problem, OptimizationOptions())
+    assert results.termination_reason == OptimizationTerminationReason.reached_stationary_point
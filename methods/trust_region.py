@@ -0,0 +1,228 @@
+import math
+from typing import Callable, Optional
+
+import torch
+
+from methods.checkpoint import checkpoint_if_due, start_iterate
+from methods.instrumentation import active_recorder
+from methods.methods import OptimizationOptions, OptimizationResults, OptimizationStep, OptimizationTerminationReason, \
+    OptimizationPhase, Method, SolverState, start_trace
+from methods.newton_cg import steihaug_conjugate_gradient, boundary_step_length, truncate_steihaug_path, \
+    SteihaugSegment
+from methods.optimization_loop_simple import HessianModificationState, modified_newton_step
+from problems.precision import accumulated_dot, accumulated_norm
+from problems.problems import Problem
+
+
+# xk, gradient, radius, Problem -> step, the model's predicted reduction and whether the step is on the boundary.
+type TrustRegionStepFunctionType = Callable[[OptimizationOptions, torch.Tensor, torch.Tensor, float, Problem],
+                                            tuple[torch.Tensor, float, bool]]
+
+
+class SteihaugTrustRegionModel:
+    # matrix-free, like calc_newton_cg_search_direction, and with its forcing term. the CG path is kept until xk
+    # changes: after a rejected step the radius is smaller and the step is read off the path, without a new solve.
+    def __init__(self):
+        self._xk: Optional[torch.Tensor] = None
+        self._radius = 0.0
+        self._result: Optional[tuple[torch.Tensor, float, bool]] = None
+        self._path: list[SteihaugSegment] = []
+
+    def step(self, options: OptimizationOptions, xk: torch.Tensor, gradk: torch.Tensor, radius: float,
+             problem: Problem) -> tuple[torch.Tensor, float, bool]:
+        accumulation = options.accumulation_dtype
+        # a solve that ended inside its region is also the solve for any larger radius.
+        if xk is self._xk and (radius <= self._radius or not self._result[2]):
+            return truncate_steihaug_path(self._path, self._result[0], self._result[1], radius, accumulation)
+
+        tolerance = options.newton_cg_eta_tolerance * accumulated_norm(gradk, accumulation)
+        self._path = []
+        self._result = steihaug_conjugate_gradient(lambda v: problem.hessian_vector_product(xk, v), gradk, radius,
+                                                   tolerance, options.newton_cg_seaerch_direction_max_iterations,
+                                                   accumulation, self._path)
+        self._xk = xk
+        self._radius = radius
+        return self._result
+
+
+class DoglegTrustRegionModel:
+    # the model is the hessian, and the end of the dogleg path is the modified newton step, which minimizes the
+    # hessian shifted to be positive definite. the hessian and both ends of the path are kept until xk changes, so a
+    # rejected step costs no hessian evaluation or factorization.
+    def __init__(self, hessian_modification: HessianModificationState):
+        self.hessian_modification = hessian_modification
+        self._xk: Optional[torch.Tensor] = None
+
+    def _factor(self, options: OptimizationOptions, xk: torch.Tensor, gradk: torch.Tensor, problem: Problem):
+        accumulation = options.accumulation_dtype
+        self._hessk = problem.hessian_operator(xk)
+        self._newton_step = modified_newton_step(self.hessian_modification, self._hessk, gradk, accumulation)
+        self._newton_norm = accumulated_norm(self._newton_step, accumulation)
+        self._shifted = self.hessian_modification.tau > 0
+        if self._shifted:
+            # the shifted step is shorter than the minimizer of the model along it, which is unbounded on
+            # nonpositive curvature.
+            newton_curvature = accumulated_dot(self._newton_step, self._hessk.matvec(self._newton_step), accumulation)
+            self._newton_length = -accumulated_dot(gradk, self._newton_step, accumulation) / newton_curvature \
+                if newton_curvature > 0 else math.inf
+        self._gradk_norm = accumulated_norm(gradk, accumulation)
+        gradk_curvature = accumulated_dot(gradk, self._hessk.matvec(gradk), accumulation)
+        # minimizer of the model along -gradk, unbounded on nonpositive curvature.
+        self._cauchy_length = self._gradk_norm * self._gradk_norm / gradk_curvature if gradk_curvature > 0 \
+            else math.inf
+        self._xk = xk
+
+    def step(self, options: OptimizationOptions, xk: torch.Tensor, gradk: torch.Tensor, radius: float,
+             problem: Problem) -> tuple[torch.Tensor, float, bool]:
+        accumulation = options.accumulation_dtype
+        if xk is not self._xk:
+            self._factor(options, xk, gradk, problem)
+
+        newton_step = self._newton_step
+        newton_norm = self._newton_norm
+        newton_on_boundary = False
+        if self._shifted:
+            # go to the model's minimizer along the shifted step, or the boundary.
+            newton_on_boundary = self._newton_length * newton_norm >= radius
+            newton_length = radius / newton_norm if newton_on_boundary else self._newton_length
+            newton_step = newton_length * newton_step
+            newton_norm = newton_length * newton_norm
+
+        on_boundary = True
+        if newton_on_boundary or newton_norm <= radius:
+            stepk = newton_step
+            on_boundary = newton_on_boundary
+        elif self._cauchy_length * self._gradk_norm >= radius:
+            stepk = -(radius / self._gradk_norm) * gradk
+        else:
+            cauchy_step = -self._cauchy_length * gradk
+            dogleg = newton_step - cauchy_step
+            stepk = cauchy_step + boundary_step_length(cauchy_step, dogleg, radius, accumulation) * dogleg
+
+        predicted_reduction = -(accumulated_dot(gradk, stepk, accumulation) +
+                                0.5 * accumulated_dot(stepk, self._hessk.matvec(stepk), accumulation))
+        return stepk, predicted_reduction, on_boundary
+
+
+class SR1TrustRegionModel:
+    # dense SR1 approximation of the hessian itself, not its inverse. it may be indefinite, so the subproblem is
+    # solved with steihaug CG. the update uses every trial step, also the rejected ones.
+    def __init__(self, n: int, dtype: torch.dtype, bk: Optional[torch.Tensor] = None):
+        # bk is copied, so that the run doesn't modify the state it started from.
+        self.bk = bk.clone() if bk is not None else torch.eye(n, dtype=dtype)
+
+    def step(self, options: OptimizationOptions, _xk: torch.Tensor, gradk: torch.Tensor, radius: float,
+             _problem: Problem) -> tuple[torch.Tensor, float, bool]:
+        accumulation = options.accumulation_dtype
+        tolerance = options.newton_cg_eta_tolerance * accumulated_norm(gradk, accumulation)
+        return steihaug_conjugate_gradient(lambda v: torch.mv(self.bk, v), gradk, radius, tolerance,
+                                           gradk.shape[0], accumulation)
+
+    def update(self, options: OptimizationOptions, sk: torch.Tensor, yk: torch.Tensor):
+        accumulation = options.accumulation_dtype
+        residual = yk - torch.mv(self.bk, sk)
+        denominator = accumulated_dot(sk, residual, accumulation)
+        if math.fabs(denominator) < options.sr1_update_r * accumulated_norm(sk, accumulation) * \
+                accumulated_norm(residual, accumulation):
+            return
+        self.bk.addr_(residual, residual, alpha=1 / denominator)
+
+
+def run_trust_region_optimization_loop(method: Method, calc_step: TrustRegionStepFunctionType, problem: Problem,
+                                       options: OptimizationOptions,
+                                       sr1_model: Optional[SR1TrustRegionModel] = None,
+                                       hessian_modification: Optional[HessianModificationState] = None,
+                                       initial_state: Optional[SolverState] = None) -> OptimizationResults:
+    # every trial step is an iteration. a rejected one is traced with step length 0 and the unchanged f and gradient
+    # norm, an accepted one with ||p||. sr1_model is updated after every trial step, and hessian_modification is the
+    # state bound to calc_step, if any, so that its tau is checkpointed.
+    k0, xk, fk, gradk, _ = start_iterate(problem, initial_state)
+    gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
+    radius = options.trust_region_initial_radius
+    if initial_state is not None and initial_state.trust_region_radius is not None:
+        radius = initial_state.trust_region_radius
+
+    def state() -> SolverState:
+        return SolverState(method, i, xk, fk, gradk,
+                           quasi_newton_matrix=sr1_model.bk if sr1_model is not None else None,
+                           hessian_modification_tau=hessian_modification.tau if hessian_modification is not None
+                           else 0.0,
+                           trust_region_radius=radius)
+
+    trace = start_trace(options, xk)
+    step = OptimizationStep(0, fk, gradk_norm)
+    trace.record(k0, step, xk)
+    options.step_callback(k0, step)
+
+    recorder = active_recorder()
+
+    i = k0
+    for i in range(k0 + 1, options.max_iterations + 1):
+        if recorder is not None:
+            recorder.enter_phase(OptimizationPhase.search_direction)
+        stepk, predicted_reduction, on_boundary = calc_step(options, xk, gradk, radius, problem)
+        if recorder is not None:
+            recorder.enter_phase(None)
+
+        trial_x = xk + stepk
+        # the gradient at a rejected point is only needed by quasi-newton updates.
+        if sr1_model is not None:
+            trial_f, trial_gradient = problem.value_and_gradient(trial_x)
+            if recorder is not None:
+                recorder.enter_phase(OptimizationPhase.quasi_newton_update)
+            sr1_model.update(options, stepk, trial_gradient - gradk)
+            if recorder is not None:
+                recorder.enter_phase(None)
+        else:
+            trial_f = problem.objective_function(trial_x)
+            trial_gradient = None
+
+        # nan on overflow, which fails both tests below.
+        rho = (fk - trial_f) / predicted_reduction if predicted_reduction > 0 else -math.inf
+        if not rho >= 0.25:
+            radius = 0.25 * radius
+            if recorder is not None:
+                recorder.trust_region_contractions += 1
+        elif rho > 0.75 and on_boundary and radius < options.trust_region_max_radius:
+            radius = min(2 * radius, options.trust_region_max_radius)
+            if recorder is not None:
+                recorder.trust_region_expansions += 1
+
+        if not rho > options.trust_region_eta:
+            if recorder is not None:
+                recorder.trust_region_rejected_steps += 1
+            step = OptimizationStep(0, fk, gradk_norm)
+            trace.record(i, step, xk)
+            options.step_callback(i, step)
+            # steps this short no longer change x.
+            if radius <= torch.finfo(xk.dtype).eps * max(1.0, accumulated_norm(xk, options.accumulation_dtype)):
+                return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                           OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing,
+                                           final_state=state())
+            checkpoint_if_due(options, i, state)
+            continue
+
+        fkm1 = fk
+        gradkm1_norm = gradk_norm
+
+        xk = trial_x
+        fk = trial_f
+        gradk = trial_gradient if trial_gradient is not None else problem.objective_gradient_function(xk)
+        gradk_norm = accumulated_norm(gradk, options.accumulation_dtype)
+
+        step = OptimizationStep(accumulated_norm(stepk, options.accumulation_dtype), fk, gradk_norm)
+        trace.record(i, step, xk)
+        options.step_callback(i, step)
+
+        if math.fabs(fkm1 - fk) < options.no_decrease_tolerance and \
+                math.fabs(gradkm1_norm - gradk_norm) < options.no_decrease_tolerance:
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.function_and_gradient_norm_stopped_decreasing,
+                                       final_state=state())
+        if gradk_norm < options.stationary_point_gradient_norm_tolerance:
+            return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                                       OptimizationTerminationReason.reached_stationary_point, final_state=state())
+        checkpoint_if_due(options, i, state)
+
+    return OptimizationResults(trace.finalize(), xk, fk, gradk_norm,
+                               OptimizationTerminationReason.reached_iteration_limit, final_state=state())
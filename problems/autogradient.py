@@ -1,6 +1,11 @@
 from typing import Callable
 
 import torch
+import torch.func
+
+# objective built from torch operations only, so it can be differentiated. leading dimensions of x are batch
+# dimensions: (..., n) -> (...).
+type TensorFunctionType = Callable[[torch.Tensor], torch.Tensor]
 
 
 def _partial_derivative(f: Callable[[torch.Tensor], float], x0: torch.Tensor, i: int) -> float:
@@ -22,9 +27,95 @@ def _partial_derivative_2(f: Callable[[torch.Tensor], float], x0: torch.Tensor,
 
 def gradient(f: Callable[[torch.Tensor], float], x0: torch.Tensor) -> torch.Tensor:
     grad = [_partial_derivative(f, x0, i) for i in range(x0.shape[0])]
-    return torch.tensor(grad, dtype=torch.double)
+    return torch.tensor(grad, dtype=x0.dtype)
 
 
 def hessian(f: Callable[[torch.Tensor], float], x0: torch.Tensor) -> torch.Tensor:
     hess = [[_partial_derivative_2(f, x0, i, j) for j in range(x0.shape[0])] for i in range(x0.shape[0])]
-    return torch.tensor(hess, dtype=torch.double)
+    return torch.tensor(hess, dtype=x0.dtype)
+
+
+def gradient_difference_hessian_vector_product(gradient_function: Callable[[torch.Tensor], torch.Tensor],
+                                               x0: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    # central difference of the gradient along v: two gradient calls and no n x n matrix.
+    v_norm = torch.linalg.norm(v, 2).item()
+    if v_norm == 0:
+        return torch.zeros_like(v)
+
+    # a unit-length step of eps^(1/3) balances truncation and rounding error. it is not scaled by |x0| because
+    # the curvature scale of oscillating objectives like genhumps does not grow with |x0|.
+    epsilon = torch.finfo(x0.dtype).eps ** (1 / 3) / v_norm
+    return (gradient_function(x0 + epsilon * v) - gradient_function(x0 - epsilon * v)) / (2 * epsilon)
+
+
+# plain torch.autograd rather than torch.func for the gradient and hessian-vector products: it has much less
+# per-call overhead, and torch.func cannot trace through sparse matrices.
+def autograd_gradient(f: TensorFunctionType, x0: torch.Tensor) -> torch.Tensor:
+    return autograd_value_and_gradient(f, x0)[1]
+
+
+def autograd_value_and_gradient(f: TensorFunctionType, x0: torch.Tensor) -> tuple[float, torch.Tensor]:
+    x = x0.detach().requires_grad_(True)
+    with torch.enable_grad():
+        value = f(x)
+        grad, = torch.autograd.grad(value, x)
+    return value.item(), grad
+
+
+def autograd_hessian(f: TensorFunctionType, x0: torch.Tensor) -> torch.Tensor:
+    return torch.func.hessian(f)(x0)
+
+
+def autograd_hessian_vector_product(f: TensorFunctionType, x0: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    # double backward: the gradient of grad(f)^T v. no n x n matrix.
+    x = x0.detach().requires_grad_(True)
+    with torch.enable_grad():
+        grad, = torch.autograd.grad(f(x), x, create_graph=True)
+        if not grad.requires_grad:
+            # f is linear.
+            return torch.zeros_like(v)
+        hessian_v, = torch.autograd.grad(torch.dot(grad, v), x)
+    return hessian_v
+
+
+# the largest batch of perturbed points central_difference_hessian passes to f, in tensor entries: 8 MiB in float64.
+# f makes several temporaries of the batch size, so its peak memory is a few times that.
+CENTRAL_DIFFERENCE_CHUNK_ELEMENTS = 2 ** 20
+
+
+def _central_difference_steps(x0: torch.Tensor, order: int) -> torch.Tensor:
+    # eps^(1/3) balances truncation and rounding error for first derivatives, eps^(1/4) for second derivatives.
+    # not scaled by |x0|, as in gradient_difference_hessian_vector_product.
+    return torch.full_like(x0, torch.finfo(x0.dtype).eps ** (1 / (order + 2)))
+
+
+def central_difference_gradient(f: TensorFunctionType, x0: torch.Tensor) -> torch.Tensor:
+    # all 2n perturbed points are evaluated in one batched call.
+    n = x0.shape[0]
+    steps = _central_difference_steps(x0, 1)
+    perturbations = torch.diag(steps)
+    points = torch.cat([x0 + perturbations, x0 - perturbations])
+
+    values = f(points)
+    return (values[:n] - values[n:]) / (2 * steps)
+
+
+def central_difference_hessian(f: TensorFunctionType, x0: torch.Tensor) -> torch.Tensor:
+    # h_ij = (f(x + e_i + e_j) - f(x + e_i - e_j) - f(x - e_i + e_j) + f(x - e_i - e_j)) / (4 h_i h_j). the 4 n^2
+    # perturbed points are evaluated in batched calls over blocks of rows i, of at most
+    # CENTRAL_DIFFERENCE_CHUNK_ELEMENTS point entries when n allows, so memory is O(block n^2) and not O(n^3).
+    n = x0.shape[0]
+    steps = _central_difference_steps(x0, 2)
+    perturbations = torch.diag(steps)
+    plus_j = perturbations.unsqueeze(0)
+    block = max(1, CENTRAL_DIFFERENCE_CHUNK_ELEMENTS // (4 * n * n))
+
+    hess = torch.empty(n, n, dtype=x0.dtype)
+    for start in range(0, n, block):
+        plus_i = perturbations[start:start + block].unsqueeze(1)
+        points = torch.stack([x0 + plus_i + plus_j, x0 + plus_i - plus_j, x0 - plus_i + plus_j,
+                              x0 - plus_i - plus_j])
+        values = f(points)
+        hess[start:start + block] = (values[0] - values[1] - values[2] + values[3]) / \
+            (4 * torch.outer(steps[start:start + block], steps))
+    return (hess + hess.T) / 2
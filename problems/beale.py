@@ -8,6 +8,13 @@ def beale_function(x: torch.Tensor) -> float:
     return (1.5 - x1 + x1 * x2)**2 + (2.25 - x1 + x1 * (x2**2))**2 + (2.625 - x1 + x1 * (x2**3))**2
 
 
+def beale_tensor_function(x: torch.Tensor) -> torch.Tensor:
+    x1 = x[..., 0]
+    x2 = x[..., 1]
+
+    return (1.5 - x1 + x1 * x2)**2 + (2.25 - x1 + x1 * (x2**2))**2 + (2.625 - x1 + x1 * (x2**3))**2
+
+
 def beale_gradient(x: torch.Tensor) -> torch.Tensor:
     x1 = x[0].item()
     x2 = x[1].item()
@@ -23,7 +30,7 @@ def beale_gradient(x: torch.Tensor) -> torch.Tensor:
     #     9 * x1 * x2 * (0.44444444444 * x1 * (x2**2) - 0.44444444444 * x1 + 1) + \
     #     3 * x1 * (2./3. * x1 * x2 - 2./3 * x1 + 1)
 
-    return torch.tensor([g1, g2], dtype=torch.double)
+    return torch.tensor([g1, g2], dtype=x.dtype)
 
 
 def beale_hessian(x: torch.Tensor) -> torch.Tensor:
@@ -37,4 +44,8 @@ def beale_hessian(x: torch.Tensor) -> torch.Tensor:
         15.75 * x2**2 + 9 * x2 + 3
     h22 = x1 * (30 * x1 * x2**4 + 12 * x1 * x2**2 - 12 * x1 * x2 - 2 * x1 + 31.5 * x2 + 9)
 
-    return torch.tensor([[h11, h12], [h21, h22]], dtype=torch.double)
+    return torch.tensor([[h11, h12], [h21, h22]], dtype=x.dtype)
+
+
+def beale_value_and_gradient(x: torch.Tensor) -> tuple[float, torch.Tensor]:
+    return beale_function(x), beale_gradient(x)
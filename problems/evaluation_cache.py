@@ -0,0 +1,125 @@
+import collections
+from typing import NamedTuple, Optional
+
+import torch
+
+from problems.hessian_operators import HessianOperator
+from problems.problems import Problem
+
+
+class EvaluationCacheStatistics(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+
+
+class _CacheEntry:
+    __slots__ = ("function_value", "gradient", "hessian", "hessian_operator")
+
+    def __init__(self):
+        self.function_value: Optional[float] = None
+        self.gradient: Optional[torch.Tensor] = None
+        self.hessian: Optional[torch.Tensor] = None
+        self.hessian_operator: Optional[HessianOperator] = None
+
+
+def _point_key(x: torch.Tensor) -> tuple:
+    # exact match on the tensor contents. the dtype and shape are part of the key so that equal bytes of
+    # differently typed tensors never collide.
+    x = x.detach().contiguous().cpu()
+    return x.dtype, tuple(x.shape), x.numpy().tobytes()
+
+
+# least recently used cache of f, gradient, hessian and structured hessian values keyed by the exact evaluation point.
+# use `problem` to get a Problem whose oracles go through this cache. cached tensors are returned as is,
+# so callers must not modify them in place.
+class EvaluationCache:
+    def __init__(self, problem: Problem, max_entries: int = 16):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+
+        self._wrapped_problem = problem
+        self._max_entries = max_entries
+        self._entries: collections.OrderedDict[tuple, _CacheEntry] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def problem(self) -> Problem:
+        return self._wrapped_problem._replace(
+            objective_function=self.objective_function,
+            objective_gradient_function=self.objective_gradient_function,
+            objective_hessian_function=self.objective_hessian_function,
+            value_and_gradient_function=self.value_and_gradient,
+            # without a structured hessian, Problem.hessian_operator wraps the cached objective_hessian_function.
+            hessian_operator_function=self.hessian_operator_function
+            if self._wrapped_problem.hessian_operator_function is not None else None)
+
+    def statistics(self) -> EvaluationCacheStatistics:
+        return EvaluationCacheStatistics(self.hits, self.misses, self.evictions)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _entry(self, x: torch.Tensor) -> _CacheEntry:
+        key = _point_key(x)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        entry = _CacheEntry()
+        self._entries[key] = entry
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def objective_function(self, x: torch.Tensor) -> float:
+        entry = self._entry(x)
+        self._record(entry.function_value is not None)
+        if entry.function_value is None:
+            entry.function_value = self._wrapped_problem.objective_function(x)
+        return entry.function_value
+
+    def objective_gradient_function(self, x: torch.Tensor) -> torch.Tensor:
+        entry = self._entry(x)
+        self._record(entry.gradient is not None)
+        if entry.gradient is None:
+            entry.gradient = self._wrapped_problem.objective_gradient_function(x)
+        return entry.gradient
+
+    def objective_hessian_function(self, x: torch.Tensor) -> torch.Tensor:
+        entry = self._entry(x)
+        self._record(entry.hessian is not None)
+        if entry.hessian is None:
+            entry.hessian = self._wrapped_problem.objective_hessian_function(x)
+        return entry.hessian
+
+    def hessian_operator_function(self, x: torch.Tensor) -> HessianOperator:
+        entry = self._entry(x)
+        self._record(entry.hessian_operator is not None)
+        if entry.hessian_operator is None:
+            entry.hessian_operator = self._wrapped_problem.hessian_operator_function(x)
+        return entry.hessian_operator
+
+    def value_and_gradient(self, x: torch.Tensor) -> tuple[float, torch.Tensor]:
+        entry = self._entry(x)
+        self._record(entry.function_value is not None and entry.gradient is not None)
+        if entry.function_value is None:
+            entry.function_value, entry.gradient = self._wrapped_problem.value_and_gradient(x)
+        elif entry.gradient is None:
+            entry.gradient = self._wrapped_problem.objective_gradient_function(x)
+        return entry.function_value, entry.gradient
+
+
+def cached_problem(problem: Problem, max_entries: int = 16) -> tuple[Problem, EvaluationCache]:
+    cache = EvaluationCache(problem, max_entries)
+    return cache.problem, cache
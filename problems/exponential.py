@@ -1,6 +1,11 @@
 import math
+from typing import Optional
+
 import torch
 
+from problems.hessian_operators import DiagonalHessian
+from problems.precision import accumulated_sum
+
 
 def exponential_function(x: torch.Tensor) -> float:
     x1 = x[0]
@@ -14,6 +19,14 @@ def exponential_function(x: torch.Tensor) -> float:
     return sum
 
 
+def exponential_tensor_function(x: torch.Tensor) -> torch.Tensor:
+    x1 = x[..., 0]
+    exp_x1 = torch.exp(x1)
+
+    # same coordinates as exponential_function: x_2 .. x_{n-1}.
+    return (exp_x1 - 1) / (exp_x1 + 1) + 0.1 * torch.exp(-1 * x1) + torch.sum((x[..., 1:-1] - 1)**4, -1)
+
+
 def exponential_gradient(x: torch.Tensor) -> torch.Tensor:
     x1 = x[0]
     first_num = (1.9 * math.exp(2*x1) - 0.2 * math.exp(x1) - 0.1) * math.exp(-1 * x1)
@@ -26,20 +39,49 @@ def exponential_gradient(x: torch.Tensor) -> torch.Tensor:
         xi = x[i-1].item()
         grad[i-1] = 4 * (xi - 1)**3
 
-    return torch.tensor(grad, dtype=torch.double)
+    return torch.tensor(grad, dtype=x.dtype)
 
 
-def exponential_hessian(x: torch.Tensor) -> torch.Tensor:
-    n = len(x)
+def exponential_value_and_gradient(x: torch.Tensor,
+                                   accumulation_dtype: Optional[torch.dtype] = None) -> tuple[float, torch.Tensor]:
+    x1 = x[0]
+    exp_x1 = math.exp(x1)
+    exp_minus_x1 = math.exp(-1 * x1)
+
+    f = (exp_x1 - 1) / (exp_x1 + 1) + 0.1 * exp_minus_x1
+    first_num = (1.9 * exp_x1**2 - 0.2 * exp_x1 - 0.1) * exp_minus_x1
+    first_denom = exp_x1**2 + 2 * exp_x1 + 1.0
+
+    # same coordinates as exponential_function: x_2 .. x_{n-1}.
+    tail = x[1:-1] - 1
+    f += accumulated_sum(tail**4, accumulation_dtype)
+
+    grad = torch.zeros_like(x)
+    grad[0] = first_num / first_denom
+    grad[1:-1] = 4 * tail**3
+
+    return f, grad
+
+
+def exponential_hessian_diagonal(x: torch.Tensor) -> torch.Tensor:
+    # the hessian is diagonal. the last coordinate doesn't appear in f, so its entry is 0.
     x1 = x[0]
     first_num = (-1.9 * math.exp(3*x1) + 2.3 * math.exp(2*x1) + 0.3 * math.exp(x1) + 0.1) * math.exp(-1*x1)
     first_denom = math.exp(3*x1) + 3 * math.exp(2*x1) + 3 * math.exp(x1) + 1
 
-    hess = [[0 for _ in range(n)] for _ in range(n)]
-    hess[0][0] = first_num / first_denom
+    diagonal = torch.zeros_like(x)
+    diagonal[0] = first_num / first_denom
+    diagonal[1:-1] = 12 * (x[1:-1] - 1)**2
+    return diagonal
+
+
+def exponential_hessian(x: torch.Tensor) -> torch.Tensor:
+    return torch.diag(exponential_hessian_diagonal(x))
+
+
+def exponential_hessian_operator(x: torch.Tensor) -> DiagonalHessian:
+    return DiagonalHessian(exponential_hessian_diagonal(x))
 
-    for i in range(2, n):
-        xi = x[i-1].item()
-        hess[i-1][i-1] = 12 * (xi - 1)**2
 
-    return torch.tensor(hess, dtype=torch.double)
+def exponential_hessian_vector_product(x: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    return exponential_hessian_diagonal(x) * v
@@ -1,63 +1,95 @@
-import math
+from typing import Optional
+
 import torch
 
+from problems.hessian_operators import BandedHessian
+from problems.precision import accumulated_sum
+from problems.tridiagonal import tridiagonal_dense, tridiagonal_sparse_csr, tridiagonal_matvec
+
+
+# the chained genhumps function of any dimension n >= 2:
+# f(x) = sum_{i=1}^{n-1} sin(2 x_i)^2 sin(2 x_{i+1})^2 + 0.05 (x_i^2 + x_{i+1}^2).
+# every oracle computes sin(2x) and cos(2x) once, as whole-tensor operations, and shares them between its terms.
+
+def _sin_cos(x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    return torch.sin(2*x), torch.cos(2*x)
+
+
+def _neighbor_sum(a: torch.Tensor) -> torch.Tensor:
+    # a_{i-1} + a_{i+1}, with the missing neighbors of the end coordinates taken as 0.
+    total = torch.zeros_like(a)
+    total[1:] += a[:-1]
+    total[:-1] += a[1:]
+    return total
+
+
+def _quadratic_weight(x: torch.Tensor) -> torch.Tensor:
+    # 0.1 times the number of terms that x_i appears in: 1 at the ends, 2 inside.
+    weight = torch.full_like(x, 0.2)
+    weight[0] = 0.1
+    weight[-1] = 0.1
+    return weight
+
+
+def genhumps_function(x: torch.Tensor, accumulation_dtype: Optional[torch.dtype] = None) -> float:
+    sin_squared = torch.sin(2*x)**2
+    xi = x[:-1]
+    xip1 = x[1:]
+
+    return accumulated_sum(sin_squared[:-1] * sin_squared[1:] + 0.05 * (xi**2 + xip1**2), accumulation_dtype)
+
 
-def genhumps_function(x: torch.Tensor) -> float:
-    sum = 0
-    for i in range(1, len(x)):
-        xi = x[i-1].item()
-        xip1 = x[i].item()
+def genhumps_tensor_function(x: torch.Tensor) -> torch.Tensor:
+    xi = x[..., :-1]
+    xip1 = x[..., 1:]
 
-        sinxi = math.sin(2*xi)
-        sinxip1 = math.sin(2*xip1)
-        sum += (sinxi**2)*(sinxip1**2)
-        sum += 0.05 * ((xi**2) + (xip1**2))
+    return torch.sum(torch.sin(2*xi)**2 * torch.sin(2*xip1)**2 + 0.05 * (xi**2 + xip1**2), -1)
 
-    return sum
+
+def _gradient(x: torch.Tensor, sin_2x: torch.Tensor, cos_2x: torch.Tensor, sin_squared: torch.Tensor) -> torch.Tensor:
+    # d/dx_i sin(2 x_i)^2 = 4 sin(2 x_i) cos(2 x_i), times the neighbors' sin^2.
+    return 4 * sin_2x * cos_2x * _neighbor_sum(sin_squared) + _quadratic_weight(x) * x
 
 
 def genhumps_gradient(x: torch.Tensor) -> torch.Tensor:
-    x1 = x[0].item()
-    x2 = x[1].item()
-    x3 = x[2].item()
-    x4 = x[3].item()
-    x5 = x[4].item()
+    sin_2x, cos_2x = _sin_cos(x)
+    return _gradient(x, sin_2x, cos_2x, sin_2x**2)
+
+
+def genhumps_value_and_gradient(x: torch.Tensor,
+                                accumulation_dtype: Optional[torch.dtype] = None) -> tuple[float, torch.Tensor]:
+    sin_2x, cos_2x = _sin_cos(x)
+    sin_squared = sin_2x**2
+    xi = x[:-1]
+    xip1 = x[1:]
 
-    grad = [
-        0.1 * x1 + 4 * math.sin(2*x1) * ((math.sin(2*x2))**2) * math.cos(2*x1),
-        0.2 * x2 + 4 * ((math.sin(2*x1))**2) * math.sin(2*x2) * math.cos(2*x2) + 4 * math.sin(2*x2) * ((math.sin(2*x3))**2) * math.cos(2*x2),
-        0.2 * x3 + 4 * ((math.sin(2*x2))**2) * math.sin(2*x3) * math.cos(2*x3) + 4 * math.sin(2*x3) * ((math.sin(2*x4))**2) * math.cos(2*x3),
-        0.2 * x4 + 4 * ((math.sin(2*x3))**2) * math.sin(2*x4) * math.cos(2*x4) + 4 * math.sin(2*x4) * ((math.sin(2*x5))**2) * math.cos(2*x4),
-        0.1 * x5 + 4 * ((math.sin(2*x4))**2) * math.sin(2*x5) * math.cos(2*x5)
-    ]
+    f = accumulated_sum(sin_squared[:-1] * sin_squared[1:] + 0.05 * (xi**2 + xip1**2), accumulation_dtype)
+    return f, _gradient(x, sin_2x, cos_2x, sin_squared)
 
-    return torch.tensor(grad, dtype=torch.double)
+
+def genhumps_hessian_tridiagonal(x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    # the diagonal and off-diagonal of the tridiagonal hessian: O(n) memory at any n.
+    sin_2x, cos_2x = _sin_cos(x)
+    sin_squared = sin_2x**2
+    sin_cos = sin_2x * cos_2x
+
+    diagonal = 8 * (cos_2x**2 - sin_squared) * _neighbor_sum(sin_squared) + _quadratic_weight(x)
+    off_diagonal = 16 * sin_cos[:-1] * sin_cos[1:]
+    return diagonal, off_diagonal
 
 
 def genhumps_hessian(x: torch.Tensor) -> torch.Tensor:
-    x1 = x[0].item()
-    x2 = x[1].item()
-    x3 = x[2].item()
-    x4 = x[3].item()
-    x5 = x[4].item()
-
-    hess = [[0 for _ in range(5)] for _ in range(5)]
-    hess[0][0] = -8 * ((math.sin(2*x1))**2) * ((math.sin(2*x2))**2) + 8 * ((math.sin(2*x2))**2) * ((math.cos(2*x1))**2) + 0.1
-    hess[1][1] = -8 * ((math.sin(2*x1))**2) * ((math.sin(2*x2))**2) + 8 * ((math.sin(2*x1))**2) * ((math.cos(2*x2))**2) \
-            - 8 * ((math.sin(2*x2))**2) * ((math.sin(2*x3))**2) + 8 * ((math.sin(2*x3))**2) * ((math.cos(2*x2))**2) + 0.2
-    hess[2][2] = -8 * ((math.sin(2*x2))**2) * ((math.sin(2*x3))**2) + 8 * ((math.sin(2*x2))**2) * ((math.cos(2*x3))**2) \
-            - 8 * ((math.sin(2*x3))**2) * ((math.sin(2*x4))**2) + 8 * ((math.sin(2*x4))**2) * ((math.cos(2*x3))**2) + 0.2
-    hess[3][3] = -8 * ((math.sin(2*x3))**2) * ((math.sin(2*x4))**2) + 8 * ((math.sin(2*x3))**2) * ((math.cos(2*x4))**2) \
-            - 8 * ((math.sin(2*x4))**2) * ((math.sin(2*x5))**2) + 8 * ((math.sin(2*x5))**2) * ((math.cos(2*x4))**2) + 0.2
-    hess[4][4] = -8 * ((math.sin(2*x4))**2) * ((math.sin(2*x5))**2) + 8 * ((math.sin(2*x4))**2) * ((math.cos(2*x5))**2) + 0.1
-
-    hess[0][1] = 2 * math.cos(4*x1 - 4*x2) - 2 * math.cos(4*x1 + 4*x2)
-    hess[1][2] = 2 * math.cos(4*x2 - 4*x3) - 2 * math.cos(4*x2 + 4*x3)
-    hess[2][3] = 2 * math.cos(4*x3 - 4*x4) - 2 * math.cos(4*x3 + 4*x4)
-    hess[3][4] = 2 * math.cos(4*x4 - 4*x5) - 2 * math.cos(4*x4 + 4*x5)
-    hess[1][0] = hess[0][1]
-    hess[2][1] = hess[1][2]
-    hess[3][2] = hess[2][3]
-    hess[4][3] = hess[3][4]
-
-    return torch.tensor(hess, dtype=torch.double)
+    return tridiagonal_dense(*genhumps_hessian_tridiagonal(x))
+
+
+def genhumps_sparse_hessian(x: torch.Tensor) -> torch.Tensor:
+    # CSR with 3n - 2 entries, for n too large for the dense hessian.
+    return tridiagonal_sparse_csr(*genhumps_hessian_tridiagonal(x))
+
+
+def genhumps_hessian_vector_product(x: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    return tridiagonal_matvec(*genhumps_hessian_tridiagonal(x), v)
+
+
+def genhumps_hessian_operator(x: torch.Tensor) -> BandedHessian:
+    return BandedHessian.from_tridiagonal(*genhumps_hessian_tridiagonal(x))
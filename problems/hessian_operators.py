@@ -0,0 +1,257 @@
+import math
+from typing import Optional
+
+import torch
+
+from problems.sparse import is_sparse, matrix_diagonal
+
+
+# structured symmetric hessians. every operator has a matrix-vector product, its diagonal, a dense copy, a symmetry
+# test and a cholesky factorization of H + tau * I, which is also the positive definiteness test. the factorizations
+# use the structure: O(n) for diagonal, O(n b^2) for banded with b sub-diagonals and LAPACK for dense hessians.
+# sparse hessians are factored as banded ones when their bandwidth is small. otherwise `factorable` is False and
+# the methods solve with conjugate gradient instead.
+
+# below this dimension a banded hessian is factored densely: LAPACK on an n x n matrix beats the python loop over
+# the band.
+DENSE_FACTORIZATION_MAX_DIMENSION = 64
+
+
+class HessianFactor:
+    def solve(self, b: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+
+class HessianOperator:
+    # False when shifted_cholesky is impractical, for a sparse hessian with a wide band.
+    factorable = True
+
+    @property
+    def shape(self) -> torch.Size:
+        raise NotImplementedError
+
+    def matvec(self, v: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+    def diagonal(self) -> torch.Tensor:
+        raise NotImplementedError
+
+    def to_dense(self) -> torch.Tensor:
+        raise NotImplementedError
+
+    def is_symmetric(self) -> bool:
+        return True
+
+    def shifted_cholesky(self, tau: float) -> Optional[HessianFactor]:
+        # factor of H + tau * I, or None if that matrix is not positive definite.
+        raise NotImplementedError
+
+    def is_positive_definite(self) -> bool:
+        return self.is_symmetric() and self.shifted_cholesky(0) is not None
+
+
+class DenseCholeskyFactor(HessianFactor):
+    def __init__(self, lower: torch.Tensor):
+        self.lower = lower
+
+    def solve(self, b: torch.Tensor) -> torch.Tensor:
+        return torch.cholesky_solve(b.unsqueeze(1), self.lower).squeeze(1)
+
+
+class DenseHessian(HessianOperator):
+    def __init__(self, matrix: torch.Tensor):
+        self.matrix = matrix
+
+    @property
+    def shape(self) -> torch.Size:
+        return self.matrix.shape
+
+    def matvec(self, v: torch.Tensor) -> torch.Tensor:
+        return torch.mv(self.matrix, v)
+
+    def diagonal(self) -> torch.Tensor:
+        return torch.diagonal(self.matrix)
+
+    def to_dense(self) -> torch.Tensor:
+        return self.matrix
+
+    def is_symmetric(self) -> bool:
+        return torch.linalg.norm(self.matrix - torch.t(self.matrix), 2).item() <= 10e-4
+
+    def shifted_cholesky(self, tau: float) -> Optional[DenseCholeskyFactor]:
+        shifted = self.matrix.clone()
+        shifted.diagonal().add_(tau)
+        lower, info = torch.linalg.cholesky_ex(shifted)
+        if info.item() != 0:
+            return None
+        return DenseCholeskyFactor(lower)
+
+
+class DiagonalFactor(HessianFactor):
+    def __init__(self, shifted_diagonal: torch.Tensor):
+        self.shifted_diagonal = shifted_diagonal
+
+    def solve(self, b: torch.Tensor) -> torch.Tensor:
+        return b / self.shifted_diagonal
+
+
+class DiagonalHessian(HessianOperator):
+    def __init__(self, diagonal: torch.Tensor):
+        self._diagonal = diagonal
+
+    @property
+    def shape(self) -> torch.Size:
+        n = self._diagonal.shape[0]
+        return torch.Size([n, n])
+
+    def matvec(self, v: torch.Tensor) -> torch.Tensor:
+        return self._diagonal * v
+
+    def diagonal(self) -> torch.Tensor:
+        return self._diagonal
+
+    def to_dense(self) -> torch.Tensor:
+        return torch.diag(self._diagonal)
+
+    def shifted_cholesky(self, tau: float) -> Optional[DiagonalFactor]:
+        shifted = self._diagonal + tau
+        if not torch.all(shifted > 0).item():
+            return None
+        return DiagonalFactor(shifted)
+
+
+class BandedCholeskyFactor(HessianFactor):
+    # lower[d][j] = L[j + d, j], as python floats.
+    def __init__(self, lower: list[list[float]]):
+        self.lower = lower
+
+    def solve(self, b: torch.Tensor) -> torch.Tensor:
+        lower = self.lower
+        bandwidth = len(lower) - 1
+        n = b.shape[0]
+        y = b.tolist()
+        # L y = b, then L^T x = y.
+        for i in range(n):
+            total = y[i]
+            for k in range(max(0, i - bandwidth), i):
+                total -= lower[i - k][k] * y[k]
+            y[i] = total / lower[0][i]
+        for i in reversed(range(n)):
+            total = y[i]
+            for k in range(i + 1, min(i + bandwidth, n - 1) + 1):
+                total -= lower[k - i][i] * y[k]
+            y[i] = total / lower[0][i]
+        return torch.tensor(y, dtype=b.dtype)
+
+
+class BandedHessian(HessianOperator):
+    # symmetric with b sub-diagonals, stored as a (b + 1) x n tensor: bands[d, j] = H[j + d, j]. the last d entries of
+    # row d are unused.
+    def __init__(self, bands: torch.Tensor):
+        self.bands = bands
+
+    @classmethod
+    def from_tridiagonal(cls, diagonal: torch.Tensor, off_diagonal: torch.Tensor) -> "BandedHessian":
+        return cls(torch.stack([diagonal, torch.cat([off_diagonal, torch.zeros(1, dtype=off_diagonal.dtype)])]))
+
+    @property
+    def bandwidth(self) -> int:
+        return self.bands.shape[0] - 1
+
+    @property
+    def shape(self) -> torch.Size:
+        n = self.bands.shape[1]
+        return torch.Size([n, n])
+
+    def matvec(self, v: torch.Tensor) -> torch.Tensor:
+        n = v.shape[0]
+        product = self.bands[0] * v
+        for d in range(1, self.bandwidth + 1):
+            band = self.bands[d, :n - d]
+            product[d:] += band * v[:n - d]
+            product[:n - d] += band * v[d:]
+        return product
+
+    def diagonal(self) -> torch.Tensor:
+        return self.bands[0]
+
+    def to_dense(self) -> torch.Tensor:
+        n = self.bands.shape[1]
+        dense = torch.diag(self.bands[0])
+        for d in range(1, self.bandwidth + 1):
+            band = self.bands[d, :n - d]
+            dense += torch.diag(band, d) + torch.diag(band, -d)
+        return dense
+
+    def shifted_cholesky(self, tau: float) -> Optional[HessianFactor]:
+        n = self.bands.shape[1]
+        if n <= DENSE_FACTORIZATION_MAX_DIMENSION:
+            return DenseHessian(self.to_dense()).shifted_cholesky(tau)
+
+        bandwidth = self.bandwidth
+        bands = self.bands.tolist()
+        lower = [[0.0] * n for _ in range(bandwidth + 1)]
+        for j in range(n):
+            total = bands[0][j] + tau
+            for d in range(1, min(bandwidth, j) + 1):
+                total -= lower[d][j - d] ** 2
+            if not total > 0:
+                return None
+            diagonal_j = math.sqrt(total)
+            lower[0][j] = diagonal_j
+
+            for d in range(1, min(bandwidth, n - 1 - j) + 1):
+                i = j + d
+                total = bands[d][j]
+                for k in range(max(0, i - bandwidth), j):
+                    total -= lower[i - k][k] * lower[j - k][k]
+                lower[d][j] = total / diagonal_j
+        return BandedCholeskyFactor(lower)
+
+
+class SparseHessian(HessianOperator):
+    # CSR or COO.
+    def __init__(self, matrix: torch.Tensor):
+        self.matrix = matrix
+        self._coo = matrix.to_sparse_coo().coalesce()
+        rows, columns = self._coo.indices()
+        self.bandwidth = torch.max(torch.abs(rows - columns)).item() if rows.numel() > 0 else 0
+        # banded storage at most 4 times the sparse entries.
+        self.factorable = (self.bandwidth + 1) * matrix.shape[0] <= 4 * max(1, self._coo.values().numel())
+
+    @property
+    def shape(self) -> torch.Size:
+        return self.matrix.shape
+
+    def matvec(self, v: torch.Tensor) -> torch.Tensor:
+        return torch.mv(self.matrix, v)
+
+    def diagonal(self) -> torch.Tensor:
+        return matrix_diagonal(self.matrix)
+
+    def to_dense(self) -> torch.Tensor:
+        return self.matrix.to_dense()
+
+    def is_symmetric(self) -> bool:
+        difference = (self._coo - self._coo.t()).coalesce().values()
+        return difference.numel() == 0 or torch.max(torch.abs(difference)).item() <= 10e-4
+
+    def to_banded(self) -> BandedHessian:
+        rows, columns = self._coo.indices()
+        in_lower = rows >= columns
+        bands = torch.zeros(self.bandwidth + 1, self.matrix.shape[0], dtype=self.matrix.dtype)
+        bands[rows[in_lower] - columns[in_lower], columns[in_lower]] = self._coo.values()[in_lower]
+        return BandedHessian(bands)
+
+    def shifted_cholesky(self, tau: float) -> Optional[HessianFactor]:
+        # dense, O(n^3), when the band is wide. the methods check factorable and use conjugate gradient instead.
+        if self.factorable:
+            return self.to_banded().shifted_cholesky(tau)
+        return DenseHessian(self.to_dense()).shifted_cholesky(tau)
+
+
+def hessian_operator(hessian: torch.Tensor) -> HessianOperator:
+    # the operator of a hessian oracle's dense or sparse tensor.
+    if is_sparse(hessian):
+        return SparseHessian(hessian)
+    return DenseHessian(hessian)
@@ -1,25 +1,83 @@
-import csv
+import contextlib
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
 import torch
 
+from problems.sparse import sparse_csr_from_triplets
+
+CACHE_DIRECTORY_NAME = ".cache"
+
+
+def _parse_csv(path: str) -> np.ndarray:
+    matrix = np.loadtxt(path, delimiter=",", dtype=np.float64, ndmin=2)
+    if matrix.shape[1] > 1:
+        return matrix
+    # a single column is a vector.
+    return matrix[:, 0].copy()
+
+
+def _cache_path(path: str, cache_directory: str) -> str:
+    # the sha256 of the source contents is part of the file name, so an edited source never matches a stale cache.
+    with open(path, "rb") as source_file:
+        digest = hashlib.sha256(source_file.read()).hexdigest()
+    return os.path.join(cache_directory, f"{os.path.basename(path)}.{digest[:16]}.npy")
+
+
+def _is_fingerprint(text: str) -> bool:
+    return len(text) == 16 and all(c in "0123456789abcdef" for c in text)
+
+
+def _write_cache(path: str, cache_path: str, cache_directory: str):
+    os.makedirs(cache_directory, exist_ok=True)
+
+    # caches of earlier versions of the source. the current cache_path may exist already, written by a concurrent
+    # process, and another process may be between its exists check and np.load of it, so it is never removed.
+    stale_prefix = f"{os.path.basename(path)}."
+    for file_name in os.listdir(cache_directory):
+        fingerprint = file_name[len(stale_prefix):-len(".npy")]
+        if file_name.startswith(stale_prefix) and file_name.endswith(".npy") and _is_fingerprint(fingerprint) and \
+                os.path.join(cache_directory, file_name) != cache_path:
+            # a concurrent process may have removed it first.
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(cache_directory, file_name))
+
+    # write then rename, so that a concurrent or interrupted load never sees a partial file.
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=cache_directory, suffix=".tmp")
+    with os.fdopen(file_descriptor, "wb") as cache_file:
+        np.save(cache_file, _parse_csv(path))
+    os.replace(temporary_path, cache_path)
+
+
+def load_csv_to_tensor(path: str, use_cache: bool = True, dtype: torch.dtype = torch.double) -> torch.Tensor:
+    # parses the text file once into a .npy file in a .cache directory next to it. later loads memory map that file
+    # copy-on-write, so the tensor shares the pages with the file until it is modified. the cache is always float64;
+    # other dtypes are a converted copy.
+    if not use_cache:
+        return torch.from_numpy(_parse_csv(path)).to(dtype)
+
+    cache_directory = os.path.join(os.path.dirname(path), CACHE_DIRECTORY_NAME)
+    cache_path = _cache_path(path, cache_directory)
+    if not os.path.exists(cache_path):
+        _write_cache(path, cache_path, cache_directory)
+
+    return torch.from_numpy(np.load(cache_path, mmap_mode="c")).to(dtype)
+
+
+def load_triplets_to_sparse_tensor(path: str, n: Optional[int] = None, use_cache: bool = True,
+                                   dtype: torch.dtype = torch.double) -> torch.Tensor:
+    # one "row,column,value" line per nonzero, with 0-based indices, into an n x n CSR matrix. n defaults to the
+    # largest index + 1. duplicate entries are summed. the parsed triplets share the load_csv_to_tensor cache.
+    triplets = load_csv_to_tensor(path, use_cache).reshape(-1, 3)
+    rows = triplets[:, 0].long()
+    columns = triplets[:, 1].long()
+    largest_index = max(torch.max(rows).item(), torch.max(columns).item())
+    if n is None:
+        n = largest_index + 1
+    elif largest_index >= n:
+        raise ValueError(f"{path} has an index outside of a {n} x {n} matrix")
 
-def load_csv_to_tensor(path: str) -> torch.Tensor:
-    matrix_rows = []
-    max_width = 0
-    with open(path) as csvfile:
-        reader = csv.reader(csvfile)
-        for raw_row in reader:
-            # print(f"got row: {raw_row}")
-            parsed_row = [float(x) for x in raw_row]
-            if len(parsed_row) > max_width:
-                max_width = len(parsed_row)
-            # print(f"parsed_row: {parsed_row}")
-            matrix_rows.append(parsed_row)
-
-    if max_width > 1:
-        t = torch.tensor(matrix_rows, dtype=torch.double)
-    else:
-        flattened = [x[0] for x in matrix_rows]
-        t = torch.tensor(flattened, dtype=torch.double)
-
-    # print(f"path={path}. tensor shape={t.shape}. contents are...")
-    return t
\ No newline at end of file
+    return sparse_csr_from_triplets(rows, columns, triplets[:, 2].to(dtype, copy=True), n)
@@ -0,0 +1,51 @@
+from enum import StrEnum, auto
+from typing import Optional
+
+import torch
+
+
+class Precision(StrEnum):
+    float64 = auto()
+    float32 = auto()
+    # float32 problem data and iterates, with the reductions (function values, dot products and norms) and so the
+    # convergence tests accumulated in float64. halves the memory traffic of the matrix-vector products.
+    mixed = auto()
+
+
+def storage_dtype(precision: Precision) -> torch.dtype:
+    # dtype of the problem data, the iterates and the method's vectors and matrices.
+    match precision:
+        case Precision.float64:
+            return torch.float64
+        case Precision.float32 | Precision.mixed:
+            return torch.float32
+        case _:
+            raise NotImplementedError(f"unknown precision: {precision}")
+
+
+def accumulation_dtype(precision: Precision) -> torch.dtype:
+    match precision:
+        case Precision.float64 | Precision.mixed:
+            return torch.float64
+        case Precision.float32:
+            return torch.float32
+        case _:
+            raise NotImplementedError(f"unknown precision: {precision}")
+
+
+# the reductions below return python floats. with dtype None or the inputs' own dtype they are the plain torch
+# reductions. with a wider dtype the products are formed in the inputs' dtype and summed in the wider one.
+def accumulated_dot(a: torch.Tensor, b: torch.Tensor, dtype: Optional[torch.dtype] = None) -> float:
+    if dtype is None or dtype == a.dtype:
+        return torch.dot(a, b).item()
+    return torch.sum(a * b, dtype=dtype).item()
+
+
+def accumulated_sum(a: torch.Tensor, dtype: Optional[torch.dtype] = None) -> float:
+    return torch.sum(a, dtype=dtype).item()
+
+
+def accumulated_norm(a: torch.Tensor, dtype: Optional[torch.dtype] = None) -> float:
+    if dtype is None or dtype == a.dtype:
+        return torch.linalg.norm(a, 2).item()
+    return torch.linalg.vector_norm(a, dtype=dtype).item()
@@ -5,16 +5,25 @@ from typing import NamedTuple, Callable, Optional
 
 import torch
 
-from problems import quadratics, quartics
-from problems.beale import beale_hessian, beale_gradient, beale_function
-from problems.exponential import exponential_function, exponential_gradient, exponential_hessian
-from problems.genhumps import genhumps_function, genhumps_gradient, genhumps_hessian
+from problems import autogradient, quadratics, quartics
+from problems.beale import beale_hessian, beale_gradient, beale_function, beale_value_and_gradient, beale_tensor_function
+from problems.exponential import exponential_function, exponential_gradient, exponential_hessian, exponential_value_and_gradient, \
+    exponential_hessian_vector_product, exponential_hessian_operator, exponential_tensor_function
+from problems.genhumps import genhumps_function, genhumps_gradient, genhumps_hessian, genhumps_value_and_gradient, \
+    genhumps_hessian_vector_product, genhumps_hessian_operator, genhumps_tensor_function
+from problems.hessian_operators import HessianOperator, hessian_operator
 from problems.load_csv import load_csv_to_tensor
-from problems.rosenbrock import rosenbrock_function, rosenbrock_gradient, rosenbrock_hessian
+from problems.precision import Precision, storage_dtype, accumulation_dtype
+from problems.rosenbrock import rosenbrock_function, rosenbrock_gradient, rosenbrock_hessian, rosenbrock_value_and_gradient, \
+    rosenbrock_hessian_vector_product, rosenbrock_hessian_operator, rosenbrock_tensor_function
 
 type ProblemFunctionType = Callable[[torch.Tensor], float]
 type GradientFunctionType = Callable[[torch.Tensor], torch.Tensor]
 type HessianFunctionType = Callable[[torch.Tensor], torch.Tensor]
+type ValueAndGradientFunctionType = Callable[[torch.Tensor], tuple[float, torch.Tensor]]
+type HessianVectorProductFunctionType = Callable[[torch.Tensor, torch.Tensor], torch.Tensor]
+type TensorFunctionType = autogradient.TensorFunctionType
+type HessianOperatorFunctionType = Callable[[torch.Tensor], HessianOperator]
 
 class ProblemType(StrEnum):
     P1_quad_10_10 = auto()
@@ -31,116 +40,281 @@ class ProblemType(StrEnum):
     Genhumps_5 = auto()
 
 
+class DerivativeBackend(StrEnum):
+    # hand-written gradient, hessian and hessian-vector products
+    analytic = auto()
+    # torch.func transforms of the tensor objective
+    autograd = auto()
+    # batched central differences of the tensor objective
+    central_difference = auto()
+
+
 class Problem(NamedTuple):
-    problem_type: ProblemType
+    # problems built by registry.build_problem are named by family and dimension instead.
+    problem_type: ProblemType | str
     objective_function: ProblemFunctionType
     objective_gradient_function: GradientFunctionType
     objective_hessian_function: HessianFunctionType
     x0: torch.Tensor
+    # optional fused oracle that shares work between the function value and the gradient.
+    value_and_gradient_function: Optional[ValueAndGradientFunctionType] = None
+    # optional matrix-free hessian. without it, hessian_vector_product differences the gradient.
+    hessian_vector_product_function: Optional[HessianVectorProductFunctionType] = None
+    # optional differentiable objective, batched over leading dimensions. required by the non-analytic derivative
+    # backends and batched optimization.
+    tensor_objective_function: Optional[TensorFunctionType] = None
+    # optional structured hessian (diagonal, banded) with the same values as objective_hessian_function. without it,
+    # hessian_operator wraps the dense or sparse tensor of objective_hessian_function.
+    hessian_operator_function: Optional[HessianOperatorFunctionType] = None
+
+    def value_and_gradient(self, x: torch.Tensor) -> tuple[float, torch.Tensor]:
+        if self.value_and_gradient_function is not None:
+            return self.value_and_gradient_function(x)
+        return self.objective_function(x), self.objective_gradient_function(x)
+
+    def hessian_vector_product(self, x: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+        if self.hessian_vector_product_function is not None:
+            return self.hessian_vector_product_function(x, v)
+        if self.hessian_operator_function is not None:
+            return self.hessian_operator_function(x).matvec(v)
+        return autogradient.gradient_difference_hessian_vector_product(self.objective_gradient_function, x, v)
+
+    def hessian_operator(self, x: torch.Tensor) -> HessianOperator:
+        if self.hessian_operator_function is not None:
+            return self.hessian_operator_function(x)
+        return hessian_operator(self.objective_hessian_function(x))
+
+
+def use_derivative_backend(problem: Problem, backend: DerivativeBackend) -> Problem:
+    if backend == DerivativeBackend.analytic:
+        return problem
+
+    f = problem.tensor_objective_function
+    if f is None:
+        raise ValueError(f"{problem.problem_type} has no tensor objective function for the {backend} backend")
+
+    match backend:
+        case DerivativeBackend.autograd:
+            return problem._replace(
+                objective_gradient_function=functools.partial(autogradient.autograd_gradient, f),
+                objective_hessian_function=functools.partial(autogradient.autograd_hessian, f),
+                value_and_gradient_function=functools.partial(autogradient.autograd_value_and_gradient, f),
+                hessian_vector_product_function=functools.partial(autogradient.autograd_hessian_vector_product, f),
+                hessian_operator_function=None)
+        case DerivativeBackend.central_difference:
+            # no fused or matrix-free oracles: value_and_gradient and hessian_vector_product fall back to the
+            # differenced gradient.
+            return problem._replace(
+                objective_gradient_function=functools.partial(autogradient.central_difference_gradient, f),
+                objective_hessian_function=functools.partial(autogradient.central_difference_hessian, f),
+                value_and_gradient_function=None,
+                hessian_vector_product_function=None,
+                hessian_operator_function=None)
+        case _:
+            raise NotImplementedError(f"unknown derivative backend: {backend}")
+
+
+# the files that load_problem reads from data/. the big-q files of P3 and P4 are not in the repository.
+PROBLEM_DATA_FILES: dict[ProblemType, list[str]] = {
+    ProblemType.P1_quad_10_10: ["small-q-10-10.txt", "big-q-10-10.txt", "x0-10.txt"],
+    ProblemType.P2_quad_10_1000: ["small-q-10-1000.txt", "big-q-10-1000.txt", "x0-10.txt"],
+    ProblemType.P3_quad_1000_10: ["small-q-1000-10.txt", "big-q-1000-10.txt", "x0-1000.txt"],
+    ProblemType.P4_quad_1000_1000: ["small-q-1000-1000.txt", "big-q-1000-1000.txt", "x0-1000.txt"],
+}
+
+
+# the dimension of each problem, for callers that need it without loading the problem.
+PROBLEM_DIMENSIONS: dict[ProblemType, int] = {
+    ProblemType.P1_quad_10_10: 10,
+    ProblemType.P2_quad_10_1000: 10,
+    ProblemType.P3_quad_1000_10: 1000,
+    ProblemType.P4_quad_1000_1000: 1000,
+    ProblemType.P5_quartic_1: 4,
+    ProblemType.P6_quartic_2: 4,
+    ProblemType.Rosenbrock_2: 2,
+    ProblemType.Rosenbrock_100: 100,
+    ProblemType.DataFit_2: 2,
+    ProblemType.Exponential_10: 10,
+    # built with n = 100, despite its name.
+    ProblemType.Exponential_1000: 100,
+    ProblemType.Genhumps_5: 5,
+}
+
+
+def problem_data_available(problem_type: ProblemType) -> bool:
+    return all(os.path.exists(os.path.join("data", file_name)) for file_name in PROBLEM_DATA_FILES.get(problem_type, []))
 
 
-def load_problem(problem_type: ProblemType) -> Problem:
+# memoized, so only the first load of a problem reads its data files. callers must not modify the returned tensors
+# in place. the problem data and x0 are in the precision's storage dtype, and the analytic function values accumulate
+# in its accumulation dtype.
+@functools.lru_cache(maxsize=None)
+def load_problem(problem_type: ProblemType, derivative_backend: DerivativeBackend = DerivativeBackend.analytic,
+                 precision: Precision = Precision.float64) -> Problem:
     objective_function: Optional[ProblemFunctionType]
     objective_gradient_function: Optional[GradientFunctionType]
     objective_hessian_function: Optional[HessianFunctionType]
+    value_and_gradient_function: Optional[ValueAndGradientFunctionType]
+    hessian_vector_product_function: Optional[HessianVectorProductFunctionType] = None
+    tensor_objective_function: Optional[TensorFunctionType]
+    hessian_operator_function: Optional[HessianOperatorFunctionType] = None
     x0: Optional[torch.Tensor]
+    dtype = storage_dtype(precision)
+    accumulation = accumulation_dtype(precision)
 
     match problem_type:
         case ProblemType.P1_quad_10_10:
-            small_q = load_csv_to_tensor(os.path.join("data", "small-q-10-10.txt"))
-            big_q = load_csv_to_tensor(os.path.join("data", "big-q-10-10.txt"))
-            x0 = load_csv_to_tensor(os.path.join("data", "x0-10.txt"))
+            small_q = load_csv_to_tensor(os.path.join("data", "small-q-10-10.txt"), dtype=dtype)
+            big_q = load_csv_to_tensor(os.path.join("data", "big-q-10-10.txt"), dtype=dtype)
+            x0 = load_csv_to_tensor(os.path.join("data", "x0-10.txt"), dtype=dtype)
 
-            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q)
+            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q,
+                                                   accumulation_dtype=accumulation)
             objective_gradient_function = functools.partial(quadratics.quadratic_gradient, big_q, small_q)
             objective_hessian_function = functools.partial(quadratics.quadratic_hessian, big_q, small_q)
+            value_and_gradient_function = functools.partial(quadratics.quadratic_value_and_gradient, big_q, small_q,
+                                                            accumulation_dtype=accumulation)
+            hessian_vector_product_function = functools.partial(quadratics.quadratic_hessian_vector_product, big_q, small_q)
+            tensor_objective_function = functools.partial(quadratics.quadratic_tensor_function, big_q, small_q)
         case ProblemType.P2_quad_10_1000:
-            small_q = load_csv_to_tensor(os.path.join("data", "small-q-10-1000.txt"))
-            big_q = load_csv_to_tensor(os.path.join("data", "big-q-10-1000.txt"))
-            x0 = load_csv_to_tensor(os.path.join("data", "x0-10.txt"))
+            small_q = load_csv_to_tensor(os.path.join("data", "small-q-10-1000.txt"), dtype=dtype)
+            big_q = load_csv_to_tensor(os.path.join("data", "big-q-10-1000.txt"), dtype=dtype)
+            x0 = load_csv_to_tensor(os.path.join("data", "x0-10.txt"), dtype=dtype)
 
-            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q)
+            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q,
+                                                   accumulation_dtype=accumulation)
             objective_gradient_function = functools.partial(quadratics.quadratic_gradient, big_q, small_q)
             objective_hessian_function = functools.partial(quadratics.quadratic_hessian, big_q, small_q)
+            value_and_gradient_function = functools.partial(quadratics.quadratic_value_and_gradient, big_q, small_q,
+                                                            accumulation_dtype=accumulation)
+            hessian_vector_product_function = functools.partial(quadratics.quadratic_hessian_vector_product, big_q, small_q)
+            tensor_objective_function = functools.partial(quadratics.quadratic_tensor_function, big_q, small_q)
         case ProblemType.P3_quad_1000_10:
-            small_q = load_csv_to_tensor(os.path.join("data", "small-q-1000-10.txt"))
-            big_q = load_csv_to_tensor(os.path.join("data", "big-q-1000-10.txt"))
-            x0 = load_csv_to_tensor(os.path.join("data", "x0-1000.txt"))
+            small_q = load_csv_to_tensor(os.path.join("data", "small-q-1000-10.txt"), dtype=dtype)
+            big_q = load_csv_to_tensor(os.path.join("data", "big-q-1000-10.txt"), dtype=dtype)
+            x0 = load_csv_to_tensor(os.path.join("data", "x0-1000.txt"), dtype=dtype)
 
-            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q)
+            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q,
+                                                   accumulation_dtype=accumulation)
             objective_gradient_function = functools.partial(quadratics.quadratic_gradient, big_q, small_q)
             objective_hessian_function = functools.partial(quadratics.quadratic_hessian, big_q, small_q)
+            value_and_gradient_function = functools.partial(quadratics.quadratic_value_and_gradient, big_q, small_q,
+                                                            accumulation_dtype=accumulation)
+            hessian_vector_product_function = functools.partial(quadratics.quadratic_hessian_vector_product, big_q, small_q)
+            tensor_objective_function = functools.partial(quadratics.quadratic_tensor_function, big_q, small_q)
         case ProblemType.P4_quad_1000_1000:
-            small_q = load_csv_to_tensor(os.path.join("data", "small-q-1000-1000.txt"))
-            big_q = load_csv_to_tensor(os.path.join("data", "big-q-1000-1000.txt"))
-            x0 = load_csv_to_tensor(os.path.join("data", "x0-1000.txt"))
+            small_q = load_csv_to_tensor(os.path.join("data", "small-q-1000-1000.txt"), dtype=dtype)
+            big_q = load_csv_to_tensor(os.path.join("data", "big-q-1000-1000.txt"), dtype=dtype)
+            x0 = load_csv_to_tensor(os.path.join("data", "x0-1000.txt"), dtype=dtype)
 
-            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q)
+            objective_function = functools.partial(quadratics.quadratic_function, big_q, small_q,
+                                                   accumulation_dtype=accumulation)
             objective_gradient_function = functools.partial(quadratics.quadratic_gradient, big_q, small_q)
             objective_hessian_function = functools.partial(quadratics.quadratic_hessian, big_q, small_q)
+            value_and_gradient_function = functools.partial(quadratics.quadratic_value_and_gradient, big_q, small_q,
+                                                            accumulation_dtype=accumulation)
+            hessian_vector_product_function = functools.partial(quadratics.quadratic_hessian_vector_product, big_q, small_q)
+            tensor_objective_function = functools.partial(quadratics.quadratic_tensor_function, big_q, small_q)
         case ProblemType.P5_quartic_1:
-            q = quartics.build_q()
-            x0 = quartics.build_x0()
+            q = quartics.build_q(dtype)
+            x0 = quartics.build_x0(dtype)
             sigma = 1e-4
 
-            objective_function = functools.partial(quartics.quartic_function, q, sigma)
+            objective_function = functools.partial(quartics.quartic_function, q, sigma,
+                                                   accumulation_dtype=accumulation)
             objective_gradient_function = functools.partial(quartics.quartic_gradient, q, sigma)
             objective_hessian_function = functools.partial(quartics.quartic_hessian, q, sigma)
+            value_and_gradient_function = functools.partial(quartics.quartic_value_and_gradient, q, sigma,
+                                                            accumulation_dtype=accumulation)
+            hessian_vector_product_function = functools.partial(quartics.quartic_hessian_vector_product, q, sigma)
+            tensor_objective_function = functools.partial(quartics.quartic_tensor_function, q, sigma)
         case ProblemType.P6_quartic_2:
-            q = quartics.build_q()
-            x0 = quartics.build_x0()
+            q = quartics.build_q(dtype)
+            x0 = quartics.build_x0(dtype)
             sigma = 1e4
 
-            objective_function = functools.partial(quartics.quartic_function, q, sigma)
+            objective_function = functools.partial(quartics.quartic_function, q, sigma,
+                                                   accumulation_dtype=accumulation)
             objective_gradient_function = functools.partial(quartics.quartic_gradient, q, sigma)
             objective_hessian_function = functools.partial(quartics.quartic_hessian, q, sigma)
+            value_and_gradient_function = functools.partial(quartics.quartic_value_and_gradient, q, sigma,
+                                                            accumulation_dtype=accumulation)
+            hessian_vector_product_function = functools.partial(quartics.quartic_hessian_vector_product, q, sigma)
+            tensor_objective_function = functools.partial(quartics.quartic_tensor_function, q, sigma)
         case ProblemType.Rosenbrock_2:
-            x0 = torch.tensor([-1.2, 1], dtype=torch.double)
+            x0 = torch.tensor([-1.2, 1], dtype=dtype)
 
-            objective_function = rosenbrock_function
+            objective_function = functools.partial(rosenbrock_function, accumulation_dtype=accumulation)
             objective_gradient_function = rosenbrock_gradient
             objective_hessian_function = rosenbrock_hessian
+            value_and_gradient_function = functools.partial(rosenbrock_value_and_gradient, accumulation_dtype=accumulation)
+            hessian_vector_product_function = rosenbrock_hessian_vector_product
+            tensor_objective_function = rosenbrock_tensor_function
+            hessian_operator_function = rosenbrock_hessian_operator
         case ProblemType.Rosenbrock_100:
-            x0 = torch.full([100], 1, dtype=torch.double)
+            x0 = torch.full([100], 1, dtype=dtype)
             x0[0] = -1.2
 
-            objective_function = rosenbrock_function
+            objective_function = functools.partial(rosenbrock_function, accumulation_dtype=accumulation)
             objective_gradient_function = rosenbrock_gradient
             objective_hessian_function = rosenbrock_hessian
+            value_and_gradient_function = functools.partial(rosenbrock_value_and_gradient, accumulation_dtype=accumulation)
+            hessian_vector_product_function = rosenbrock_hessian_vector_product
+            tensor_objective_function = rosenbrock_tensor_function
+            hessian_operator_function = rosenbrock_hessian_operator
         case ProblemType.DataFit_2:
-            x0 = torch.tensor([1, 1], dtype=torch.double)
+            x0 = torch.tensor([1, 1], dtype=dtype)
 
             objective_function = beale_function
             objective_gradient_function = beale_gradient
             objective_hessian_function = beale_hessian
+            value_and_gradient_function = beale_value_and_gradient
+            tensor_objective_function = beale_tensor_function
         case ProblemType.Exponential_10:
             raw = [0] * 10
             raw[0] = 1
-            x0 = torch.tensor(raw, dtype=torch.double)
+            x0 = torch.tensor(raw, dtype=dtype)
 
             objective_function = exponential_function
             objective_gradient_function = exponential_gradient
             objective_hessian_function = exponential_hessian
+            value_and_gradient_function = functools.partial(exponential_value_and_gradient, accumulation_dtype=accumulation)
+            hessian_vector_product_function = exponential_hessian_vector_product
+            tensor_objective_function = exponential_tensor_function
+            hessian_operator_function = exponential_hessian_operator
         case ProblemType.Exponential_1000:
             raw = [0] * 100
             raw[0] = 1
-            x0 = torch.tensor(raw, dtype=torch.double)
+            x0 = torch.tensor(raw, dtype=dtype)
 
             objective_function = exponential_function
             objective_gradient_function = exponential_gradient
             objective_hessian_function = exponential_hessian
+            value_and_gradient_function = functools.partial(exponential_value_and_gradient, accumulation_dtype=accumulation)
+            hessian_vector_product_function = exponential_hessian_vector_product
+            tensor_objective_function = exponential_tensor_function
+            hessian_operator_function = exponential_hessian_operator
         case ProblemType.Genhumps_5:
-            x0 = torch.tensor([-506.2, 506.2, 506.2, 506.2, 506.2], dtype=torch.double)
+            x0 = torch.tensor([-506.2, 506.2, 506.2, 506.2, 506.2], dtype=dtype)
 
-            objective_function = genhumps_function
+            objective_function = functools.partial(genhumps_function, accumulation_dtype=accumulation)
             objective_gradient_function = genhumps_gradient
             objective_hessian_function = genhumps_hessian
+            value_and_gradient_function = functools.partial(genhumps_value_and_gradient, accumulation_dtype=accumulation)
+            hessian_vector_product_function = genhumps_hessian_vector_product
+            tensor_objective_function = genhumps_tensor_function
+            hessian_operator_function = genhumps_hessian_operator
         case _:
             raise NotImplementedError(f"unknown problem type: {problem_type}")
 
-    return Problem(
+    problem = Problem(
         problem_type,
         objective_function,
         objective_gradient_function,
         objective_hessian_function,
-        x0)
+        x0,
+        value_and_gradient_function,
+        hessian_vector_product_function,
+        tensor_objective_function,
+        hessian_operator_function)
+    return use_derivative_backend(problem, derivative_backend)
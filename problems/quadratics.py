@@ -1,10 +1,27 @@
+import math
 from typing import Optional
 
 import torch
 
+from problems.precision import accumulated_dot
+from problems.sparse import sparse_csr_from_triplets
 
-def quadratic_function(big_q: torch.Tensor, small_q: torch.Tensor, x: torch.Tensor) -> float:
-    return torch.dot(x, torch.matmul(big_q, x)).item() / 2 + torch.dot(small_q, x).item()
+# big_q may be dense or sparse CSR. the matrix-vector products below work with either, and quadratic_hessian returns
+# big_q as is, so sparse hessians stay sparse.
+
+
+# the scalar oracles take the dtype that their reductions accumulate in, so float32 data can have float64 values.
+def quadratic_function(big_q: torch.Tensor, small_q: torch.Tensor, x: torch.Tensor,
+                       accumulation_dtype: Optional[torch.dtype] = None) -> float:
+    return accumulated_dot(x, torch.matmul(big_q, x), accumulation_dtype) / 2 + \
+        accumulated_dot(small_q, x, accumulation_dtype)
+
+
+def quadratic_tensor_function(big_q: torch.Tensor, small_q: torch.Tensor, x: torch.Tensor) -> torch.Tensor:
+    # Q multiplies the rows of x as columns so that leading batch dimensions work with a sparse Q too.
+    n = x.shape[-1]
+    big_q_x = torch.matmul(big_q, x.reshape(-1, n).t()).t().reshape(x.shape)
+    return torch.sum(x * big_q_x, -1) / 2 + torch.matmul(x, small_q)
 
 
 def quadratic_gradient(big_q: torch.Tensor, small_q: torch.Tensor, x: torch.Tensor) -> torch.tensor:
@@ -13,3 +30,63 @@ def quadratic_gradient(big_q: torch.Tensor, small_q: torch.Tensor, x: torch.Tens
 
 def quadratic_hessian(big_q: torch.Tensor, _1: torch.Tensor, _2: torch.Tensor) -> torch.tensor:
     return big_q
+
+
+def quadratic_value_and_gradient(big_q: torch.Tensor, small_q: torch.Tensor, x: torch.Tensor,
+                                 accumulation_dtype: Optional[torch.dtype] = None) -> tuple[float, torch.Tensor]:
+    # the matrix-vector product dominates the cost, so compute it once and share it.
+    big_q_x = torch.matmul(big_q, x)
+    f = accumulated_dot(x, big_q_x, accumulation_dtype) / 2 + accumulated_dot(small_q, x, accumulation_dtype)
+    return f, big_q_x + small_q
+
+
+def quadratic_hessian_vector_product(big_q: torch.Tensor, _1: torch.Tensor, _2: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    return torch.matmul(big_q, v)
+
+
+def build_random_quadratic(n: int, condition_number: float, density: float,
+                           generator: torch.Generator) -> tuple[torch.Tensor, torch.Tensor]:
+    # Q = D + S. D has entries log-spaced from 1 to the condition number in random order. S is symmetric with about
+    # density * n^2 off-diagonal nonzeros, scaled so that every Gershgorin radius is at most 0.1, which keeps the
+    # eigenvalues of Q within 0.1 of [1, condition_number].
+    diagonal = torch.logspace(0, math.log10(condition_number), n, dtype=torch.double)
+    diagonal = diagonal[torch.randperm(n, generator=generator)]
+
+    mask = torch.rand(n, n, generator=generator, dtype=torch.double) < density
+    off_diagonal = torch.triu(torch.randn(n, n, generator=generator, dtype=torch.double) * mask, 1)
+    off_diagonal = off_diagonal + off_diagonal.t()
+    max_radius = torch.max(torch.sum(torch.abs(off_diagonal), 1)).item()
+    if max_radius > 0:
+        off_diagonal *= 0.1 / max_radius
+
+    big_q = torch.diag(diagonal) + off_diagonal
+    small_q = torch.randn(n, generator=generator, dtype=torch.double)
+    return big_q, small_q
+
+
+def build_random_sparse_quadratic(n: int, condition_number: float, density: float,
+                                  generator: torch.Generator) -> tuple[torch.Tensor, torch.Tensor]:
+    # build_random_quadratic without any dense n x n intermediate: Q is assembled from (row, column, value) triplets
+    # and returned in CSR format.
+    diagonal = torch.logspace(0, math.log10(condition_number), n, dtype=torch.double)
+    diagonal = diagonal[torch.randperm(n, generator=generator)]
+
+    off_diagonal_count = int(density * n * (n - 1) / 2)
+    rows = torch.randint(0, n, [off_diagonal_count], generator=generator)
+    columns = torch.randint(0, n, [off_diagonal_count], generator=generator)
+    values = torch.randn(off_diagonal_count, generator=generator, dtype=torch.double)
+    off_diagonal = rows != columns
+    rows, columns, values = rows[off_diagonal], columns[off_diagonal], values[off_diagonal]
+
+    radii = torch.zeros(n, dtype=torch.double)
+    radii.index_add_(0, rows, torch.abs(values))
+    radii.index_add_(0, columns, torch.abs(values))
+    max_radius = torch.max(radii).item()
+    if max_radius > 0:
+        values = values * (0.1 / max_radius)
+
+    indices = torch.arange(n)
+    big_q = sparse_csr_from_triplets(torch.cat([indices, rows, columns]), torch.cat([indices, columns, rows]),
+                                     torch.cat([diagonal, values, values]), n)
+    small_q = torch.randn(n, generator=generator, dtype=torch.double)
+    return big_q, small_q
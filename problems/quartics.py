@@ -1,23 +1,54 @@
 from math import cos, sin
+from typing import Optional
 
 import torch
 
+from problems.precision import accumulated_dot
 
-def build_q() -> torch.Tensor:
-    return torch.tensor([[5,1,0,0.5], [1,4,0.5,0], [0,0.5,3,0], [0.5,0,0,2]], dtype=torch.double)
 
+def build_q(dtype: torch.dtype = torch.double) -> torch.Tensor:
+    return torch.tensor([[5,1,0,0.5], [1,4,0.5,0], [0,0.5,3,0], [0.5,0,0,2]], dtype=dtype)
 
-def build_x0() -> torch.Tensor:
-    return torch.tensor([cos(70), sin(70), cos(70), sin(70)], dtype=torch.double)
 
+def build_x0(dtype: torch.dtype = torch.double) -> torch.Tensor:
+    return torch.tensor([cos(70), sin(70), cos(70), sin(70)], dtype=dtype)
 
-def quartic_function(q: torch.tensor, sigma: float, x: torch.Tensor) -> float:
-    return sigma * torch.dot(x, torch.matmul(q, x)).item() / 4 + torch.dot(x, x).item() / 2
+
+def build_random_q(n: int, generator: torch.Generator) -> torch.Tensor:
+    # symmetric positive definite with the same kind of entries as build_q: a dominant diagonal and small couplings.
+    a = torch.rand(n, n, generator=generator, dtype=torch.double)
+    return (a + a.t()) / n + torch.diag(2 + 3 * torch.rand(n, generator=generator, dtype=torch.double))
+
+
+def build_alternating_x0(n: int, dtype: torch.dtype = torch.double) -> torch.Tensor:
+    # build_x0 for any n: cos(70), sin(70), cos(70), ...
+    return torch.tensor([cos(70) if i % 2 == 0 else sin(70) for i in range(n)], dtype=dtype)
+
+
+def quartic_function(q: torch.tensor, sigma: float, x: torch.Tensor,
+                     accumulation_dtype: Optional[torch.dtype] = None) -> float:
+    return sigma * accumulated_dot(x, torch.matmul(q, x), accumulation_dtype) / 4 + \
+        accumulated_dot(x, x, accumulation_dtype) / 2
+
+
+def quartic_tensor_function(q: torch.tensor, sigma: float, x: torch.Tensor) -> torch.Tensor:
+    return sigma * torch.sum(x * torch.matmul(x, q), -1) / 4 + torch.sum(x * x, -1) / 2
 
 
 def quartic_gradient(q: torch.tensor, sigma: float, x: torch.Tensor) -> torch.Tensor:
     return sigma * torch.matmul(q, x) / 2 + x
 
 
-def quartic_hessian(q: torch.tensor, _1: float, _2: torch.Tensor) -> torch.Tensor:
-    return q
+def quartic_hessian(q: torch.tensor, sigma: float, _: torch.Tensor) -> torch.Tensor:
+    return sigma * q / 2 + torch.eye(q.shape[0], dtype=q.dtype)
+
+
+def quartic_value_and_gradient(q: torch.tensor, sigma: float, x: torch.Tensor,
+                               accumulation_dtype: Optional[torch.dtype] = None) -> tuple[float, torch.Tensor]:
+    q_x = torch.matmul(q, x)
+    f = sigma * accumulated_dot(x, q_x, accumulation_dtype) / 4 + accumulated_dot(x, x, accumulation_dtype) / 2
+    return f, sigma * q_x / 2 + x
+
+
+def quartic_hessian_vector_product(q: torch.tensor, sigma: float, _: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    return sigma * torch.matmul(q, v) / 2 + v
@@ -0,0 +1,123 @@
+import functools
+from enum import StrEnum, auto
+
+import torch
+
+from problems import quadratics, quartics, genhumps
+from problems.exponential import exponential_function, exponential_gradient, exponential_hessian, \
+    exponential_value_and_gradient, exponential_hessian_vector_product, exponential_tensor_function, \
+    exponential_hessian_operator
+from problems.precision import Precision, storage_dtype, accumulation_dtype
+from problems.problems import Problem
+from problems.rosenbrock import rosenbrock_function, rosenbrock_gradient, rosenbrock_hessian, \
+    rosenbrock_value_and_gradient, rosenbrock_hessian_vector_product, rosenbrock_tensor_function, \
+    rosenbrock_hessian_operator
+
+
+# problem families that build_problem can generate at any dimension n.
+class ProblemFamily(StrEnum):
+    Quadratic = auto()
+    Quartic = auto()
+    Rosenbrock = auto()
+    Exponential = auto()
+    Genhumps = auto()
+
+
+@functools.lru_cache(maxsize=64)
+def build_problem(family: ProblemFamily, n: int, seed: int = 0, condition_number: float = 10,
+                  density: float = 1, sigma: float = 1e-4, sparse: bool = False,
+                  precision: Precision = Precision.float64) -> Problem:
+    # memoized on all arguments, so repeated benchmark runs share one construction. condition_number and density
+    # apply to the quadratic family and sigma to the quartic family. sparse, for large n, gives the quadratic family a
+    # CSR Q and the genhumps family a CSR hessian. the other families don't use the seed. the data is generated in
+    # float64 and then converted, so the same seed gives the same problem, up to rounding, in every precision.
+    # callers must not modify the returned tensors in place.
+    if n < 2:
+        raise ValueError(f"n must be at least 2: {n}")
+    if condition_number < 1:
+        raise ValueError(f"condition number must be at least 1: {condition_number}")
+    if not 0 <= density <= 1:
+        raise ValueError(f"density must be in [0, 1]: {density}")
+
+    generator = torch.Generator().manual_seed(seed)
+    problem_name = f"{family}_{n}"
+    dtype = storage_dtype(precision)
+    accumulation = accumulation_dtype(precision)
+
+    match family:
+        case ProblemFamily.Quadratic:
+            if sparse:
+                big_q, small_q = quadratics.build_random_sparse_quadratic(n, condition_number, density, generator)
+            else:
+                big_q, small_q = quadratics.build_random_quadratic(n, condition_number, density, generator)
+            x0 = torch.randn(n, generator=generator, dtype=torch.double).to(dtype)
+            big_q = big_q.to(dtype)
+            small_q = small_q.to(dtype)
+
+            return Problem(
+                problem_name,
+                functools.partial(quadratics.quadratic_function, big_q, small_q, accumulation_dtype=accumulation),
+                functools.partial(quadratics.quadratic_gradient, big_q, small_q),
+                functools.partial(quadratics.quadratic_hessian, big_q, small_q),
+                x0,
+                functools.partial(quadratics.quadratic_value_and_gradient, big_q, small_q,
+                                  accumulation_dtype=accumulation),
+                functools.partial(quadratics.quadratic_hessian_vector_product, big_q, small_q),
+                functools.partial(quadratics.quadratic_tensor_function, big_q, small_q))
+        case ProblemFamily.Quartic:
+            q = quartics.build_random_q(n, generator).to(dtype)
+            x0 = quartics.build_alternating_x0(n, dtype)
+
+            return Problem(
+                problem_name,
+                functools.partial(quartics.quartic_function, q, sigma, accumulation_dtype=accumulation),
+                functools.partial(quartics.quartic_gradient, q, sigma),
+                functools.partial(quartics.quartic_hessian, q, sigma),
+                x0,
+                functools.partial(quartics.quartic_value_and_gradient, q, sigma, accumulation_dtype=accumulation),
+                functools.partial(quartics.quartic_hessian_vector_product, q, sigma),
+                functools.partial(quartics.quartic_tensor_function, q, sigma))
+        case ProblemFamily.Rosenbrock:
+            x0 = torch.full([n], 1, dtype=dtype)
+            x0[0] = -1.2
+
+            return Problem(
+                problem_name,
+                functools.partial(rosenbrock_function, accumulation_dtype=accumulation),
+                rosenbrock_gradient,
+                rosenbrock_hessian,
+                x0,
+                functools.partial(rosenbrock_value_and_gradient, accumulation_dtype=accumulation),
+                rosenbrock_hessian_vector_product,
+                rosenbrock_tensor_function,
+                rosenbrock_hessian_operator)
+        case ProblemFamily.Exponential:
+            x0 = torch.zeros(n, dtype=dtype)
+            x0[0] = 1
+
+            return Problem(
+                problem_name,
+                exponential_function,
+                exponential_gradient,
+                exponential_hessian,
+                x0,
+                functools.partial(exponential_value_and_gradient, accumulation_dtype=accumulation),
+                exponential_hessian_vector_product,
+                exponential_tensor_function,
+                exponential_hessian_operator)
+        case ProblemFamily.Genhumps:
+            x0 = torch.full([n], 506.2, dtype=dtype)
+            x0[0] = -506.2
+
+            return Problem(
+                problem_name,
+                functools.partial(genhumps.genhumps_function, accumulation_dtype=accumulation),
+                genhumps.genhumps_gradient,
+                genhumps.genhumps_sparse_hessian if sparse else genhumps.genhumps_hessian,
+                x0,
+                functools.partial(genhumps.genhumps_value_and_gradient, accumulation_dtype=accumulation),
+                genhumps.genhumps_hessian_vector_product,
+                genhumps.genhumps_tensor_function,
+                genhumps.genhumps_hessian_operator)
+        case _:
+            raise NotImplementedError(f"unknown problem family: {family}")
@@ -1,67 +1,79 @@
+from typing import Optional
+
 import torch
 
+from problems.hessian_operators import BandedHessian
+from problems.precision import accumulated_sum
+from problems.tridiagonal import tridiagonal_dense, tridiagonal_matvec
+
+
+def rosenbrock_function(x: torch.Tensor, accumulation_dtype: Optional[torch.dtype] = None) -> float:
+    # f(x) = sum_{i=1}^{n-1} 100 * (x_{i+1} - x_i^2)^2 + (1 - x_i)^2, evaluated as whole-tensor expressions.
+    xi = x[:-1]
+    xip1 = x[1:]
+
+    return accumulated_sum(100 * (xip1 - xi**2)**2 + (1 - xi)**2, accumulation_dtype)
 
-def rosenbrock_function(x: torch.Tensor) -> float:
-    n = x.shape[0]
 
-    f = 0
-    # variable i is 1-indexed to match document.
-    for i in range(1, n):
-        # adjust 1-based indices to 0-based python indices.
-        xi = x[i-1].item()
-        xip1 = x[i].item()
+def rosenbrock_tensor_function(x: torch.Tensor) -> torch.Tensor:
+    # differentiable form of rosenbrock_function for the autograd derivative backend. leading dimensions are batch
+    # dimensions.
+    xi = x[..., :-1]
+    xip1 = x[..., 1:]
 
-        fi = 100 * (xip1 - xi**2)**2 + (1 - xi)**2
-        f = f + fi
-    return f
+    return torch.sum(100 * (xip1 - xi**2)**2 + (1 - xi)**2, -1)
 
 
 def rosenbrock_gradient(x: torch.Tensor) -> torch.Tensor:
-    n = x.shape[0]
+    xi = x[:-1]
+    xip1 = x[1:]
+    residual = xip1 - xi**2
+
+    grad = torch.zeros_like(x)
+    # each term i contributes to the partial derivatives of x_i and x_{i+1}.
+    grad[:-1] += -400 * xi * residual - 2 * (1 - xi)
+    grad[1:] += 200 * residual
+
+    return grad
+
 
-    grad = [0] * n
+def rosenbrock_value_and_gradient(x: torch.Tensor,
+                                  accumulation_dtype: Optional[torch.dtype] = None) -> tuple[float, torch.Tensor]:
+    xi = x[:-1]
+    xip1 = x[1:]
+    residual = xip1 - xi**2
+    one_minus_xi = 1 - xi
 
-    x1 = x[0].item()
-    x2 = x[1].item()
-    grad[0] = -400 * x1 * x2 + 400 * x1**3 - 2 + 2*x1
+    f = accumulated_sum(100 * residual**2 + one_minus_xi**2, accumulation_dtype)
 
-    for i in range(2, n):
-        xim1 = x[i - 2].item()
-        xi = x[i - 1].item()
-        xip1 = x[i].item()
-        grad[i-1] = 400 * xi**3 + 202*xi - 200*xim1**2 - 400*xi*xip1 - 2
+    grad = torch.zeros_like(x)
+    grad[:-1] += -400 * xi * residual - 2 * one_minus_xi
+    grad[1:] += 200 * residual
 
-    xnm1 = x[n - 2].item()
-    xn = x[n - 1].item()
-    grad[n - 1] = 200 * xn - 200 * xnm1**2
+    return f, grad
 
-    return torch.tensor(grad, dtype=torch.double)
+
+def rosenbrock_hessian_tridiagonal(x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    # the diagonal and off-diagonal of the tridiagonal hessian.
+    xi = x[:-1]
+    xip1 = x[1:]
+
+    diagonal = torch.zeros_like(x)
+    diagonal[:-1] += 1200 * xi**2 - 400 * xip1 + 2
+    diagonal[1:] += 200
+    off_diagonal = -400 * xi
+
+    return diagonal, off_diagonal
 
 
 def rosenbrock_hessian(x: torch.Tensor) -> torch.Tensor:
-    n = x.shape[0]
-
-    hess = [[0 for _ in range(n)] for _ in range(n)]
-    for i in range(1, n+1):
-        if i == 1:
-            x1 = x[0].item()
-            x2 = x[1].item()
-            hess[i-1][i-1] = -400 * x2 + 1200 * x1**2 + 2
-            hess[i-1][i] = -400 * x1
-            hess[i][i-1] = hess[i-1][i]
-        elif i == n:
-            xnm1 = x[n - 2].item()
-            hess[i-1][i-1] = 200
-            hess[i-1][i-2] = -400*xnm1
-            hess[i-2][i-1] = hess[i-1][i-2]
-        else:
-            xim1 = x[i - 2].item()
-            xi = x[i - 1].item()
-            xip1 = x[i].item()
-            hess[i-1][i-1] = 1200 * xi**2 + 202 - 400 * xip1
-            hess[i-1][i-2] = -400 * xim1
-            hess[i-2][i-1] = hess[i-1][i-2]
-            hess[i-1][i] = -400*xi
-            hess[i][i-1] = hess[i-1][i]
-
-    return torch.tensor(hess, dtype=torch.double)
+    return tridiagonal_dense(*rosenbrock_hessian_tridiagonal(x))
+
+
+def rosenbrock_hessian_vector_product(x: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    # the hessian is tridiagonal, so H v costs O(n) without forming H.
+    return tridiagonal_matvec(*rosenbrock_hessian_tridiagonal(x), v)
+
+
+def rosenbrock_hessian_operator(x: torch.Tensor) -> BandedHessian:
+    return BandedHessian.from_tridiagonal(*rosenbrock_hessian_tridiagonal(x))
@@ -0,0 +1,25 @@
+import torch
+
+
+# helpers for hessians that may be dense or sparse (CSR or COO) without densifying the sparse ones.
+
+def is_sparse(a: torch.Tensor) -> bool:
+    return a.layout in (torch.sparse_csr, torch.sparse_coo)
+
+
+def matrix_diagonal(a: torch.Tensor) -> torch.Tensor:
+    if not is_sparse(a):
+        return torch.diagonal(a)
+
+    coo = a.to_sparse_coo().coalesce()
+    rows, columns = coo.indices()
+    on_diagonal = rows == columns
+    diagonal = torch.zeros(a.shape[0], dtype=a.dtype)
+    diagonal.index_add_(0, rows[on_diagonal], coo.values()[on_diagonal])
+    return diagonal
+
+
+def sparse_csr_from_triplets(rows: torch.Tensor, columns: torch.Tensor, values: torch.Tensor, n: int) -> torch.Tensor:
+    # duplicate (row, column) entries are summed.
+    coo = torch.sparse_coo_tensor(torch.stack([rows, columns]), values, (n, n)).coalesce()
+    return coo.to_sparse_csr()
@@ -1,7 +1,7 @@
 import torch
 
 from problems import autogradient
-from problems.beale import beale_gradient, beale_function, beale_hessian
+from problems.beale import beale_gradient, beale_function, beale_hessian, beale_tensor_function
 
 
 def test_beale_gradient():
@@ -9,11 +9,11 @@ def test_beale_gradient():
 
     gradient_at_x = beale_gradient(x)
     print(f"grad_beale(x)={gradient_at_x}")
-    auto_gradient_at_x = autogradient.gradient(beale_function, x)
+    auto_gradient_at_x = autogradient.autograd_gradient(beale_tensor_function, x)
     print(f"auto gradient(x)={auto_gradient_at_x}")
 
     norm_delta = torch.linalg.norm(gradient_at_x - auto_gradient_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
 
 
 def test_beale_hessian():
@@ -21,8 +21,14 @@ def test_beale_hessian():
 
     hessian_at_x = beale_hessian(x)
     print(f"grad_beale(x)={hessian_at_x}")
-    auto_hessian_at_x = autogradient.hessian(beale_function, x)
+    auto_hessian_at_x = autogradient.autograd_hessian(beale_tensor_function, x)
     print(f"auto gradient(x)={auto_hessian_at_x}")
 
     norm_delta = torch.linalg.norm(hessian_at_x - auto_hessian_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
+
+
+def test_beale_tensor_function_matches_function():
+    x = torch.tensor([1.5, -0.4], dtype=torch.double)
+
+    assert abs(beale_tensor_function(x).item() - beale_function(x)) < 1e-12
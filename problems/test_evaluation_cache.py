@@ -0,0 +1,63 @@
+import torch
+
+from methods.methods import Method, OptimizationOptions
+from methods.run_optimization import run_optimization
+from problems.evaluation_cache import cached_problem
+from problems.problems import load_problem, ProblemType
+
+
+def test_evaluation_cache_hits_and_misses():
+    problem, cache = cached_problem(load_problem(ProblemType.Rosenbrock_2))
+    x = torch.tensor([0.5, -0.3], dtype=torch.double)
+
+    f = problem.objective_function(x)
+    assert cache.statistics() == (0, 1, 0)
+
+    # the key is the contents, so an equal point in a different tensor is a hit.
+    assert problem.objective_function(torch.tensor([0.5, -0.3], dtype=torch.double)) == f
+    assert cache.statistics() == (1, 1, 0)
+
+    # the same entry, but its gradient is missing: a miss that evaluates only the gradient and reuses f.
+    f_again, gradient = problem.value_and_gradient(torch.tensor([0.5, -0.3], dtype=torch.double))
+    assert f_again == f
+    assert cache.statistics() == (1, 2, 0)
+
+    assert problem.objective_gradient_function(x) is gradient
+    assert problem.objective_function(x) == f
+    assert cache.hits == 3
+
+    problem.objective_function(x + 1e-12)
+    assert cache.misses == 3
+
+
+def test_evaluation_cache_evicts_least_recently_used():
+    problem, cache = cached_problem(load_problem(ProblemType.Rosenbrock_2), max_entries=2)
+    points = [torch.tensor([float(i), 1], dtype=torch.double) for i in range(3)]
+
+    problem.objective_function(points[0])
+    problem.objective_function(points[1])
+    # touch points[0] so points[1] becomes the least recently used entry.
+    problem.objective_function(points[0])
+    problem.objective_function(points[2])
+    assert cache.evictions == 1
+
+    problem.objective_function(points[0])
+    assert cache.hits == 2
+    problem.objective_function(points[1])
+    assert cache.statistics() == (2, 4, 2)
+
+
+def test_evaluation_cache_covers_the_hessian_operator():
+    problem, cache = cached_problem(load_problem(ProblemType.Rosenbrock_100), max_entries=1000)
+    x = problem.x0
+    operator = problem.hessian_operator(x)
+    assert problem.hessian_operator(x) is operator
+    assert cache.statistics() == (1, 1, 0)
+
+    # modified newton factors the structured hessian: a second run is all hits.
+    first = run_optimization(Method.ModifiedNewtonW, problem, OptimizationOptions())
+    misses = cache.misses
+    second = run_optimization(Method.ModifiedNewtonW, problem, OptimizationOptions())
+    assert torch.equal(first.final_x, second.final_x)
+    assert cache.misses == misses
+    assert cache.hits > 2 * (first.trace.total_steps - 1)
@@ -1,7 +1,7 @@
 import torch
 
 from problems import autogradient
-from problems.exponential import exponential_gradient, exponential_hessian, exponential_function
+from problems.exponential import exponential_gradient, exponential_hessian, exponential_function, exponential_tensor_function
 
 
 def test_exponential_gradient():
@@ -9,11 +9,11 @@ def test_exponential_gradient():
 
     gradient_at_x = exponential_gradient(x)
     print(f"exponential_gradient(x)={gradient_at_x}")
-    auto_gradient_at_x = autogradient.gradient(exponential_function, x)
+    auto_gradient_at_x = autogradient.autograd_gradient(exponential_tensor_function, x)
     print(f"auto gradient(x)={auto_gradient_at_x}")
 
     norm_delta = torch.linalg.norm(gradient_at_x - auto_gradient_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
 
 
 def test_exponential_hessian():
@@ -21,8 +21,14 @@ def test_exponential_hessian():
 
     hessian_at_x = exponential_hessian(x)
     print(f"exponential_hessian(x)={hessian_at_x}")
-    auto_hessian_at_x = autogradient.hessian(exponential_function, x)
+    auto_hessian_at_x = autogradient.autograd_hessian(exponential_tensor_function, x)
     print(f"auto hessian(x)={auto_hessian_at_x}")
 
     norm_delta = torch.linalg.norm(hessian_at_x - auto_hessian_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
+
+
+def test_exponential_tensor_function_matches_function():
+    x = torch.tensor([-1.2, 2.6, -0.4, 1], dtype=torch.double)
+
+    assert abs(exponential_tensor_function(x).item() - exponential_function(x)) < 1e-12
@@ -1,7 +1,9 @@
+import pytest
 import torch
 
 from problems import autogradient
-from problems.genhumps import genhumps_gradient, genhumps_hessian, genhumps_function
+from problems.genhumps import genhumps_gradient, genhumps_hessian, genhumps_function, genhumps_tensor_function, \
+    genhumps_value_and_gradient, genhumps_hessian_tridiagonal, genhumps_sparse_hessian, genhumps_hessian_vector_product
 
 
 def test_genhumps_gradient():
@@ -9,11 +11,11 @@ def test_genhumps_gradient():
 
     gradient_at_x = genhumps_gradient(x)
     print(f"genhumps_gradient(x)={gradient_at_x}")
-    auto_gradient_at_x = autogradient.gradient(genhumps_function, x)
+    auto_gradient_at_x = autogradient.autograd_gradient(genhumps_tensor_function, x)
     print(f"auto gradient(x)={auto_gradient_at_x}")
 
     norm_delta = torch.linalg.norm(gradient_at_x - auto_gradient_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
 
 
 def test_genhumps_hessian():
@@ -21,8 +23,54 @@ def test_genhumps_hessian():
 
     hessian_at_x = genhumps_hessian(x)
     print(f"genhumps_hessian(x)={hessian_at_x}")
-    auto_hessian_at_x = autogradient.hessian(genhumps_function, x)
+    auto_hessian_at_x = autogradient.autograd_hessian(genhumps_tensor_function, x)
     print(f"auto hessian(x)={auto_hessian_at_x}")
 
     norm_delta = torch.linalg.norm(hessian_at_x - auto_hessian_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
+
+
+def test_genhumps_tensor_function_matches_function():
+    x = torch.tensor([-506.2, 506.2, 506.2, 506.2, 506.2], dtype=torch.double)
+
+    assert abs(genhumps_tensor_function(x).item() - genhumps_function(x)) < 1e-12
+
+
+@pytest.mark.parametrize("n", [2, 3, 7, 50])
+def test_genhumps_any_dimension_matches_autograd(n: int):
+    generator = torch.Generator().manual_seed(n)
+    x = 3 * torch.randn(n, generator=generator, dtype=torch.double)
+    v = torch.randn(n, generator=generator, dtype=torch.double)
+
+    assert genhumps_function(x) == pytest.approx(genhumps_tensor_function(x).item(), rel=1e-12)
+    assert torch.allclose(genhumps_gradient(x), autogradient.autograd_gradient(genhumps_tensor_function, x))
+    hessian = genhumps_hessian(x)
+    assert torch.allclose(hessian, autogradient.autograd_hessian(genhumps_tensor_function, x))
+    assert torch.allclose(genhumps_hessian_vector_product(x, v), hessian @ v)
+
+    f, gradient = genhumps_value_and_gradient(x)
+    assert f == genhumps_function(x)
+    assert torch.equal(gradient, genhumps_gradient(x))
+
+
+def test_genhumps_hessian_tridiagonal_form():
+    x = torch.linspace(-2, 2, 9, dtype=torch.double)
+    diagonal, off_diagonal = genhumps_hessian_tridiagonal(x)
+    hessian = genhumps_hessian(x)
+
+    assert torch.equal(diagonal, torch.diagonal(hessian))
+    assert torch.equal(off_diagonal, torch.diagonal(hessian, 1))
+    assert torch.equal(genhumps_sparse_hessian(x).to_dense(), hessian)
+
+
+def test_genhumps_large_n():
+    n = 10**5
+    x = torch.full([n], 506.2, dtype=torch.double)
+    x[0] = -506.2
+
+    f, gradient = genhumps_value_and_gradient(x)
+    assert gradient.shape == (n,)
+    sparse_hessian = genhumps_sparse_hessian(x)
+    assert sparse_hessian.layout == torch.sparse_csr
+    assert sparse_hessian.values().shape == (3 * n - 2,)
+    assert torch.allclose(torch.mv(sparse_hessian, x), genhumps_hessian_vector_product(x, x))
@@ -0,0 +1,76 @@
+import pytest
+import torch
+
+from problems.hessian_operators import DenseHessian, DiagonalHessian, BandedHessian, SparseHessian, \
+    DENSE_FACTORIZATION_MAX_DIMENSION
+from problems.problems import load_problem, ProblemType
+from problems.registry import ProblemFamily, build_problem
+
+
+def random_banded(n: int, bandwidth: int, shift: float, generator: torch.Generator) -> BandedHessian:
+    bands = torch.randn(bandwidth + 1, n, generator=generator, dtype=torch.double)
+    bands[0] += shift
+    for d in range(1, bandwidth + 1):
+        bands[d, n - d:] = 0
+    return BandedHessian(bands)
+
+
+def operators(n: int, shift: float) -> list:
+    generator = torch.Generator().manual_seed(n)
+    banded = random_banded(n, 2, shift, generator)
+    dense = banded.to_dense() + 0.1 * torch.ones(n, n, dtype=torch.double)
+    return [DenseHessian(dense),
+            DiagonalHessian(torch.randn(n, generator=generator, dtype=torch.double) + shift),
+            banded,
+            SparseHessian(banded.to_dense().to_sparse_csr())]
+
+
+@pytest.mark.parametrize("n", [5, DENSE_FACTORIZATION_MAX_DIMENSION + 36])
+@pytest.mark.parametrize("shift", [8.0, 0.0])
+def test_operators_match_dense(n: int, shift: float):
+    v = torch.linspace(-1, 1, n, dtype=torch.double)
+    for operator in operators(n, shift):
+        dense = operator.to_dense()
+        assert operator.shape == (n, n)
+        assert operator.is_symmetric()
+        assert torch.allclose(operator.matvec(v), dense @ v)
+        assert torch.equal(operator.diagonal(), torch.diagonal(dense))
+
+        positive_definite = bool(torch.all(torch.linalg.eigvalsh(dense) > 0).item())
+        assert operator.is_positive_definite() == positive_definite
+        factor = operator.shifted_cholesky(0)
+        assert (factor is not None) == positive_definite
+        if factor is not None:
+            assert torch.allclose(dense @ factor.solve(v), v)
+
+        tau = 1 + torch.max(torch.abs(torch.linalg.eigvalsh(dense))).item()
+        shifted = dense + tau * torch.eye(n, dtype=torch.double)
+        assert torch.allclose(shifted @ operator.shifted_cholesky(tau).solve(v), v)
+
+
+def test_sparse_factorable_by_bandwidth():
+    n = 200
+    banded = random_banded(n, 1, 4.0, torch.Generator().manual_seed(0))
+    assert SparseHessian(banded.to_dense().to_sparse_csr()).factorable
+
+    # an arrow matrix has few entries but a full band.
+    arrow = torch.eye(n, dtype=torch.double) * n
+    arrow[0, :] = 1
+    arrow[:, 0] = 1
+    arrow[0, 0] = n
+    operator = SparseHessian(arrow.to_sparse_csr())
+    assert operator.bandwidth == n - 1
+    assert not operator.factorable
+    assert not SparseHessian((arrow + torch.triu(arrow, 1)).to_sparse_csr()).is_symmetric()
+
+
+@pytest.mark.parametrize("problem", [load_problem(ProblemType.Rosenbrock_100), load_problem(ProblemType.Exponential_10),
+                                     load_problem(ProblemType.Genhumps_5),
+                                     build_problem(ProblemFamily.Genhumps, 300, sparse=True)])
+def test_problem_hessian_operators(problem):
+    x = problem.x0 + 0.1
+    v = torch.linspace(-1, 1, x.shape[0], dtype=torch.double)
+    operator = problem.hessian_operator(x)
+    hessian = problem.objective_hessian_function(x).to_dense()
+    assert torch.allclose(operator.to_dense(), hessian)
+    assert torch.allclose(operator.matvec(v), hessian @ v)
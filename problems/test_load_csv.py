@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from problems.load_csv import load_csv_to_tensor, load_triplets_to_sparse_tensor, CACHE_DIRECTORY_NAME, \
+    _cache_path, _write_cache
+
+
+def test_load_csv_matrix_and_vector(tmp_path):
+    matrix_path = os.path.join(tmp_path, "matrix.txt")
+    with open(matrix_path, "w") as matrix_file:
+        matrix_file.write("1,2.5,0\n-3,4,1e-3\n")
+    vector_path = os.path.join(tmp_path, "vector.txt")
+    with open(vector_path, "w") as vector_file:
+        vector_file.write("1\n-2\n3.25\n")
+
+    for use_cache in [False, True, True]:
+        matrix = load_csv_to_tensor(matrix_path, use_cache)
+        assert matrix.dtype == torch.double
+        assert torch.equal(matrix, torch.tensor([[1, 2.5, 0], [-3, 4, 1e-3]], dtype=torch.double))
+
+        vector = load_csv_to_tensor(vector_path, use_cache)
+        assert torch.equal(vector, torch.tensor([1, -2, 3.25], dtype=torch.double))
+
+
+def test_load_csv_cache_is_reused_and_invalidated(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "x0.txt")
+    with open(path, "w") as source_file:
+        source_file.write("1\n2\n")
+    cache_directory = os.path.join(tmp_path, CACHE_DIRECTORY_NAME)
+
+    assert torch.equal(load_csv_to_tensor(path), torch.tensor([1, 2], dtype=torch.double))
+    assert len(os.listdir(cache_directory)) == 1
+
+    # a cached load doesn't parse the text file.
+    def fail_parse(*args, **kwargs):
+        raise AssertionError("parsed a cached file")
+    with monkeypatch.context() as patch:
+        patch.setattr(np, "loadtxt", fail_parse)
+        cached = load_csv_to_tensor(path)
+    assert torch.equal(cached, torch.tensor([1, 2], dtype=torch.double))
+
+    # modifying the tensor doesn't write through to the cache file.
+    cached[0] = 100
+    assert torch.equal(load_csv_to_tensor(path), torch.tensor([1, 2], dtype=torch.double))
+
+    # a changed source replaces its cache.
+    with open(path, "w") as source_file:
+        source_file.write("3\n4\n5\n")
+    assert torch.equal(load_csv_to_tensor(path), torch.tensor([3, 4, 5], dtype=torch.double))
+    assert len(os.listdir(cache_directory)) == 1
+
+
+def test_load_csv_cache_cleanup_keeps_the_current_cache(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "x0.txt")
+    with open(path, "w") as source_file:
+        source_file.write("1\n2\n")
+    cache_directory = os.path.join(tmp_path, CACHE_DIRECTORY_NAME)
+    load_csv_to_tensor(path)
+    cache_path = _cache_path(path, cache_directory)
+    stale_path = os.path.join(cache_directory, "x0.txt.0123456789abcdef.npy")
+    other_path = os.path.join(cache_directory, "x0.txt.backup.npy")
+    for extra_path in [stale_path, other_path]:
+        with open(extra_path, "wb") as extra_file:
+            np.save(extra_file, np.zeros(1))
+
+    # a second writer, racing with a reader of the existing cache_path.
+    remove = os.remove
+
+    def checked_remove(removed_path):
+        assert removed_path != cache_path
+        remove(removed_path)
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "remove", checked_remove)
+        _write_cache(path, cache_path, cache_directory)
+
+    assert sorted(os.listdir(cache_directory)) == sorted([os.path.basename(cache_path), "x0.txt.backup.npy"])
+
+
+def test_load_csv_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_csv_to_tensor(os.path.join(tmp_path, "missing.txt"))
+
+
+def test_load_triplets_to_sparse_tensor(tmp_path):
+    path = os.path.join(tmp_path, "big-q.txt")
+    with open(path, "w") as triplets_file:
+        # (1, 1) appears twice and is summed.
+        triplets_file.write("0,0,2\n0,2,-1\n2,0,-1\n1,1,1.5\n1,1,1.5\n2,2,4\n")
+
+    expected = torch.tensor([[2, 0, -1], [0, 3, 0], [-1, 0, 4]], dtype=torch.double)
+    big_q = load_triplets_to_sparse_tensor(path)
+    assert big_q.layout == torch.sparse_csr
+    assert torch.equal(big_q.to_dense(), expected)
+
+    padded = load_triplets_to_sparse_tensor(path, 5)
+    assert padded.shape == (5, 5)
+
+    with pytest.raises(ValueError):
+        load_triplets_to_sparse_tensor(path, 2)
@@ -0,0 +1,34 @@
+import pytest
+import torch
+
+from problems.precision import Precision, storage_dtype, accumulated_dot, accumulated_norm, accumulated_sum
+
+
+def test_float64_accumulation_of_float32_inputs():
+    generator = torch.Generator().manual_seed(0)
+    a = torch.rand(100000, generator=generator, dtype=torch.double)
+    b = torch.rand(100000, generator=generator, dtype=torch.double)
+    a32 = a.float()
+    b32 = b.float()
+    # the float64 reference of the rounded inputs, so that only the accumulation error is measured.
+    expected = torch.dot(a32.double(), b32.double()).item()
+
+    mixed = accumulated_dot(a32, b32, torch.float64)
+    assert mixed == pytest.approx(expected, rel=1e-7)
+    assert abs(mixed - expected) <= abs(accumulated_dot(a32, b32, torch.float32) - expected)
+
+    assert accumulated_norm(a32, torch.float64) == pytest.approx(torch.linalg.norm(a32.double(), 2).item(), rel=1e-12)
+    assert accumulated_sum(a32, torch.float64) == pytest.approx(torch.sum(a32.double()).item(), rel=1e-12)
+
+
+def test_same_dtype_accumulation_is_the_plain_reduction():
+    a = torch.linspace(-1, 1, 11, dtype=torch.double)
+    assert accumulated_dot(a, a) == torch.dot(a, a).item()
+    assert accumulated_dot(a, a, torch.float64) == torch.dot(a, a).item()
+    assert accumulated_norm(a) == torch.linalg.norm(a, 2).item()
+
+
+def test_storage_dtype():
+    assert storage_dtype(Precision.float64) == torch.float64
+    assert storage_dtype(Precision.float32) == torch.float32
+    assert storage_dtype(Precision.mixed) == torch.float32
@@ -0,0 +1,122 @@
+import pytest
+import torch
+
+from problems import autogradient
+from problems.precision import Precision
+from problems.problems import load_problem, ProblemType, DerivativeBackend, use_derivative_backend, \
+    problem_data_available, PROBLEM_DIMENSIONS
+from problems.registry import ProblemFamily, build_problem
+
+# P3 and P4 need data files that are not in the repository.
+PROBLEM_TYPES = [pytest.param(problem_type, marks=pytest.mark.skipif(not problem_data_available(problem_type),
+                                                                     reason=f"{problem_type} data is missing"))
+                 for problem_type in ProblemType]
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+def test_value_and_gradient_matches_separate_calls(problem_type: ProblemType):
+    problem = load_problem(problem_type)
+    x = problem.x0 + 0.1
+
+    f, gradient = problem.value_and_gradient(x)
+
+    assert f == pytest.approx(problem.objective_function(x), rel=1e-12)
+    assert torch.linalg.norm(gradient - problem.objective_gradient_function(x), 2).item() < 1e-8
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+def test_hessian_vector_product_matches_hessian(problem_type: ProblemType):
+    problem = load_problem(problem_type)
+    x = problem.x0 + 0.1
+    v = torch.linspace(-1, 1, x.shape[0], dtype=torch.double)
+
+    expected = torch.matmul(problem.objective_hessian_function(x), v)
+    hessian_v = problem.hessian_vector_product(x, v)
+
+    assert torch.linalg.norm(hessian_v - expected, 2).item() <= 1e-5 * (1 + torch.linalg.norm(expected, 2).item())
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+def test_autograd_backend_matches_analytic_gradient(problem_type: ProblemType):
+    problem = load_problem(problem_type)
+    autograd_problem = use_derivative_backend(problem, DerivativeBackend.autograd)
+    x = problem.x0 + 0.1
+
+    f, gradient = autograd_problem.value_and_gradient(x)
+    expected = problem.objective_gradient_function(x)
+
+    assert f == pytest.approx(problem.objective_function(x), rel=1e-12)
+    assert torch.linalg.norm(gradient - expected, 2).item() <= 1e-10 * (1 + torch.linalg.norm(expected, 2).item())
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+def test_central_difference_backend_matches_autograd(problem_type: ProblemType):
+    autograd_problem = load_problem(problem_type, DerivativeBackend.autograd)
+    difference_problem = load_problem(problem_type, DerivativeBackend.central_difference)
+    x = autograd_problem.x0 + 0.1
+    v = torch.linspace(-1, 1, x.shape[0], dtype=torch.double)
+
+    expected_gradient = autograd_problem.objective_gradient_function(x)
+    gradient = difference_problem.objective_gradient_function(x)
+    assert torch.linalg.norm(gradient - expected_gradient, 2).item() <= \
+        1e-6 * (1 + torch.linalg.norm(expected_gradient, 2).item())
+
+    expected_hessian_v = autograd_problem.hessian_vector_product(x, v)
+    assert torch.linalg.norm(torch.matmul(autograd_problem.objective_hessian_function(x), v) - expected_hessian_v, 2).item() <= \
+        1e-10 * (1 + torch.linalg.norm(expected_hessian_v, 2).item())
+
+    if x.shape[0] <= 100:
+        expected_hessian = autograd_problem.objective_hessian_function(x)
+        hessian = difference_problem.objective_hessian_function(x)
+        assert torch.linalg.norm(hessian - expected_hessian, 2).item() <= \
+            1e-4 * (1 + torch.linalg.norm(expected_hessian, 2).item())
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+def test_problem_dimensions(problem_type: ProblemType):
+    assert load_problem(problem_type).x0.shape == (PROBLEM_DIMENSIONS[problem_type],)
+
+
+def test_central_difference_hessian_memory_is_bounded():
+    # all 4 n^2 points at once would be a 4 x n x n x n tensor, 860 MB at n = 300.
+    problem = build_problem(ProblemFamily.Rosenbrock, 300)
+    batch_sizes = []
+
+    def tensor_objective_function(points: torch.Tensor) -> torch.Tensor:
+        batch_sizes.append(points.numel())
+        return problem.tensor_objective_function(points)
+
+    x = problem.x0 + 0.1
+    hessian = autogradient.central_difference_hessian(tensor_objective_function, x)
+    assert max(batch_sizes) <= autogradient.CENTRAL_DIFFERENCE_CHUNK_ELEMENTS
+    expected = problem.objective_hessian_function(x)
+    assert torch.linalg.norm(hessian - expected, 2).item() <= 1e-4 * (1 + torch.linalg.norm(expected, 2).item())
+
+
+def test_derivative_backend_requires_tensor_objective():
+    problem = load_problem(ProblemType.Rosenbrock_2)._replace(tensor_objective_function=None)
+    with pytest.raises(ValueError):
+        use_derivative_backend(problem, DerivativeBackend.autograd)
+
+
+def test_load_problem_is_memoized():
+    assert load_problem(ProblemType.Rosenbrock_2) is load_problem(ProblemType.Rosenbrock_2)
+    assert load_problem(ProblemType.Rosenbrock_2) is not load_problem(ProblemType.Rosenbrock_2, DerivativeBackend.autograd)
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+@pytest.mark.parametrize("precision", [Precision.float32, Precision.mixed])
+def test_load_problem_precision(problem_type: ProblemType, precision: Precision):
+    problem = load_problem(problem_type, precision=precision)
+    reference = load_problem(problem_type)
+    x = problem.x0 + 0.1
+
+    f, gradient = problem.value_and_gradient(x)
+    expected_f, expected_gradient = reference.value_and_gradient(reference.x0 + 0.1)
+
+    assert problem.x0.dtype == torch.float32
+    assert gradient.dtype == torch.float32
+    assert problem.objective_hessian_function(x).dtype == torch.float32
+    assert f == pytest.approx(expected_f, rel=1e-4, abs=1e-4)
+    assert torch.linalg.norm(gradient.double() - expected_gradient, 2).item() <= \
+        1e-4 * (1 + torch.linalg.norm(expected_gradient, 2).item())
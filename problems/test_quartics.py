@@ -1,6 +1,7 @@
 import pytest
+import torch
 
-from problems.problems import load_problem, ProblemType
+from problems.problems import load_problem, ProblemType, DerivativeBackend
 
 
 def test_quartics():
@@ -9,3 +10,16 @@ def test_quartics():
 
     problem = load_problem(ProblemType.P6_quartic_2)
     assert problem.objective_function(problem.x0) == pytest.approx(1.9196e+05, 1e+1)
+
+
+@pytest.mark.parametrize("problem_type", [ProblemType.P5_quartic_1, ProblemType.P6_quartic_2])
+def test_quartic_hessian_matches_autograd(problem_type: ProblemType):
+    problem = load_problem(problem_type)
+    autograd_problem = load_problem(problem_type, DerivativeBackend.autograd)
+    x = problem.x0 + 0.1
+    v = torch.linspace(-1, 1, x.shape[0], dtype=torch.double)
+
+    expected_hessian = autograd_problem.objective_hessian_function(x)
+    assert torch.allclose(problem.objective_hessian_function(x), expected_hessian, rtol=1e-10)
+    assert torch.allclose(problem.hessian_vector_product(x, v), autograd_problem.hessian_vector_product(x, v),
+                          rtol=1e-10)
@@ -0,0 +1,77 @@
+import pytest
+import torch
+
+from problems.precision import Precision
+from problems.registry import ProblemFamily, build_problem
+
+
+@pytest.mark.parametrize("family", list(ProblemFamily))
+def test_build_problem_oracles_match_autograd(family: ProblemFamily):
+    problem = build_problem(family, 12, seed=3)
+    x = problem.x0 + 0.1
+    v = torch.linspace(-1, 1, 12, dtype=torch.double)
+
+    assert problem.x0.shape == (12,)
+    assert problem.objective_function(x) == pytest.approx(problem.tensor_objective_function(x).item(), rel=1e-12)
+
+    x_autograd = x.clone().requires_grad_(True)
+    expected_gradient, = torch.autograd.grad(problem.tensor_objective_function(x_autograd), x_autograd)
+    assert torch.linalg.norm(problem.objective_gradient_function(x) - expected_gradient, 2).item() <= \
+        1e-10 * (1 + torch.linalg.norm(expected_gradient, 2).item())
+
+    expected_hessian_v = torch.matmul(problem.objective_hessian_function(x), v)
+    assert torch.linalg.norm(problem.hessian_vector_product(x, v) - expected_hessian_v, 2).item() <= \
+        1e-8 * (1 + torch.linalg.norm(expected_hessian_v, 2).item())
+
+
+def test_build_problem_is_memoized_by_arguments():
+    assert build_problem(ProblemFamily.Quadratic, 20, seed=1) is build_problem(ProblemFamily.Quadratic, 20, seed=1)
+    first = build_problem(ProblemFamily.Quadratic, 20, seed=1)
+    second = build_problem(ProblemFamily.Quadratic, 20, seed=2)
+    assert not torch.equal(first.x0, second.x0)
+
+
+@pytest.mark.parametrize("condition_number, density", [(1, 1), (100, 1), (1000, 0.05), (1e4, 0)])
+def test_build_quadratic_condition_number_and_density(condition_number: float, density: float):
+    n = 200
+    problem = build_problem(ProblemFamily.Quadratic, n, condition_number=condition_number, density=density)
+    big_q = problem.objective_hessian_function(problem.x0)
+
+    assert torch.allclose(big_q, big_q.t())
+    eigenvalues = torch.linalg.eigvalsh(big_q)
+    assert eigenvalues[0].item() >= 0.9
+    assert eigenvalues[-1].item() <= condition_number + 0.1
+
+    off_diagonal_nonzeros = torch.count_nonzero(big_q - torch.diag(torch.diagonal(big_q))).item()
+    assert off_diagonal_nonzeros <= 2 * density * n * n
+
+
+def test_build_problem_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        build_problem(ProblemFamily.Rosenbrock, 1)
+    with pytest.raises(ValueError):
+        build_problem(ProblemFamily.Quadratic, 10, condition_number=0.5)
+    with pytest.raises(ValueError):
+        build_problem(ProblemFamily.Quadratic, 10, density=2)
+
+
+@pytest.mark.parametrize("precision", [Precision.float32, Precision.mixed])
+@pytest.mark.parametrize("sparse", [False, True])
+def test_build_problem_precision(precision: Precision, sparse: bool):
+    problem = build_problem(ProblemFamily.Quadratic, 30, density=0.2, sparse=sparse, precision=precision)
+    reference = build_problem(ProblemFamily.Quadratic, 30, density=0.2, sparse=sparse)
+
+    assert problem.x0.dtype == torch.float32
+    assert problem.objective_hessian_function(problem.x0).dtype == torch.float32
+    f, gradient = problem.value_and_gradient(problem.x0)
+    assert gradient.dtype == torch.float32
+    assert f == pytest.approx(reference.objective_function(reference.x0), rel=1e-5)
+
+
+def test_build_sparse_genhumps():
+    dense = build_problem(ProblemFamily.Genhumps, 30)
+    sparse = build_problem(ProblemFamily.Genhumps, 30, sparse=True)
+    x = dense.x0 + 0.1
+
+    assert sparse.objective_hessian_function(x).layout == torch.sparse_csr
+    assert torch.equal(sparse.objective_hessian_function(x).to_dense(), dense.objective_hessian_function(x))
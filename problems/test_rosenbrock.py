@@ -1,7 +1,7 @@
 import torch
 
 from problems import autogradient
-from problems.rosenbrock import rosenbrock_gradient, rosenbrock_function, rosenbrock_hessian
+from problems.rosenbrock import rosenbrock_gradient, rosenbrock_function, rosenbrock_hessian, rosenbrock_tensor_function
 
 
 def test_rosenbrock_gradient():
@@ -9,11 +9,11 @@ def test_rosenbrock_gradient():
 
     gradient_at_x = rosenbrock_gradient(x)
     print(f"rosenbrock_gradient(x)={gradient_at_x}")
-    auto_gradient_at_x = autogradient.gradient(rosenbrock_function, x)
+    auto_gradient_at_x = autogradient.autograd_gradient(rosenbrock_tensor_function, x)
     print(f"auto gradient(x)={auto_gradient_at_x}")
 
     norm_delta = torch.linalg.norm(gradient_at_x - auto_gradient_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
 
 
 def test_rosenbrock_hessian():
@@ -21,8 +21,53 @@ def test_rosenbrock_hessian():
 
     hessian_at_x = rosenbrock_hessian(x)
     print(f"rosenbrock_hessian(x)={hessian_at_x}")
-    auto_hessian_at_x = autogradient.hessian(rosenbrock_function, x)
+    auto_hessian_at_x = autogradient.autograd_hessian(rosenbrock_tensor_function, x)
     print(f"auto hessian(x)={auto_hessian_at_x}")
 
     norm_delta = torch.linalg.norm(hessian_at_x - auto_hessian_at_x, 2).item()
-    assert norm_delta < 10e-1
+    assert norm_delta < 1e-10
+
+
+def test_rosenbrock_known_values():
+    x = torch.tensor([-1.2, 1], dtype=torch.double)
+
+    assert abs(rosenbrock_function(x) - 24.2) < 1e-12
+
+    expected_gradient = torch.tensor([-215.6, -88], dtype=torch.double)
+    assert torch.linalg.norm(rosenbrock_gradient(x) - expected_gradient, 2).item() < 1e-12
+
+    expected_hessian = torch.tensor([[1330, 480], [480, 200]], dtype=torch.double)
+    assert torch.linalg.norm(rosenbrock_hessian(x) - expected_hessian, 2).item() < 1e-12
+
+
+def test_rosenbrock_matches_elementwise_definition():
+    x = torch.tensor([-1.2, 2.6, -0.4, 1, 0.3, -0.7, 1.1], dtype=torch.double)
+    n = x.shape[0]
+    values = x.tolist()
+
+    expected_f = sum(100 * (values[i+1] - values[i]**2)**2 + (1 - values[i])**2 for i in range(n - 1))
+    assert abs(rosenbrock_function(x) - expected_f) < 1e-12
+
+    expected_gradient = [0.0] * n
+    expected_hessian = [[0.0] * n for _ in range(n)]
+    for i in range(n - 1):
+        xi = values[i]
+        xip1 = values[i+1]
+        expected_gradient[i] += -400 * xi * (xip1 - xi**2) - 2 * (1 - xi)
+        expected_gradient[i+1] += 200 * (xip1 - xi**2)
+        expected_hessian[i][i] += 1200 * xi**2 - 400 * xip1 + 2
+        expected_hessian[i+1][i+1] += 200
+        expected_hessian[i][i+1] = -400 * xi
+        expected_hessian[i+1][i] = -400 * xi
+
+    gradient_delta = rosenbrock_gradient(x) - torch.tensor(expected_gradient, dtype=torch.double)
+    assert torch.linalg.norm(gradient_delta, 2).item() < 1e-12
+
+    hessian_delta = rosenbrock_hessian(x) - torch.tensor(expected_hessian, dtype=torch.double)
+    assert torch.linalg.norm(hessian_delta, 2).item() < 1e-12
+
+
+def test_rosenbrock_tensor_function_matches_function():
+    x = torch.tensor([-1.2, 2.6, -0.4, 1], dtype=torch.double)
+
+    assert abs(rosenbrock_tensor_function(x).item() - rosenbrock_function(x)) < 1e-12
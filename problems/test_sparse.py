@@ -0,0 +1,54 @@
+import functools
+
+import pytest
+import torch
+
+from problems import quadratics
+from problems.autogradient import autograd_value_and_gradient, autograd_hessian_vector_product
+from problems.registry import ProblemFamily, build_problem
+from problems.sparse import is_sparse, matrix_diagonal
+
+
+def test_sparse_quadratic_matches_dense():
+    generator = torch.Generator().manual_seed(0)
+    dense_q, small_q = quadratics.build_random_quadratic(30, 100, 0.1, generator)
+    sparse_q = dense_q.to_sparse_csr()
+    x = torch.randn(30, generator=generator, dtype=torch.double)
+    v = torch.randn(30, generator=generator, dtype=torch.double)
+
+    assert is_sparse(sparse_q) and not is_sparse(dense_q)
+    assert torch.equal(matrix_diagonal(sparse_q), torch.diagonal(dense_q))
+
+    assert quadratics.quadratic_function(sparse_q, small_q, x) == \
+        pytest.approx(quadratics.quadratic_function(dense_q, small_q, x), rel=1e-12)
+    assert torch.allclose(quadratics.quadratic_gradient(sparse_q, small_q, x),
+                          quadratics.quadratic_gradient(dense_q, small_q, x))
+    assert torch.allclose(quadratics.quadratic_hessian_vector_product(sparse_q, small_q, x, v),
+                          quadratics.quadratic_hessian_vector_product(dense_q, small_q, x, v))
+
+    # batched tensor objective and autograd through the sparse matrix.
+    xs = torch.stack([x, v])
+    assert torch.allclose(quadratics.quadratic_tensor_function(sparse_q, small_q, xs),
+                          quadratics.quadratic_tensor_function(dense_q, small_q, xs))
+    tensor_function = functools.partial(quadratics.quadratic_tensor_function, sparse_q, small_q)
+    _, gradient = autograd_value_and_gradient(tensor_function, x)
+    assert torch.allclose(gradient, quadratics.quadratic_gradient(dense_q, small_q, x))
+    assert torch.allclose(autograd_hessian_vector_product(tensor_function, x, v), dense_q @ v)
+
+
+def test_build_sparse_quadratic_spectrum_and_scale():
+    n = 300
+    problem = build_problem(ProblemFamily.Quadratic, n, condition_number=1000, density=0.01, sparse=True)
+    big_q = problem.objective_hessian_function(problem.x0)
+    assert big_q.layout == torch.sparse_csr
+
+    dense_q = big_q.to_dense()
+    assert torch.allclose(dense_q, dense_q.t())
+    eigenvalues = torch.linalg.eigvalsh(dense_q)
+    assert eigenvalues[0].item() >= 0.9
+    assert eigenvalues[-1].item() <= 1000.1
+
+    # n = 10^6 without an n x n intermediate.
+    large = build_problem(ProblemFamily.Quadratic, 10**6, density=2e-6, sparse=True)
+    _, gradient = large.value_and_gradient(large.x0)
+    assert gradient.shape == (10**6,)
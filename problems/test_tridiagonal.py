@@ -0,0 +1,16 @@
+import torch
+
+from problems.tridiagonal import tridiagonal_dense, tridiagonal_sparse_csr, tridiagonal_matvec
+
+
+def test_tridiagonal_forms_agree():
+    generator = torch.Generator().manual_seed(0)
+    for n in [2, 3, 10]:
+        diagonal = torch.randn(n, generator=generator, dtype=torch.double)
+        off_diagonal = torch.randn(n - 1, generator=generator, dtype=torch.double)
+        v = torch.randn(n, generator=generator, dtype=torch.double)
+
+        dense = tridiagonal_dense(diagonal, off_diagonal)
+        assert torch.equal(dense, dense.t())
+        assert torch.equal(tridiagonal_sparse_csr(diagonal, off_diagonal).to_dense(), dense)
+        assert torch.allclose(tridiagonal_matvec(diagonal, off_diagonal, v), dense @ v)
@@ -0,0 +1,27 @@
+import torch
+
+
+# symmetric tridiagonal matrices stored as their diagonal (n) and off-diagonal (n - 1), for the hessians of the
+# chained problems, whose term i couples only x_i and x_{i+1}.
+
+def tridiagonal_dense(diagonal: torch.Tensor, off_diagonal: torch.Tensor) -> torch.Tensor:
+    return torch.diag(diagonal) + torch.diag(off_diagonal, 1) + torch.diag(off_diagonal, -1)
+
+
+def tridiagonal_sparse_csr(diagonal: torch.Tensor, off_diagonal: torch.Tensor) -> torch.Tensor:
+    # row i holds (i, i - 1), (i, i) and (i, i + 1). laid out row by row, only the first and the last of these 3n
+    # entries fall outside the matrix, so the CSR arrays are built directly instead of from triplets.
+    n = diagonal.shape[0]
+    rows = torch.arange(n)
+    columns = torch.stack([rows - 1, rows, rows + 1], 1).reshape(-1)[1:-1]
+    zero = torch.zeros(1, dtype=diagonal.dtype)
+    values = torch.stack([torch.cat([zero, off_diagonal]), diagonal, torch.cat([off_diagonal, zero])], 1)
+    crow_indices = torch.clamp(3 * torch.arange(n + 1) - 1, 0, 3 * n - 2)
+    return torch.sparse_csr_tensor(crow_indices, columns, values.reshape(-1)[1:-1], (n, n), check_invariants=False)
+
+
+def tridiagonal_matvec(diagonal: torch.Tensor, off_diagonal: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    product = diagonal * v
+    product[:-1] += off_diagonal * v[1:]
+    product[1:] += off_diagonal * v[:-1]
+    return product
@@ -0,0 +1,26 @@
+import torch
+
+from generate_html_benchmarks import BenchmarkJob, run_benchmark_jobs, estimated_job_cost
+from methods.methods import Method, OptimizationOptions
+from methods.run_optimization import run_optimization
+from problems.problems import ProblemType, load_problem, PROBLEM_DIMENSIONS
+
+
+def test_parallel_jobs_match_serial_runs():
+    options = OptimizationOptions(collect_statistics=True)
+    jobs = [BenchmarkJob(problem_type, method, options)
+            for problem_type in [ProblemType.Rosenbrock_2, ProblemType.P5_quartic_1, ProblemType.Genhumps_5]
+            for method in [Method.LBFGSW, Method.ModifiedNewtonW]]
+    costs = [estimated_job_cost(job.method, PROBLEM_DIMENSIONS[job.problem_type]) for job in jobs]
+
+    results = run_benchmark_jobs(jobs, costs, max_workers=2)
+
+    assert set(results) == {(job.problem_type, job.method) for job in jobs}
+    for job in jobs:
+        parallel = results[(job.problem_type, job.method)].results
+        serial = run_optimization(job.method, load_problem(job.problem_type), job.options)
+        assert torch.equal(parallel.final_x, serial.final_x)
+        assert parallel.termination_reason == serial.termination_reason
+        assert parallel.trace.total_steps == serial.trace.total_steps
+        assert parallel.statistics.function_evaluations == serial.statistics.function_evaluations
+        assert parallel.statistics.value_and_gradient_evaluations == serial.statistics.value_and_gradient_evaluations